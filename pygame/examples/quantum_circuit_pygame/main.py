@@ -22,6 +22,7 @@
 import pygame
 from pygame.locals import *
 
+from qiskit.quantum_info import Statevector
 from sympy import pi
 
 import sys
@@ -31,7 +32,7 @@ sys.path.append('/Users/kirais/Documents/GitHub/Qiskit-for-GameDev/pygame/')
 import qgame
 
 from qgame import CircuitGridModel, CircuitGridNode, \
-    CircuitDiagram, MeasurementsHistogram, QSphere, StatevectorGrid, UnitaryGrid
+    CircuitDiagram, NativeQSphere, ProbabilityHistogram, StatevectorGrid, UnitaryGrid
 from qgame import circuit_node_types as node_types
 from qgame.containers import VBox
 from qgame.utils.colors import WHITE
@@ -125,8 +126,9 @@ def main():
 
     circuit_diagram = CircuitDiagram(circuit)
     unitary_grid = UnitaryGrid(circuit)
-    histogram = MeasurementsHistogram(circuit)
-    qsphere = QSphere(circuit)
+    histogram = ProbabilityHistogram(circuit)
+    # Drawn with pygame, fast enough to follow every edit of the grid
+    qsphere = NativeQSphere(circuit)
     statevector_grid = StatevectorGrid(circuit)
 
     # left_sprites = VBox(0, 0, circuit_diagram, qsphere)
@@ -142,6 +144,10 @@ def main():
 
 
 
+    # Areas a shrinking visualization leaves behind are restored from background
+    for sprite_group in (left_sprites, middle_sprites, right_sprites, circuit_grid):
+        sprite_group.clear(screen, background)
+
     # screen.blit(background, (0, 0))
     left_sprites.draw(screen)
     middle_sprites.draw(screen)
@@ -149,6 +155,13 @@ def main():
     circuit_grid.draw(screen)
     pygame.display.flip()
 
+    def update_after_edit():
+        """Redraw the changed grid tiles, the qsphere and histogram of the edited circuit"""
+        quantum_state = Statevector.from_instruction(circuit_grid_model.compute_circuit()).data
+        qsphere.set_statevector(quantum_state)
+        histogram.set_statevector(quantum_state)
+        update_visualizations(left_sprites, middle_sprites, circuit_grid)
+
     gamepad_repeat_delay = 100
     gamepad_neutral = True
     gamepad_pressed_timer = 0
@@ -206,70 +219,52 @@ def main():
                 if event.button == BTN_A:
                     # Place X gate
                     circuit_grid.handle_input_x()
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 elif event.button == BTN_X:
                     # Place Y gate
                     circuit_grid.handle_input_y()
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 elif event.button == BTN_B:
                     # Place Z gate
                     circuit_grid.handle_input_z()
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 elif event.button == BTN_Y:
                     # Place Hadamard gate
                     circuit_grid.handle_input_h()
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 elif event.button == BTN_RIGHT_TRIGGER:
                     # Delete gate
                     circuit_grid.handle_input_delete()
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 elif event.button == BTN_RIGHT_THUMB:
                     # Add or remove a control
                     circuit_grid.handle_input_ctrl()
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 elif event.button == BTN_LEFT_BUMPER:
                     # Update visualizations
                     # TODO: Refactor following code into methods, etc.
-                    screen.blit(background, (0, 0))
                     circuit = circuit_grid_model.compute_circuit()
                     circuit_diagram.set_circuit(circuit)
                     unitary_grid.set_circuit(circuit)
                     qsphere.set_circuit(circuit)
                     histogram.set_circuit(circuit)
                     statevector_grid.set_circuit(circuit)
-                    left_sprites.arrange()
-                    middle_sprites.arrange()
-                    right_sprites.arrange()
-                    left_sprites.draw(screen)
-                    middle_sprites.draw(screen)
-                    right_sprites.draw(screen)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_visualizations(left_sprites, middle_sprites, right_sprites, circuit_grid)
 
             elif event.type == JOYAXISMOTION:
                 # print("event: ", event)
                 if event.axis == AXIS_RIGHT_THUMB_X and joystick.get_axis(AXIS_RIGHT_THUMB_X) >= 0.95:
                     circuit_grid.handle_input_rotate(pi / 8)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 if event.axis == AXIS_RIGHT_THUMB_X and joystick.get_axis(AXIS_RIGHT_THUMB_X) <= -0.95:
                     circuit_grid.handle_input_rotate(-pi / 8)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 if event.axis == AXIS_RIGHT_THUMB_Y and joystick.get_axis(AXIS_RIGHT_THUMB_Y) <= -0.95:
                     circuit_grid.handle_input_move_ctrl(MOVE_UP)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 if event.axis == AXIS_RIGHT_THUMB_Y and joystick.get_axis(AXIS_RIGHT_THUMB_Y) >= 0.95:
                     circuit_grid.handle_input_move_ctrl(MOVE_DOWN)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
 
             elif event.type == KEYDOWN:
                 index_increment = 0
@@ -277,83 +272,61 @@ def main():
                     going = False
                 elif event.key == K_a:
                     circuit_grid.move_to_adjacent_node(MOVE_LEFT)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    pygame.display.update(circuit_grid.draw(screen))
                 elif event.key == K_d:
                     circuit_grid.move_to_adjacent_node(MOVE_RIGHT)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    pygame.display.update(circuit_grid.draw(screen))
                 elif event.key == K_w:
                     circuit_grid.move_to_adjacent_node(MOVE_UP)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    pygame.display.update(circuit_grid.draw(screen))
                 elif event.key == K_s:
                     circuit_grid.move_to_adjacent_node(MOVE_DOWN)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    pygame.display.update(circuit_grid.draw(screen))
                 elif event.key == K_x:
                     circuit_grid.handle_input_x()
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 elif event.key == K_y:
                     circuit_grid.handle_input_y()
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 elif event.key == K_z:
                     circuit_grid.handle_input_z()
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 elif event.key == K_h:
                     circuit_grid.handle_input_h()
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 elif event.key == K_SPACE:
                     circuit_grid.handle_input_delete()
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 elif event.key == K_c:
                     # Add or remove a control
                     circuit_grid.handle_input_ctrl()
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 elif event.key == K_UP:
                     # Move a control qubit up
                     circuit_grid.handle_input_move_ctrl(MOVE_UP)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 elif event.key == K_DOWN:
                     # Move a control qubit down
                     circuit_grid.handle_input_move_ctrl(MOVE_DOWN)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 elif event.key == K_LEFT:
                     # Rotate a gate
                     circuit_grid.handle_input_rotate(-pi/8)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 elif event.key == K_RIGHT:
                     # Rotate a gate
                     circuit_grid.handle_input_rotate(pi / 8)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_after_edit()
                 elif event.key == K_TAB:
                     # Update visualizations
                     # TODO: Refactor following code into methods, etc.
-                    screen.blit(background, (0, 0))
                     circuit = circuit_grid_model.compute_circuit()
                     circuit_diagram.set_circuit(circuit)
                     unitary_grid.set_circuit(circuit)
                     qsphere.set_circuit(circuit)
                     histogram.set_circuit(circuit)
                     statevector_grid.set_circuit(circuit)
-                    left_sprites.arrange()
-                    middle_sprites.arrange()
-                    right_sprites.arrange()
-                    left_sprites.draw(screen)
-                    middle_sprites.draw(screen)
-                    right_sprites.draw(screen)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    update_visualizations(left_sprites, middle_sprites, right_sprites, circuit_grid)
 
             # else:
             #     print("event: ", event)
@@ -363,8 +336,17 @@ def main():
 
 def move_update_circuit_grid_display(circuit_grid, direction):
     circuit_grid.move_to_adjacent_node(direction)
-    circuit_grid.draw(screen)
-    pygame.display.flip()
+    pygame.display.update(circuit_grid.draw(screen))
+
+
+def update_visualizations(*sprite_groups):
+    """Redraw the sprites that changed and update only their part of the display"""
+    dirty_rects = []
+    for sprite_group in sprite_groups:
+        if hasattr(sprite_group, 'arrange'):
+            sprite_group.arrange()
+        dirty_rects.extend(sprite_group.draw(screen))
+    pygame.display.update(dirty_rects)
 
 
 if __name__ == '__main__':
@@ -2,5 +2,7 @@ from . import containers
 from .controls import CircuitGrid
 from .data import *
 from .model import CircuitGridModel, CircuitGridNode, circuit_node_types
-from .utils import colors, gamepad, Input, navigation, parameters, load_sound, load_image, file_path, comp_basis_states
-from .viz import CircuitDiagram, MeasurementsHistogram, QSphere, StatevectorGrid, UnitaryGrid
+from .utils import colors, gamepad, Input, navigation, parameters, load_sound, load_image, \
+    load_cached_image, clear_image_cache, surface_from_figure, file_path, comp_basis_states
+from .viz import CircuitDiagram, MeasurementsHistogram, NativeQSphere, ProbabilityHistogram, QSphere, \
+    StatevectorGrid, UnitaryGrid
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import pygame
+
+
+class Box(pygame.sprite.LayeredDirty):
+    """Base of the containers, a LayeredDirty that also accepts plain sprites
+
+    A plain pygame.sprite.Sprite gets the attributes of a DirtySprite and is
+    redrawn on every draw(), as it does not report its own changes.
+    """
+    def __init__(self, xpos, ypos, *sprites):
+        pygame.sprite.LayeredDirty.__init__(self, sprites)
+        self.xpos = xpos
+        self.ypos = ypos
+        self.arrange()
+
+    def add_internal(self, sprite, layer=None):
+        if isinstance(sprite, pygame.sprite.DirtySprite):
+            pygame.sprite.LayeredDirty.add_internal(self, sprite, layer)
+            return
+        sprite.dirty = 2
+        sprite.visible = 1
+        sprite.blendmode = 0
+        sprite.source_rect = None
+        pygame.sprite.LayeredUpdates.add_internal(self, sprite, layer)
+
+    def arrange(self):
+        raise NotImplementedError
@@ -14,22 +14,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-import pygame
+from .box import Box
 
 
-class HBox(pygame.sprite.RenderPlain):
+class HBox(Box):
     """Arranges sprites horizontally"""
-    def __init__(self, xpos, ypos, *sprites):
-        pygame.sprite.RenderPlain.__init__(self, sprites)
-        self.xpos = xpos
-        self.ypos = ypos
-        self.arrange()
-
     def arrange(self):
         next_xpos = self.xpos
         next_ypos = self.ypos
         sprite_list = self.sprites()
         for sprite in sprite_list:
-            sprite.rect.left = next_xpos
-            sprite.rect.top = next_ypos
+            if sprite.rect.topleft != (next_xpos, next_ypos):
+                sprite.rect.topleft = next_xpos, next_ypos
+                # Sprites redrawn on every draw() have dirty 2 and keep it
+                if sprite.dirty == 0:
+                    sprite.dirty = 1
             next_xpos += sprite.rect.width
@@ -23,12 +23,16 @@ from ..model import circuit_node_types as node_types
 from ..model.circuit_grid_model import CircuitGridNode
 from ..utils.colors import *
 from ..utils.navigation import *
-from ..utils.resources import load_image
+from ..utils.resources import load_image, load_cached_image
 from ..utils.parameters import *
 
 
-class CircuitGrid(pygame.sprite.RenderPlain):
-    """Enables interaction with circuit"""
+class CircuitGrid(pygame.sprite.LayeredDirty):
+    """Enables interaction with circuit
+
+    Only the tiles and the cursor that changed since the last draw() are
+    redrawn, and draw() returns their rectangles for pygame.display.update().
+    """
 
     def __init__(self, xpos, ypos, circuit_grid_model):
         self.xpos = xpos
@@ -46,9 +50,9 @@ class CircuitGrid(pygame.sprite.RenderPlain):
                 self.gate_tiles[row_idx][col_idx] = \
                     CircuitGridGate(circuit_grid_model, row_idx, col_idx)
 
-        pygame.sprite.RenderPlain.__init__(self, self.circuit_grid_background,
-                                           self.gate_tiles,
-                                           self.circuit_grid_cursor)
+        pygame.sprite.LayeredDirty.__init__(self, self.circuit_grid_background,
+                                            self.gate_tiles,
+                                            self.circuit_grid_cursor)
         self.update()
 
     def update(self, *args):
@@ -72,10 +76,13 @@ class CircuitGrid(pygame.sprite.RenderPlain):
     def highlight_selected_node(self, qubit_index, depth_index):
         self.selected_qubit = qubit_index
         self.selected_depth = depth_index
+        cursor_position = self.circuit_grid_cursor.rect.topleft
         self.circuit_grid_cursor.rect.left = self.xpos + GRID_WIDTH * (self.selected_depth + 1) + round(
             0.375 * WIDTH_UNIT)
         self.circuit_grid_cursor.rect.top = self.ypos + GRID_HEIGHT * (self.selected_qubit + 0.5) + round(
             0.375 * WIDTH_UNIT)
+        if self.circuit_grid_cursor.rect.topleft != cursor_position:
+            self.circuit_grid_cursor.dirty = 1
 
     def reset_cursor(self):
         self.highlight_selected_node(0, 0)
@@ -289,11 +296,11 @@ class CircuitGrid(pygame.sprite.RenderPlain):
                 self.circuit_grid_model.set_node(wire_idx, depth_index, circuit_grid_node)
 
 
-class CircuitGridBackground(pygame.sprite.Sprite):
+class CircuitGridBackground(pygame.sprite.DirtySprite):
     """Background for circuit grid"""
 
     def __init__(self, circuit_grid_model):
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
 
         self.image = pygame.Surface([GRID_WIDTH * (18 + 2),
                                      GRID_HEIGHT * (3 + 1)])
@@ -309,14 +316,17 @@ class CircuitGridBackground(pygame.sprite.Sprite):
                              LINE_WIDTH)
 
 
-class CircuitGridGate(pygame.sprite.Sprite):
-    """Images for nodes"""
+class CircuitGridGate(pygame.sprite.DirtySprite):
+    """Images for nodes, marked dirty when the node shows a different image"""
+
+    empty_image = None  # transparent tile shared by all empty nodes
 
     def __init__(self, circuit_grid_model, qubit_index, depth_index):
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
         self.circuit_grid_model = circuit_grid_model
         self.qubit_index = qubit_index
         self.depth_index = depth_index
+        self.tile = None  # what the image shows: (image name,), (image name, theta) or ()
 
         self.update()
 
@@ -324,76 +334,88 @@ class CircuitGridGate(pygame.sprite.Sprite):
         node_type = self.circuit_grid_model.get_node_type(self.qubit_index, self.depth_index)
 
         if node_type == node_types.H:
-            self.image, self.rect = load_image('gate_images/h_gate.png', -1)
+            self.set_image('gate_images/h_gate.png')
         elif (node_type == node_types.X) or (node_type == node_types.RX):
             node = self.circuit_grid_model.get_node(self.qubit_index, self.depth_index)
             if node.ctrl_a is not None or node.ctrl_b is not None:
                 # This is a control-X gate or Toffoli gatex
                 # TODO: Handle Toffoli gates more completely
                 if self.qubit_index > max(node.ctrl_a, node.ctrl_b):
-                    self.image, self.rect = load_image('gate_images/not_gate_below_ctrl.png', -1)
+                    self.set_image('gate_images/not_gate_below_ctrl.png')
                 else:
-                    self.image, self.rect = load_image('gate_images/not_gate_above_ctrl.png', -1)
+                    self.set_image('gate_images/not_gate_above_ctrl.png')
             elif node.theta != pi:
-                self.image, self.rect = load_image('gate_images/rx_gate.png', -1)
-                self.rect = self.image.get_rect()
-                pygame.draw.arc(self.image, MAGENTA, self.rect, 0, node.theta % (2 * pi), 6)
-                pygame.draw.arc(self.image, MAGENTA, self.rect, node.theta % (2 * pi), 2 * pi, 1)
+                self.set_rotation_image('gate_images/rx_gate.png', node.theta)
             else:
-                self.image, self.rect = load_image('gate_images/x_gate.png', -1)
+                self.set_image('gate_images/x_gate.png')
         elif node_type == node_types.Y:
             node = self.circuit_grid_model.get_node(self.qubit_index, self.depth_index)
             if node.theta != pi:
-                self.image, self.rect = load_image('gate_images/ry_gate.png', -1)
-                self.rect = self.image.get_rect()
-                pygame.draw.arc(self.image, MAGENTA, self.rect, 0, node.theta % (2 * pi), 6)
-                pygame.draw.arc(self.image, MAGENTA, self.rect, node.theta % (2 * pi), 2 * pi, 1)
+                self.set_rotation_image('gate_images/ry_gate.png', node.theta)
             else:
-                self.image, self.rect = load_image('gate_images/y_gate.png', -1)
+                self.set_image('gate_images/y_gate.png')
         elif node_type == node_types.Z:
             node = self.circuit_grid_model.get_node(self.qubit_index, self.depth_index)
             if node.theta != pi:
-                self.image, self.rect = load_image('gate_images/rz_gate.png', -1)
-                self.rect = self.image.get_rect()
-                pygame.draw.arc(self.image, MAGENTA, self.rect, 0, node.theta % (2 * pi), 6)
-                pygame.draw.arc(self.image, MAGENTA, self.rect, node.theta % (2 * pi), 2 * pi, 1)
+                self.set_rotation_image('gate_images/rz_gate.png', node.theta)
             else:
-                self.image, self.rect = load_image('gate_images/z_gate.png', -1)
+                self.set_image('gate_images/z_gate.png')
         elif node_type == node_types.S:
-            self.image, self.rect = load_image('gate_images/s_gate.png', -1)
+            self.set_image('gate_images/s_gate.png')
         elif node_type == node_types.SDG:
-            self.image, self.rect = load_image('gate_images/sdg_gate.png', -1)
+            self.set_image('gate_images/sdg_gate.png')
         elif node_type == node_types.T:
-            self.image, self.rect = load_image('gate_images/t_gate.png', -1)
+            self.set_image('gate_images/t_gate.png')
         elif node_type == node_types.TDG:
-            self.image, self.rect = load_image('gate_images/tdg_gate.png', -1)
+            self.set_image('gate_images/tdg_gate.png')
         elif node_type == node_types.ID:
             # a completely transparent PNG is used to place at the end of the circuit to prevent crash
             # the game crashes if the circuit is empty
-            self.image, self.rect = load_image('gate_images/transparent.png', -1)
+            self.set_image('gate_images/transparent.png')
         elif node_type == node_types.CTRL:
             # TODO: Handle Toffoli gates correctly
             if self.qubit_index > \
                     self.circuit_grid_model.get_gate_qubit_for_control_node(self.qubit_index, self.depth_index):
-                self.image, self.rect = load_image('gate_images/ctrl_gate_bottom_wire.png', -1)
+                self.set_image('gate_images/ctrl_gate_bottom_wire.png')
             else:
-                self.image, self.rect = load_image('gate_images/ctrl_gate_top_wire.png', -1)
+                self.set_image('gate_images/ctrl_gate_top_wire.png')
         elif node_type == node_types.TRACE:
-            self.image, self.rect = load_image('gate_images/trace_gate.png', -1)
+            self.set_image('gate_images/trace_gate.png')
         elif node_type == node_types.SWAP:
-            self.image, self.rect = load_image('gate_images/swap_gate.png', -1)
+            self.set_image('gate_images/swap_gate.png')
         else:
-            self.image = pygame.Surface([GATE_TILE_WIDTH, GATE_TILE_HEIGHT])
-            self.image.set_alpha(0)
-            self.rect = self.image.get_rect()
+            if CircuitGridGate.empty_image is None:
+                CircuitGridGate.empty_image = pygame.Surface([GATE_TILE_WIDTH, GATE_TILE_HEIGHT])
+                CircuitGridGate.empty_image.set_alpha(0)
+            if self.show_tile(()):
+                self.image = CircuitGridGate.empty_image
+                self.rect = self.image.get_rect()
 
-        self.image.convert()
+    def show_tile(self, tile):
+        """Whether the image must change to show tile, marking the sprite dirty if so"""
+        if tile == self.tile:
+            return False
+        self.tile = tile
+        self.dirty = 1
+        return True
+
+    def set_image(self, name):
+        if self.show_tile((name,)):
+            # Shared with every tile showing the same gate, so never drawn on
+            self.image, self.rect = load_cached_image(name, -1)
+
+    def set_rotation_image(self, name, theta):
+        if self.show_tile((name, theta)):
+            image, self.rect = load_cached_image(name, -1)
+            self.image = image.copy()
+            pygame.draw.arc(self.image, MAGENTA, self.rect, 0, theta % (2 * pi), 6)
+            pygame.draw.arc(self.image, MAGENTA, self.rect, theta % (2 * pi), 2 * pi, 1)
 
 
-class CircuitGridCursor(pygame.sprite.Sprite):
+class CircuitGridCursor(pygame.sprite.DirtySprite):
     """Cursor to highlight current grid node"""
 
     def __init__(self):
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
         self.image, self.rect = load_image('cursor_images/circuit-grid-cursor.png', -1)
         self.image.convert_alpha()
@@ -15,5 +15,6 @@
 # limitations under the License.
 #
 from .input import Input
-from .resources import load_image, load_sound, file_path
+from .resources import load_image, load_cached_image, clear_image_cache, surface_from_figure, \
+    load_sound, file_path
 from .states import comp_basis_states
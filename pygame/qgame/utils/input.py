@@ -47,13 +47,13 @@ class Input:
                 self.gamepad_pressed_timer -= self.gamepad_repeat_delay
             if gamepad_move:
                 if joystick_hat == (-1, 0):
-                    self.move_update_circuit_grid_display(circuit_grid, MOVE_LEFT)
+                    self.move_update_circuit_grid_display(circuit_grid, MOVE_LEFT, screen)
                 elif joystick_hat == (1, 0):
-                    self.move_update_circuit_grid_display(circuit_grid, MOVE_RIGHT)
+                    self.move_update_circuit_grid_display(circuit_grid, MOVE_RIGHT, screen)
                 elif joystick_hat == (0, 1):
-                    self.move_update_circuit_grid_display(circuit_grid, MOVE_UP)
+                    self.move_update_circuit_grid_display(circuit_grid, MOVE_UP, screen)
                 elif joystick_hat == (0, -1):
-                    self.move_update_circuit_grid_display(circuit_grid, MOVE_DOWN)
+                    self.move_update_circuit_grid_display(circuit_grid, MOVE_DOWN, screen)
             self.gamepad_last_update = pygame.time.get_ticks()
 
             # Check left thumbstick position
@@ -70,39 +70,27 @@ class Input:
                 if event.button == BTN_A:
                     # Place X gate
                     circuit_grid.handle_input_x()
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 elif event.button == BTN_X:
                     # Place Y gate
                     circuit_grid.handle_input_y()
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 elif event.button == BTN_B:
                     # Place Z gate
                     circuit_grid.handle_input_z()
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 elif event.button == BTN_Y:
                     # Place Hadamard gate
                     circuit_grid.handle_input_h()
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 elif event.button == BTN_RIGHT_TRIGGER:
                     # Delete gate
                     circuit_grid.handle_input_delete()
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 elif event.button == BTN_RIGHT_THUMB:
                     # Add or remove a control
                     circuit_grid.handle_input_ctrl()
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 elif event.button == BTN_LEFT_BUMPER:
                     # Update visualizations
                     # TODO: Refactor following code into methods, etc.
@@ -112,99 +100,67 @@ class Input:
                 # print("event: ", event)
                 if event.axis == AXIS_RIGHT_THUMB_X and joystick.get_axis(AXIS_RIGHT_THUMB_X) >= 0.95:
                     circuit_grid.handle_input_rotate(np.pi / 8)
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 if event.axis == AXIS_RIGHT_THUMB_X and joystick.get_axis(AXIS_RIGHT_THUMB_X) <= -0.95:
                     circuit_grid.handle_input_rotate(-np.pi / 8)
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 if event.axis == AXIS_RIGHT_THUMB_Y and joystick.get_axis(AXIS_RIGHT_THUMB_Y) <= -0.95:
                     circuit_grid.handle_input_move_ctrl(MOVE_UP)
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 if event.axis == AXIS_RIGHT_THUMB_Y and joystick.get_axis(AXIS_RIGHT_THUMB_Y) >= 0.95:
                     circuit_grid.handle_input_move_ctrl(MOVE_DOWN)
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
 
             elif event.type == KEYDOWN:
                 if event.key == K_ESCAPE:
                     self.running = False
                 elif event.key == K_a:
                     circuit_grid.move_to_adjacent_node(MOVE_LEFT)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    pygame.display.update(circuit_grid.draw(screen))
                 elif event.key == K_d:
                     circuit_grid.move_to_adjacent_node(MOVE_RIGHT)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    pygame.display.update(circuit_grid.draw(screen))
                 elif event.key == K_w:
                     circuit_grid.move_to_adjacent_node(MOVE_UP)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    pygame.display.update(circuit_grid.draw(screen))
                 elif event.key == K_s:
                     circuit_grid.move_to_adjacent_node(MOVE_DOWN)
-                    circuit_grid.draw(screen)
-                    pygame.display.flip()
+                    pygame.display.update(circuit_grid.draw(screen))
                 elif event.key == K_x:
                     circuit_grid.handle_input_x()
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 elif event.key == K_y:
                     circuit_grid.handle_input_y()
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 elif event.key == K_z:
                     circuit_grid.handle_input_z()
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 elif event.key == K_h:
                     circuit_grid.handle_input_h()
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 elif event.key == K_SPACE:
                     circuit_grid.handle_input_delete()
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 elif event.key == K_c:
                     # Add or remove a control
                     circuit_grid.handle_input_ctrl()
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 elif event.key == K_UP:
                     # Move a control qubit up
                     circuit_grid.handle_input_move_ctrl(MOVE_UP)
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 elif event.key == K_DOWN:
                     # Move a control qubit down
                     circuit_grid.handle_input_move_ctrl(MOVE_DOWN)
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 elif event.key == K_LEFT:
                     # Rotate a gate
                     circuit_grid.handle_input_rotate(-np.pi / 8)
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 elif event.key == K_RIGHT:
                     # Rotate a gate
                     circuit_grid.handle_input_rotate(np.pi / 8)
-                    circuit_grid.draw(screen)
                     self.update_paddle(level, screen, scene)
-                    pygame.display.flip()
                 elif event.key == K_TAB:
                     # Update visualizations
                     # TODO: Refactor following code into methods, etc.
@@ -221,11 +177,10 @@ class Input:
 
         circuit = circuit_grid_model.compute_circuit()
         statevector_grid.paddle_before_measurement(circuit, scene.qubit_num, 100)
+        statevector_grid.dirty = 1
         right_statevector.arrange()
-        circuit_grid.draw(screen)
-        pygame.display.flip()
+        pygame.display.update(right_statevector.draw(screen) + circuit_grid.draw(screen))
 
-    def move_update_circuit_grid_display(self, circuit_grid, direction):
+    def move_update_circuit_grid_display(self, circuit_grid, direction, screen):
         circuit_grid.move_to_adjacent_node(direction)
-        circuit_grid.draw(screen)
-        pygame.display.flip()
+        pygame.display.update(circuit_grid.draw(screen))
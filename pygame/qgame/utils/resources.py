@@ -24,6 +24,9 @@ from .parameters import WIDTH_UNIT
 main_dir = os.path.split(os.path.abspath(__file__))[0]
 data_dir = os.path.join(main_dir, '..', 'data')
 
+# (name, colorkey, scale): surface, filled by load_cached_image()
+_image_cache = {}
+
 
 def load_image(name, colorkey=None, scale=WIDTH_UNIT/13):
     fullname = file_path('images', name)
@@ -32,6 +35,27 @@ def load_image(name, colorkey=None, scale=WIDTH_UNIT/13):
     except pygame.error:
         print('Cannot load image:', fullname)
         raise SystemExit(str(geterror()))
+    return prepare_image(image, colorkey, scale)
+
+
+def surface_from_figure(figure, colorkey=None, scale=WIDTH_UNIT/13):
+    """Render a matplotlib figure into a surface, as load_image() would load it saved as PNG
+
+    The figure is drawn on an Agg canvas and copied from its pixel buffer,
+    nothing is written to disk.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    canvas = figure.canvas
+    if not isinstance(canvas, FigureCanvasAgg):
+        canvas = FigureCanvasAgg(figure)
+    canvas.draw()
+    image = pygame.image.frombuffer(bytes(canvas.buffer_rgba()), canvas.get_width_height(), 'RGBA')
+    return prepare_image(image, colorkey, scale)
+
+
+def prepare_image(image, colorkey=None, scale=WIDTH_UNIT/13):
+    """Convert image to the display format, set its colorkey and scale it"""
     image = image.convert()
     if colorkey is not None:
         if colorkey is -1:
@@ -41,6 +65,25 @@ def load_image(name, colorkey=None, scale=WIDTH_UNIT/13):
     return image, image.get_rect()
 
 
+def load_cached_image(name, colorkey=None, scale=WIDTH_UNIT/13):
+    """Like load_image(), but each image is read and scaled only once per scale
+
+    The surface is shared by every caller: blit it, or draw on a copy.
+    Call clear_image_cache() after changing the display mode, as the
+    surfaces are converted to the pixel format of the display.
+    """
+    key = (name, colorkey, scale)
+    image = _image_cache.get(key)
+    if image is None:
+        image, _ = load_image(name, colorkey, scale)
+        _image_cache[key] = image
+    return image, image.get_rect()
+
+
+def clear_image_cache():
+    _image_cache.clear()
+
+
 def load_sound(name):
     class NoneSound:
         def play(self): pass
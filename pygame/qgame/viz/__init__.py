@@ -16,6 +16,8 @@
 """Module for quantum vizualizations"""
 from .circuit_diagram import CircuitDiagram
 from .qsphere import QSphere
+from .native_qsphere import NativeQSphere
 from .statevector_grid import StatevectorGrid
 from .unitary_grid import UnitaryGrid
 from .measurements_histogram import MeasurementsHistogram
+from .probability_histogram import ProbabilityHistogram
@@ -14,15 +14,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import matplotlib.pyplot as plt
 import pygame
 
-from .. import load_image, file_path
+from .. import surface_from_figure
 
 
-class CircuitDiagram(pygame.sprite.Sprite):
+class CircuitDiagram(pygame.sprite.DirtySprite):
     """Displays a circuit diagram"""
     def __init__(self, circuit):
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
         self.image = None
         self.rect = None
         self.set_circuit(circuit)
@@ -32,13 +33,8 @@ class CircuitDiagram(pygame.sprite.Sprite):
     #     a = 1
 
     def set_circuit(self, circuit):
+        # The drawer sizes the figure to the circuit, so it cannot be reused
         circuit_drawing = circuit.draw(output='mpl')
-
-        # TODO: Create a save_fig method that works cross-platform
-        #       and has exception handling
-        filename = 'bell_circuit.png'
-        full_path = file_path('images', filename)
-        circuit_drawing.savefig(full_path)
-
-        self.image, self.rect = load_image('bell_circuit.png', -1)
-        self.image.convert()
+        self.image, self.rect = surface_from_figure(circuit_drawing, -1)
+        plt.close(circuit_drawing)
+        self.dirty = 1
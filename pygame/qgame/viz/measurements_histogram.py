@@ -14,21 +14,25 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from matplotlib.figure import Figure
 import pygame
 from qiskit import BasicAer, QuantumRegister, ClassicalRegister, QuantumCircuit, execute
 from qiskit.tools.visualization import plot_histogram
 
-from .. import load_image, file_path
+from .. import surface_from_figure
 
 DEFAULT_NUM_SHOTS = 1000
+FIGURE_SIZE = (7, 5)  # inches, the plot_histogram default
 
 
-class MeasurementsHistogram(pygame.sprite.Sprite):
+class MeasurementsHistogram(pygame.sprite.DirtySprite):
     """Displays a histogram with measurements"""
     def __init__(self, circuit, num_shots=DEFAULT_NUM_SHOTS):
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
         self.image = None
         self.rect = None
+        # Redrawn by every set_circuit(), not kept by pyplot, so nothing to close
+        self.figure = Figure(figsize=FIGURE_SIZE)
         self.set_circuit(circuit, num_shots)
 
     # def update(self):
@@ -51,10 +55,7 @@ class MeasurementsHistogram(pygame.sprite.Sprite):
         counts = result_sim.get_counts(complete_circuit)
         print(counts)
 
-        histogram = plot_histogram(counts)
-        filename = 'bell_histogram.png'
-        full_path = file_path('images', filename)
-        histogram.savefig(full_path)
-
-        self.image, self.rect = load_image(filename, -1)
-        self.image.convert()
+        self.figure.clf()
+        plot_histogram(counts, ax=self.figure.add_subplot())
+        self.image, self.rect = surface_from_figure(self.figure, -1)
+        self.dirty = 1
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import numpy as np
+import pygame
+from qiskit.quantum_info import Statevector
+
+from ..utils.colors import WHITE, BLACK
+from ..utils.fonts import ARIAL_16
+
+DEFAULT_SIZE = 400  # pixels, width and height
+ELEVATION = np.radians(20)  # the sphere is seen from slightly above the equator
+MAX_MARKER_RADIUS = 24  # pixels, for a basis state of probability 1
+MIN_PROBABILITY = 1e-4  # basis states less likely than this are not drawn
+WIREFRAME_COLOR = 160, 160, 160
+HIDDEN_WIREFRAME_COLOR = 225, 225, 225
+
+
+class NativeQSphere(pygame.sprite.DirtySprite):
+    """Displays a qsphere drawn with pygame, fast enough to redraw on every edit
+
+    Basis states sit on the latitude of their Hamming weight, from |0...0> at
+    the north pole to |1...1> at the south pole. The area of a marker is the
+    probability of its state and its colour the phase, relative to the phase
+    of the most likely state (see the colour wheel in the corner). The
+    wireframe is drawn once per number of qubits and reused as background.
+    """
+    def __init__(self, circuit=None, size=DEFAULT_SIZE):
+        pygame.sprite.DirtySprite.__init__(self)
+        self.size = size
+        self.num_qubits = None
+        self.background = None
+        self.positions = None  # screen position of every basis state
+        self.depths = None  # > 0 for basis states on the front half of the sphere
+        self.labels = {}  # basis state index: rendered label
+        self.image = pygame.Surface((size, size))
+        self.image.fill(WHITE)
+        self.rect = self.image.get_rect()
+        if circuit is not None:
+            self.set_circuit(circuit)
+
+    def set_circuit(self, circuit):
+        self.set_statevector(Statevector.from_instruction(circuit).data)
+
+    def set_statevector(self, quantum_state):
+        quantum_state = np.asarray(quantum_state, dtype=complex)
+        num_qubits = int(np.log2(len(quantum_state)))
+        if num_qubits != self.num_qubits:
+            self.set_num_qubits(num_qubits)
+
+        probabilities = np.abs(quantum_state) ** 2
+        # Phases relative to the most likely state, so a global phase changes nothing
+        reference = quantum_state[np.argmax(probabilities)]
+        phases = np.angle(quantum_state * np.conj(reference)) % (2 * np.pi)
+        colors = phase_colors(phases)
+
+        self.image.blit(self.background, (0, 0))
+        center = self.size // 2, self.size // 2
+        visible = np.flatnonzero(probabilities > MIN_PROBABILITY)
+        # Back to front, and dimmed while behind the sphere
+        for index in visible[np.argsort(self.depths[visible])]:
+            color = tuple(colors[index])
+            if self.depths[index] < 0:
+                color = tuple((np.array(color) + 255) // 2)
+            position = tuple(self.positions[index])
+            radius = max(2, int(round(MAX_MARKER_RADIUS * np.sqrt(probabilities[index]))))
+            pygame.draw.line(self.image, color, center, position, 2)
+            pygame.draw.circle(self.image, color, position, radius)
+            pygame.draw.circle(self.image, BLACK, position, radius, 1)
+            self.image.blit(self.label(index), (position[0] + radius + 2, position[1] - radius))
+        self.dirty = 1
+
+    def set_num_qubits(self, num_qubits):
+        """Lay out the basis states of num_qubits and draw the wireframe behind them"""
+        self.num_qubits = num_qubits
+        self.labels = {}
+        radius = self.sphere_radius()
+        points = basis_state_points(num_qubits)
+        self.positions, self.depths = self.project(points)
+
+        self.background = pygame.Surface((self.size, self.size))
+        self.background.fill(WHITE)
+        center = self.size // 2, self.size // 2
+        pygame.draw.circle(self.background, WIREFRAME_COLOR, center, radius, 1)
+        longitudes = np.linspace(0, 2 * np.pi, 97)
+        for weight in range(1, num_qubits):
+            polar = np.pi * weight / num_qubits
+            self.draw_wire(np.stack([np.sin(polar) * np.cos(longitudes),
+                                     np.sin(polar) * np.sin(longitudes),
+                                     np.full_like(longitudes, np.cos(polar))], axis=1))
+        latitudes = np.linspace(0, np.pi, 49)
+        for longitude in np.arange(4) * np.pi / 4:
+            self.draw_wire(np.stack([np.sin(latitudes) * np.cos(longitude),
+                                     np.sin(latitudes) * np.sin(longitude),
+                                     np.cos(latitudes)], axis=1))
+            self.draw_wire(np.stack([-np.sin(latitudes) * np.cos(longitude),
+                                     -np.sin(latitudes) * np.sin(longitude),
+                                     np.cos(latitudes)], axis=1))
+        draw_phase_wheel(self.background, (self.size - 30, 30), 20)
+
+    def sphere_radius(self):
+        return self.size // 2 - MAX_MARKER_RADIUS - 16
+
+    def project(self, points):
+        """Screen positions and depths of points on the unit sphere"""
+        x, y, z = points[:, 0], points[:, 1], points[:, 2]
+        up = y * np.sin(ELEVATION) + z * np.cos(ELEVATION)
+        depths = -y * np.cos(ELEVATION) + z * np.sin(ELEVATION)
+        positions = np.stack([self.size // 2 + self.sphere_radius() * x,
+                              self.size // 2 - self.sphere_radius() * up], axis=1)
+        return np.round(positions).astype(int), depths
+
+    def draw_wire(self, points):
+        positions, depths = self.project(points)
+        for start in range(len(points) - 1):
+            color = WIREFRAME_COLOR if depths[start] + depths[start + 1] >= 0 \
+                else HIDDEN_WIREFRAME_COLOR
+            pygame.draw.line(self.background, color, tuple(positions[start]),
+                             tuple(positions[start + 1]))
+
+    def label(self, index):
+        if index not in self.labels:
+            self.labels[index] = ARIAL_16.render(
+                format(index, '0{}b'.format(self.num_qubits)), True, BLACK)
+        return self.labels[index]
+
+
+def basis_state_points(num_qubits):
+    """Unit vectors of the basis states, states of equal weight spread around their latitude"""
+    indices = np.arange(2 ** num_qubits)
+    weights = np.array([bin(index).count('1') for index in indices])
+    points = np.zeros((len(indices), 3))
+    for weight in range(num_qubits + 1):
+        members = indices[weights == weight]
+        polar = np.pi * weight / num_qubits
+        longitudes = 2 * np.pi * np.arange(len(members)) / len(members)
+        points[members] = np.stack([np.sin(polar) * np.cos(longitudes),
+                                    np.sin(polar) * np.sin(longitudes),
+                                    np.full(len(members), np.cos(polar))], axis=1)
+    return points
+
+
+def phase_colors(phases):
+    """RGB colours of phases in [0, 2 pi), going once around the hue circle"""
+    hue = phases / (2 * np.pi) * 6
+    sector = np.floor(hue).astype(int) % 6
+    rising = hue - np.floor(hue)
+    falling = 1 - rising
+    ones, zeros = np.ones_like(hue), np.zeros_like(hue)
+    channels = np.choose(sector[None, :], [
+        np.stack([ones, rising, zeros]),
+        np.stack([falling, ones, zeros]),
+        np.stack([zeros, ones, rising]),
+        np.stack([zeros, falling, ones]),
+        np.stack([rising, zeros, ones]),
+        np.stack([ones, zeros, falling]),
+    ])
+    return np.round(channels.T * 255).astype(int)
+
+
+def draw_phase_wheel(surface, center, radius):
+    steps = 36
+    phases = 2 * np.pi * np.arange(steps) / steps
+    for phase, color in zip(phases, phase_colors(phases)):
+        end = (center[0] + radius * np.cos(phase), center[1] - radius * np.sin(phase))
+        pygame.draw.line(surface, tuple(color), center, end, 3)
+    label = ARIAL_16.render('0', True, BLACK)
+    surface.blit(label, (center[0] + radius + 2, center[1] - label.get_height() // 2))
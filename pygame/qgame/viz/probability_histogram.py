@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import numpy as np
+import pygame
+from qiskit.quantum_info import Statevector
+
+from ..utils.colors import WHITE, BLACK, GRAY
+from ..utils.fonts import ARIAL_16
+
+DEFAULT_SIZE = 500, 350  # pixels
+DEFAULT_TOP_K = 16  # most bars shown, the rest of the probability goes to one 'other' bar
+BAR_COLOR = 100, 140, 230
+OTHER_COLOR = 190, 190, 190
+MARGIN = 40  # pixels around the plot area, for the labels
+MIN_OTHER = 1e-9  # smaller remainders are rounding, not an 'other' bar
+
+
+class ProbabilityHistogram(pygame.sprite.DirtySprite):
+    """Displays measurement probabilities as bars drawn with pygame
+
+    The probabilities are exact, taken from the statevector. With num_shots
+    the bars show instead the counts of one multinomial draw of that many
+    shots, to show shot noise without simulating any. Beyond top_k basis
+    states only the top_k most likely are shown, in decreasing order.
+    """
+    def __init__(self, circuit=None, num_shots=None, top_k=DEFAULT_TOP_K, size=DEFAULT_SIZE,
+                 seed=None):
+        pygame.sprite.DirtySprite.__init__(self)
+        self.num_shots = num_shots
+        self.top_k = top_k
+        self.rng = np.random.default_rng(seed)
+        self.labels = {}  # (text, rotated, color): rendered label
+        self.image = pygame.Surface(size)
+        self.image.fill(WHITE)
+        self.rect = self.image.get_rect()
+        if circuit is not None:
+            self.set_circuit(circuit)
+
+    def set_circuit(self, circuit, num_shots=None):
+        self.set_statevector(Statevector.from_instruction(circuit).data, num_shots)
+
+    def set_statevector(self, quantum_state, num_shots=None):
+        """Show the measurement probabilities of quantum_state, or num_shots sampled counts"""
+        num_shots = num_shots or self.num_shots
+        probabilities = np.abs(np.asarray(quantum_state)) ** 2
+        probabilities /= probabilities.sum()
+        num_qubits = int(np.log2(len(probabilities)))
+        if num_shots:
+            values = self.rng.multinomial(num_shots, probabilities) / num_shots
+        else:
+            values = probabilities
+
+        if len(values) > self.top_k:
+            indices = np.argsort(-values, kind='stable')[:self.top_k]
+            names = [format(index, '0{}b'.format(num_qubits)) for index in indices]
+            shown = list(values[indices])
+            other = 1 - sum(shown)
+            if other > MIN_OTHER:
+                names.append('other')
+                shown.append(other)
+        else:
+            names = [format(index, '0{}b'.format(num_qubits)) for index in range(len(values))]
+            shown = list(values)
+        self.draw_bars(names, shown, num_shots)
+        self.dirty = 1
+
+    def draw_bars(self, names, values, num_shots=None):
+        width, height = self.image.get_size()
+        self.image.fill(WHITE)
+        slot = (width - 2 * MARGIN) / len(names)
+        bar_width = max(1, int(slot * 0.7))
+        if num_shots:
+            texts = [str(int(round(value * num_shots))) for value in values]
+        else:
+            texts = ['{:.3f}'.format(value) for value in values]
+        # Labels turn sideways once they no longer fit over and under their bar
+        widest = max(texts + [names[0]], key=len)
+        rotated = ARIAL_16.size(widest)[0] > slot - 2
+        value_labels = [self.label(text, rotated, cache=False) for text in texts]
+        name_labels = [self.label(name, rotated) for name in names]
+
+        title = self.label('{} shots'.format(num_shots) if num_shots else 'exact probabilities',
+                           False, GRAY)
+        self.image.blit(title, (MARGIN, MARGIN // 4))
+        top = MARGIN // 4 + title.get_height() + max(label.get_height() for label in value_labels)
+        bottom = height - max(label.get_height() for label in name_labels) - 8
+        pygame.draw.line(self.image, BLACK, (MARGIN, bottom), (width - MARGIN, bottom))
+        for position, (name, value) in enumerate(zip(names, values)):
+            center = MARGIN + (position + 0.5) * slot
+            bar_height = int(round(value * (bottom - top - 4)))
+            if bar_height:
+                color = OTHER_COLOR if name == 'other' else BAR_COLOR
+                pygame.draw.rect(self.image, color, (int(center - bar_width / 2),
+                                                     bottom - bar_height, bar_width, bar_height))
+            self.blit_centered(name_labels[position], center, bottom + 4)
+            value_label = value_labels[position]
+            self.blit_centered(value_label, center,
+                               bottom - bar_height - 2 - value_label.get_height())
+
+    def blit_centered(self, label, center, top):
+        self.image.blit(label, (int(center - label.get_width() / 2), top))
+
+    def label(self, text, rotated, color=BLACK, cache=True):
+        """Rendered text, kept for reuse unless cache is False"""
+        key = text, rotated, color
+        label = self.labels.get(key)
+        if label is None:
+            label = ARIAL_16.render(text, True, color)
+            if rotated:
+                label = pygame.transform.rotate(label, 90)
+            if cache:
+                self.labels[key] = label
+        return label
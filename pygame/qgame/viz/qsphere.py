@@ -14,19 +14,24 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from matplotlib.figure import Figure
 import pygame
 from qiskit import BasicAer, execute
 from qiskit.tools.visualization import plot_state_qsphere
 
-from .. import load_image, file_path
+from .. import surface_from_figure
 
+FIGURE_SIZE = (7, 7)  # inches, the plot_state_qsphere default
 
-class QSphere(pygame.sprite.Sprite):
+
+class QSphere(pygame.sprite.DirtySprite):
     """Displays a qsphere"""
     def __init__(self, circuit):
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
         self.image = None
         self.rect = None
+        # Redrawn by every set_circuit(), not kept by pyplot, so nothing to close
+        self.figure = Figure(figsize=FIGURE_SIZE)
         self.set_circuit(circuit)
 
     # def update(self):
@@ -39,12 +44,13 @@ class QSphere(pygame.sprite.Sprite):
         result_sim = job_sim.result()
 
         quantum_state = result_sim.get_statevector(circuit, decimals=3)
-        qsphere = plot_state_qsphere(quantum_state)
 
-        filename = 'bell_qsphere.png'
-        full_path = file_path('images', filename)
-        qsphere.savefig(full_path)
+        self.figure.clf()
+        axes = self.figure.add_subplot()
+        plot_state_qsphere(quantum_state, ax=axes)
+        # plot_state_qsphere only takes the figure from axes and adds its own
+        axes.remove()
 
-        self.image, self.rect = load_image(filename, -1)
+        self.image, self.rect = surface_from_figure(self.figure, -1)
         self.rect.inflate_ip(-100, -100)
-        self.image.convert()
+        self.dirty = 1
@@ -21,10 +21,10 @@ from ..utils.fonts import ARIAL_30
 from .. import comp_basis_states
 
 
-class StatevectorGrid(pygame.sprite.Sprite):
+class StatevectorGrid(pygame.sprite.DirtySprite):
     """Displays a statevector grid"""
     def __init__(self, circuit):
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
         self.image = None
         self.rect = None
         self.basis_states = comp_basis_states(circuit.width())
@@ -58,3 +58,5 @@ class StatevectorGrid(pygame.sprite.Sprite):
                                abs(quantum_state[y]) * block_size)
             if abs(quantum_state[y]) > 0:
                 pygame.draw.rect(self.image, BLACK, rect, 1)
+
+        self.dirty = 1
@@ -22,10 +22,10 @@ from ..utils.fonts import ARIAL_16
 from .. import comp_basis_states
 
 
-class UnitaryGrid(pygame.sprite.Sprite):
+class UnitaryGrid(pygame.sprite.DirtySprite):
     """Displays a unitary matrix grid"""
     def __init__(self, circuit):
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
         self.image = None
         self.rect = None
         self.basis_states = comp_basis_states(circuit.width())
@@ -62,4 +62,6 @@ class UnitaryGrid(pygame.sprite.Sprite):
                                    abs(unitary[y][x]) * block_size,
                                    abs(unitary[y][x]) * block_size)
                 if abs(unitary[y][x]) > 0:
-                    pygame.draw.rect(self.image, BLACK, rect, 1)
\ No newline at end of file
+                    pygame.draw.rect(self.image, BLACK, rect, 1)
+
+        self.dirty = 1
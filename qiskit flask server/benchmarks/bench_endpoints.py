@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""Throughput and latency benchmark for the server endpoints
+
+Drives the Flask app in-process through its test client and/or over
+localhost HTTP, with workloads shaped like the real clients:
+
+    qpong       3 x 18 grids as sent by the pygame/Unity QPong
+    unity       3 x 8 grids as sent by CircuitGridClient.cs
+    minetest    tomography QASM as built by q_command:compute_circuit()
+
+Reports requests/sec and p50/p95/p99 latency per endpoint and qubit count,
+and saves them as JSON so that runs can be compared:
+
+    python bench_endpoints.py --mode both --output before.json
+    python bench_endpoints.py --output after.json --compare before.json
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import threading
+import time
+
+# make the server modules importable the same way server.py does
+server_path = Path(__file__).resolve().parent.parent / 'server'
+sys.path.append(str(server_path.parent))
+sys.path.append(str(server_path))
+
+GRID_GATES = ['X', 'Y', 'Z', 'H']
+
+
+def random_gate_string(rng, qubits, depth, density=0.3):
+    return ','.join(rng.choice(GRID_GATES) if rng.random() < density else 'I'
+                    for _ in range(qubits * depth))
+
+
+def tomography_qasm(rng, qubits, depth, basis):
+    """QASM in the shape q_command:compute_circuit() builds, measuring in basis x/y/z"""
+    qasm = 'OPENQASM 2.0;include "qelib1.inc";qreg q[{}];'.format(qubits)
+    qasm += ''.join('creg c{}[1];'.format(wire) for wire in range(qubits))
+    qasm += 'id q;'
+    for _ in range(depth):
+        for wire in range(qubits):
+            roll = rng.random()
+            if roll < 0.15:
+                qasm += '{} q[{}];'.format(rng.choice(['x', 'y', 'z', 'h', 's', 't']), wire)
+            elif roll < 0.2 and qubits > 1:
+                ctrl = rng.choice([other for other in range(qubits) if other != wire])
+                qasm += 'cx q[{}],q[{}];'.format(ctrl, wire)
+    for wire in range(qubits):
+        if basis == 'x':
+            qasm += 'ry({}) q[{}];'.format(-1.5707963267948966, wire)
+        elif basis == 'y':
+            qasm += 'rx({}) q[{}];'.format(1.5707963267948966, wire)
+        qasm += 'measure q[{}] -> c{}[0];'.format(wire, wire)
+    return qasm
+
+
+def build_workloads(rng, distinct):
+    """(workload, endpoint, qubits, list of request specs) tuples
+
+    A request spec is (method, path, query args, form data).
+    """
+    workloads = []
+    for name, qubits, depth in (('qpong', 3, 18), ('unity', 3, 8)):
+        dimension = '{},{}'.format(qubits, depth)
+        forms = [{'circuit_dimension': dimension,
+                  'gate_array': random_gate_string(rng, qubits, depth)}
+                 for _ in range(distinct)]
+        for path in ('/api/run/get_statevector', '/api/run/do_measurement'):
+            workloads.append((name, path, qubits, [('POST', path, None, form) for form in forms]))
+
+    for qubits in (2, 3, 5):
+        qasms = [tomography_qasm(rng, qubits, 8, rng.choice('xyz')) for _ in range(distinct)]
+        workloads.append(('minetest', '/api/run/qasm', qubits,
+                          [('GET', '/api/run/qasm',
+                            {'qasm': qasm, 'backend': 'qasm_simulator', 'num_shots': 1000},
+                            None) for qasm in qasms]))
+        workloads.append(('minetest', '/api/run/tomography', qubits,
+                          [('GET', '/api/run/tomography', {'qasm': qasm, 'measure': 1}, None)
+                           for qasm in qasms]))
+    return workloads
+
+
+class InProcessClient:
+    def __init__(self):
+        import server
+        self.client = server.app.test_client()
+
+    def send(self, method, path, args, form):
+        if method == 'GET':
+            response = self.client.get(path, query_string=args)
+        else:
+            response = self.client.post(path, data=form)
+        return response.status_code
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def send(self, method, path, args, form):
+        url = self.base_url + path
+        if args:
+            url += '?' + urlencode(args)
+        data = urlencode(form).encode() if form is not None else None
+        try:
+            with urlopen(Request(url, data=data, method=method)) as response:
+                response.read()
+                return response.status
+        except HTTPError as error:
+            return error.code
+
+
+def start_local_server(port):
+    """Serve the Flask app on localhost from a background thread"""
+    from werkzeug.serving import make_server
+    import server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    http_server = make_server('127.0.0.1', port, server.app, threaded=True)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    return http_server
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_workload(client, specs, num_requests, warmup, concurrency):
+    for spec in specs[:warmup]:
+        client.send(*spec)
+
+    def timed_send(spec):
+        start = time.perf_counter()
+        status = client.send(*spec)
+        return time.perf_counter() - start, status
+
+    requests = [specs[idx % len(specs)] for idx in range(num_requests)]
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(timed_send, requests))
+    else:
+        results = [timed_send(spec) for spec in requests]
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'requests': num_requests,
+        'errors': sum(1 for _, status in results if status >= 400),
+        'requests_per_second': num_requests / elapsed if elapsed else 0.0,
+        'mean_ms': 1000 * sum(latencies) / len(latencies),
+        'p50_ms': 1000 * percentile(latencies, 0.50),
+        'p95_ms': 1000 * percentile(latencies, 0.95),
+        'p99_ms': 1000 * percentile(latencies, 0.99),
+    }
+
+
+def print_results(results, baseline=None):
+    baseline_rps = {}
+    if baseline:
+        baseline_rps = {(entry['mode'], entry['workload'], entry['endpoint'], entry['qubits']):
+                        entry['requests_per_second'] for entry in baseline['results']}
+    header = '{:<10} {:<9} {:<26} {:>6} {:>10} {:>9} {:>9} {:>9}'.format(
+        'mode', 'workload', 'endpoint', 'qubits', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms')
+    print(header + ('  vs baseline' if baseline else ''))
+    for entry in results:
+        line = '{mode:<10} {workload:<9} {endpoint:<26} {qubits:>6} {requests_per_second:>10.1f} ' \
+               '{p50_ms:>9.3f} {p95_ms:>9.3f} {p99_ms:>9.3f}'.format(**entry)
+        key = (entry['mode'], entry['workload'], entry['endpoint'], entry['qubits'])
+        if key in baseline_rps and baseline_rps[key]:
+            line += '  x{:.2f}'.format(entry['requests_per_second'] / baseline_rps[key])
+        if entry['errors']:
+            line += '  ({} errors)'.format(entry['errors'])
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=['inprocess', 'http', 'both'], default='inprocess')
+    parser.add_argument('--url', help='benchmark a running server instead of starting one')
+    parser.add_argument('--port', type=int, default=8018,
+                        help='port for the server started for http mode')
+    parser.add_argument('--requests', type=int, default=500, help='requests per workload')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--distinct', type=int, default=50,
+                        help='distinct circuits per workload, fewer means more cache hits')
+    parser.add_argument('--concurrency', type=int, default=1, help='client threads in http mode')
+    parser.add_argument('--endpoint', action='append',
+                        help='only run workloads for this endpoint path (repeatable)')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', help='save results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare against')
+    args = parser.parse_args()
+
+    workloads = build_workloads(random.Random(args.seed), args.distinct)
+    if args.endpoint:
+        workloads = [workload for workload in workloads if workload[1] in args.endpoint]
+
+    clients = []
+    http_server = None
+    if args.mode in ('inprocess', 'both'):
+        clients.append(('inprocess', InProcessClient(), 1))
+    if args.mode in ('http', 'both'):
+        url = args.url
+        if url is None:
+            http_server = start_local_server(args.port)
+            url = 'http://127.0.0.1:{}'.format(args.port)
+        clients.append(('http', HttpClient(url), args.concurrency))
+
+    results = []
+    # server.py prints every request it handles, keep that out of the report
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            for mode, client, concurrency in clients:
+                for workload, endpoint, qubits, specs in workloads:
+                    stats = run_workload(client, specs, args.requests, args.warmup, concurrency)
+                    results.append(dict(mode=mode, workload=workload, endpoint=endpoint,
+                                        qubits=qubits, **stats))
+        finally:
+            if http_server is not None:
+                http_server.shutdown()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(results, baseline)
+
+    if args.output:
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'settings': vars(args),
+            'results': results,
+        }
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
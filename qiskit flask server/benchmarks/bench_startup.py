@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Import time and time-to-ready benchmark for the server
+
+Every measurement runs in a fresh interpreter, so it includes the real cold
+import cost of the modules:
+
+    import      seconds to import each server module, best and median of --repeat
+    listening   seconds from starting server.py until /health answers
+    ready       seconds from starting server.py until /ready answers 200
+
+    python bench_startup.py --output before.json
+    python bench_startup.py --compare before.json --max-import-seconds 0.5
+
+With --max-import-seconds the script exits with status 1 when importing
+server takes longer, so it can guard against a heavy import creeping back
+into the startup path. --importtime lists the slowest modules behind it.
+"""
+from pathlib import Path
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+server_path = Path(__file__).resolve().parent.parent / 'server'
+
+MODULES = ['formats', 'engine.statevector', 'api', 'server']
+
+# server.py and api.py find the project the same way, relative to the working directory
+IMPORT_SNIPPET = '''
+import sys, time
+sys.path.append('..')
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+'''
+
+
+def import_seconds(module):
+    output = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET.format(module=module)],
+                            cwd=str(server_path), check=True, capture_output=True, text=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module, count):
+    """(cumulative seconds, module name) of the slowest imports reported by -X importtime"""
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                             IMPORT_SNIPPET.format(module=module)],
+                            cwd=str(server_path), check=True, capture_output=True, text=True)
+    timings = []
+    for line in output.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        timings.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(timings, reverse=True)[:count]
+
+
+def status_of(url):
+    try:
+        with urlopen(url, timeout=1) as response:
+            return response.status
+    except HTTPError as error:
+        return error.code
+    except (URLError, ConnectionError, OSError):
+        return None
+
+
+def startup_seconds(port, timeout):
+    """Seconds until /health and /ready first answer 200 for a freshly started server.py"""
+    command = [sys.executable, '-c',
+               'import sys; sys.path.append(".."); import server; '
+               'server.app.run(host="127.0.0.1", port={})'.format(port)]
+    process = subprocess.Popen(command, cwd=str(server_path),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = 'http://127.0.0.1:{}'.format(port)
+    start = time.perf_counter()
+    listening = None
+    try:
+        while time.perf_counter() - start < timeout:
+            if listening is None and status_of(base_url + '/health') == 200:
+                listening = time.perf_counter() - start
+            if listening is not None and status_of(base_url + '/ready') == 200:
+                return listening, time.perf_counter() - start
+            if process.poll() is not None:
+                raise RuntimeError('server.py exited with status {}'.format(process.returncode))
+            time.sleep(0.01)
+        raise RuntimeError('server.py was not ready after {} seconds'.format(timeout))
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per measurement')
+    parser.add_argument('--port', type=int, default=8019)
+    parser.add_argument('--timeout', type=float, default=60.0,
+                        help='seconds to wait for the server to become ready')
+    parser.add_argument('--skip-server', action='store_true',
+                        help='only measure imports, do not start server.py')
+    parser.add_argument('--importtime', type=int, default=0, metavar='COUNT',
+                        help='list the COUNT slowest modules imported by server')
+    parser.add_argument('--max-import-seconds', type=float,
+                        help='exit with status 1 if importing server takes longer (median)')
+    parser.add_argument('--output', help='save results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare against')
+    args = parser.parse_args()
+
+    results = {}
+    for module in MODULES:
+        timings = sorted(import_seconds(module) for _ in range(args.repeat))
+        results['import ' + module] = {'best': timings[0], 'median': statistics.median(timings)}
+    if not args.skip_server:
+        startups = [startup_seconds(args.port, args.timeout) for _ in range(args.repeat)]
+        for name, timings in (('listening', [listening for listening, _ in startups]),
+                              ('ready', [ready for _, ready in startups])):
+            timings.sort()
+            results[name] = {'best': timings[0], 'median': statistics.median(timings)}
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+    print('{:<28} {:>10} {:>10}'.format('measurement', 'best s', 'median s') +
+          ('  vs baseline' if baseline else ''))
+    for name, timings in results.items():
+        line = '{:<28} {best:>10.3f} {median:>10.3f}'.format(name, **timings)
+        if baseline.get(name, {}).get('median'):
+            line += '  x{:.2f}'.format(timings['median'] / baseline[name]['median'])
+        print(line)
+
+    if args.importtime:
+        print()
+        print('slowest imports behind server:')
+        for seconds, name in slowest_imports('server', args.importtime):
+            print('{:>10.3f}  {}'.format(seconds, name))
+
+    if args.output:
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'settings': vars(args),
+            'results': results,
+        }
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if args.max_import_seconds is not None and \
+            results['import server']['median'] > args.max_import_seconds:
+        print('importing server took {:.3f} s, more than the {} s allowed'.format(
+            results['import server']['median'], args.max_import_seconds))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
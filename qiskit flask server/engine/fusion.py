@@ -0,0 +1,217 @@
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Peephole optimizer and gate fusion for engine operations
+
+optimize() turns a list of Operations into fewer kernel applications:
+
+1. identities are dropped, and adjacent inverse pairs on the same qubits
+   (H.H, X.X, CX.CX, S.SDG, SWAP.SWAP, ...) cancel
+2. the remaining gates are greedily fused into blocks of at most
+   FUSION_MAX_QUBITS qubits, each applied as one dense matrix, so a run of
+   single-qubit gates on a wire or a column of gates on disjoint wires
+   costs one kernel call instead of one per gate
+"""
+from collections import namedtuple
+import functools
+
+import numpy as np
+
+from engine import gates
+
+# Blocks of 3 qubits cost about the same per kernel call as a single-qubit
+# gate on wide states, and their 8 x 8 matrices are cheap to build
+FUSION_MAX_QUBITS = 3
+IDENTITY_ATOL = 1e-12
+
+# A matrix applied to targets (first target as most significant bit) under controls
+FusedOperation = namedtuple('FusedOperation', ['matrix', 'targets', 'controls'])
+
+INVERSES = {
+    'x': 'x',
+    'y': 'y',
+    'z': 'z',
+    'h': 'h',
+    'swap': 'swap',
+    's': 'sdg',
+    'sdg': 's',
+    't': 'tdg',
+    'tdg': 't',
+}
+
+
+def optimize(operations, max_qubits=FUSION_MAX_QUBITS):
+    """FusedOperations with the same effect on a statevector as operations"""
+    return fuse(cancel_inverses(operations), max_qubits)
+
+
+def cancel_inverses(operations):
+    """Drop identities and adjacent pairs of operations that undo each other"""
+    kept = []
+    stacks = {}  # qubit: indices into kept of operations on it, latest last
+    for operation in operations:
+        if operation.gate == 'id':
+            continue
+        qubits = operation.targets + operation.controls
+        latest = {stacks[qubit][-1] if stacks.get(qubit) else None for qubit in qubits}
+        if len(latest) == 1:
+            index = latest.pop()
+            if index is not None and _cancels(kept[index], operation):
+                kept[index] = None
+                for qubit in qubits:
+                    stacks[qubit].pop()
+                continue
+        for qubit in qubits:
+            stacks.setdefault(qubit, []).append(len(kept))
+        kept.append(operation)
+    return [operation for operation in kept if operation is not None]
+
+
+def fuse(operations, max_qubits=FUSION_MAX_QUBITS):
+    """Greedily merge operations into blocks of at most max_qubits qubits"""
+    fused = []
+    open_blocks = {}  # qubit: the open _Block holding it
+    for operation in operations:
+        qubits = operation.controls + operation.targets
+        blocks = _distinct(open_blocks.get(qubit) for qubit in qubits)
+        block_qubits = [qubit for block in blocks for qubit in block.qubits]
+        new_qubits = [qubit for qubit in qubits if qubit not in block_qubits]
+        if len(block_qubits) + len(new_qubits) <= max_qubits:
+            block = _Block.merge(blocks, new_qubits)
+        else:
+            for block in blocks:
+                for qubit in block.qubits:
+                    del open_blocks[qubit]
+                block.emit(fused)
+            if len(qubits) > max_qubits:
+                _Block.merge([], list(qubits)).add(operation).emit(fused)
+                continue
+            block = _Block.merge([], list(qubits))
+        block.add(operation)
+        for qubit in block.qubits:
+            open_blocks[qubit] = block
+
+    # Blocks left open act on disjoint qubits, pack them together as well
+    bins = []
+    for block in _distinct(open_blocks.values()):
+        for bin_blocks in bins:
+            if sum(len(other.qubits) for other in bin_blocks) + len(block.qubits) <= max_qubits:
+                bin_blocks.append(block)
+                break
+        else:
+            bins.append([block])
+    for bin_blocks in bins:
+        _Block.merge(bin_blocks, []).emit(fused)
+    return fused
+
+
+class _Block:
+    """Operations on a few qubits, multiplied into one matrix once there are two"""
+    def __init__(self, qubits):
+        self.qubits = qubits  # matrix order, the first qubit is the most significant bit
+        self.operations = []
+        self.matrix = None
+
+    @classmethod
+    def merge(cls, blocks, new_qubits):
+        if len(blocks) == 1 and not new_qubits:
+            return blocks[0]
+        block = cls([qubit for other in blocks for qubit in other.qubits] + list(new_qubits))
+        if any(other.operations for other in blocks):
+            matrix = np.ones((1, 1), dtype=complex)
+            for other in blocks:
+                matrix = _kron(matrix, other.full_matrix())
+            block.matrix = _kron(matrix, np.eye(2 ** len(new_qubits), dtype=complex))
+            block.operations = [operation for other in blocks for operation in other.operations]
+        return block
+
+    def add(self, operation):
+        if self.operations or len(self.qubits) > len(operation.targets + operation.controls):
+            self.matrix = self.full_matrix()
+        if self.matrix is not None:
+            self.matrix = _embedded_matrix(operation, tuple(self.qubits)) @ self.matrix
+        self.operations.append(operation)
+        return self
+
+    def full_matrix(self):
+        if self.matrix is not None:
+            return self.matrix
+        if self.operations:
+            return _embedded_matrix(self.operations[0], tuple(self.qubits))
+        return np.eye(2 ** len(self.qubits), dtype=complex)
+
+    def emit(self, fused):
+        if len(self.operations) == 1 and self.matrix is None:
+            operation = self.operations[0]
+            fused.append(FusedOperation(gates.gate_matrix(operation.gate, operation.radians),
+                                        operation.targets, operation.controls))
+        elif self.operations:
+            matrix = self.full_matrix()
+            if np.abs(matrix - np.eye(len(matrix))).max() > IDENTITY_ATOL:
+                fused.append(FusedOperation(matrix, tuple(self.qubits), ()))
+
+
+def _embedded_matrix(operation, qubits):
+    return _embed(operation.gate, operation.radians,
+                  tuple(qubits.index(qubit) for qubit in operation.controls),
+                  tuple(qubits.index(qubit) for qubit in operation.targets),
+                  len(qubits))
+
+
+@functools.lru_cache(maxsize=4096)
+def _embed(gate, radians, control_positions, target_positions, num_qubits):
+    """Matrix over num_qubits block positions of a gate on the given positions"""
+    gate_matrix = gates.gate_matrix(gate, radians)
+    num_controls = len(control_positions)
+    # Controls as the most significant bits: only the all-ones block holds the gate
+    size = 2 ** (num_controls + len(target_positions))
+    matrix = np.eye(size, dtype=complex)
+    matrix[size - len(gate_matrix):, size - len(gate_matrix):] = gate_matrix
+
+    positions = list(control_positions + target_positions)
+    rest = [position for position in range(num_qubits) if position not in positions]
+    matrix = _kron(matrix, np.eye(2 ** len(rest), dtype=complex))
+    order = np.argsort(positions + rest)
+    tensor = matrix.reshape((2,) * (2 * num_qubits))
+    tensor = tensor.transpose(list(order) + [num_qubits + axis for axis in order])
+    matrix = np.ascontiguousarray(tensor.reshape(2 ** num_qubits, 2 ** num_qubits))
+    matrix.setflags(write=False)
+    return matrix
+
+
+def _kron(a, b):
+    """np.kron for square matrices, without its overhead for small ones"""
+    return (a[:, None, :, None] * b[None, :, None, :]).reshape(
+        len(a) * len(b), len(a) * len(b))
+
+
+def _cancels(first, second):
+    return INVERSES.get(first.gate) == second.gate and \
+        _qubit_signature(first) == _qubit_signature(second)
+
+
+def _qubit_signature(operation):
+    targets = operation.targets
+    if operation.gate == 'swap':
+        targets = tuple(sorted(targets))
+    return targets, tuple(sorted(operation.controls))
+
+
+def _distinct(blocks):
+    seen = []
+    for block in blocks:
+        if block is not None and all(block is not other for other in seen):
+            seen.append(block)
+    return seen
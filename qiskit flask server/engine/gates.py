@@ -0,0 +1,78 @@
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Gate matrices used by the statevector engine
+
+Multi-qubit matrices are written with the first target as the most
+significant bit, e.g. SWAP acts on (targets[0], targets[1]).
+"""
+import numpy as np
+
+SQRT_HALF = 1 / np.sqrt(2)
+
+I = np.array([[1, 0], [0, 1]], dtype=complex)
+X = np.array([[0, 1], [1, 0]], dtype=complex)
+Y = np.array([[0, -1j], [1j, 0]], dtype=complex)
+Z = np.array([[1, 0], [0, -1]], dtype=complex)
+H = np.array([[SQRT_HALF, SQRT_HALF], [SQRT_HALF, -SQRT_HALF]], dtype=complex)
+S = np.array([[1, 0], [0, 1j]], dtype=complex)
+SDG = np.array([[1, 0], [0, -1j]], dtype=complex)
+T = np.array([[1, 0], [0, np.exp(1j * np.pi / 4)]], dtype=complex)
+TDG = np.array([[1, 0], [0, np.exp(-1j * np.pi / 4)]], dtype=complex)
+SWAP = np.array([[1, 0, 0, 0],
+                 [0, 0, 1, 0],
+                 [0, 1, 0, 0],
+                 [0, 0, 0, 1]], dtype=complex)
+
+
+def rx(theta):
+    cos, sin = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[cos, -1j * sin], [-1j * sin, cos]], dtype=complex)
+
+
+def ry(theta):
+    cos, sin = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[cos, -sin], [sin, cos]], dtype=complex)
+
+
+def rz(theta):
+    return np.array([[np.exp(-0.5j * theta), 0], [0, np.exp(0.5j * theta)]], dtype=complex)
+
+
+FIXED_GATES = {
+    'id': I,
+    'x': X,
+    'y': Y,
+    'z': Z,
+    'h': H,
+    's': S,
+    'sdg': SDG,
+    't': T,
+    'tdg': TDG,
+    'swap': SWAP,
+}
+
+ROTATION_GATES = {
+    'rx': rx,
+    'ry': ry,
+    'rz': rz,
+}
+
+
+def gate_matrix(gate, radians=0.0):
+    """Return the matrix of a named gate, evaluating rotations at radians"""
+    if gate in ROTATION_GATES:
+        return ROTATION_GATES[gate](radians)
+    return FIXED_GATES[gate]
@@ -0,0 +1,293 @@
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Parser for the OpenQASM 2.0 subset produced by the Minetest q_command blocks
+
+Gates are translated into statevector engine operations, so programs can be
+simulated without qiskit.
+"""
+from collections import namedtuple, OrderedDict
+import ast
+import math
+import operator
+import re
+
+import numpy as np
+
+from engine.statevector import Operation
+
+# QASM gate name: (engine gate, number of leading control arguments, number of targets)
+QASM_GATES = {
+    'id': ('id', 0, 1),
+    'x': ('x', 0, 1),
+    'y': ('y', 0, 1),
+    'z': ('z', 0, 1),
+    'h': ('h', 0, 1),
+    's': ('s', 0, 1),
+    'sdg': ('sdg', 0, 1),
+    't': ('t', 0, 1),
+    'tdg': ('tdg', 0, 1),
+    'rx': ('rx', 0, 1),
+    'ry': ('ry', 0, 1),
+    'rz': ('rz', 0, 1),
+    'cx': ('x', 1, 1),
+    'cy': ('y', 1, 1),
+    'cz': ('z', 1, 1),
+    'ch': ('h', 1, 1),
+    'crz': ('rz', 1, 1),
+    'ccx': ('x', 2, 1),
+    'swap': ('swap', 0, 2),
+    'cswap': ('swap', 1, 2),
+}
+
+# kind is 'gate', 'measure' or 'reset'; clbit is only set for measurements and
+# condition is (creg name, value) for statements guarded by if(creg==value)
+Instruction = namedtuple('Instruction', ['kind', 'operation', 'clbit', 'condition'])
+
+_ARGUMENT = re.compile(r'^([A-Za-z_]\w*)(?:\[(\d+)\])?$')
+_STATEMENT = re.compile(r'^([A-Za-z_]\w*)\s*(?:\((.*)\))?\s*(.*)$', re.DOTALL)
+_CONDITION = re.compile(r'^if\s*\(\s*([A-Za-z_]\w*)\s*==\s*(\d+)\s*\)\s*(.*)$', re.DOTALL)
+_REGISTER = re.compile(r'^([qc])reg\s+([A-Za-z_]\w*)\s*\[\s*(\d+)\s*\]$')
+
+# Operands are floats, so no parameter builds huge integers such as 9**9**8
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: math.pow,
+}
+# Gate parameters are short expressions such as -pi/2, anything beyond these is refused
+MAX_PARAMETER_LENGTH = 256  # characters
+MAX_PARAMETER_NODES = 64  # syntax tree nodes
+MAX_EXPONENT = 64
+
+
+class QasmProgram:
+    """Registers and instructions of a parsed QASM program"""
+    def __init__(self):
+        self.qregs = OrderedDict()  # name: (offset, size)
+        self.cregs = OrderedDict()
+        self.instructions = []
+
+    @property
+    def num_qubits(self):
+        return sum(size for _, size in self.qregs.values())
+
+    @property
+    def num_clbits(self):
+        return sum(size for _, size in self.cregs.values())
+
+    def has_terminal_measurements(self):
+        """True when the program is unitary apart from final measurements
+
+        Resets of qubits that no gate has touched yet are allowed, as they are
+        no-ops on |0>.
+        """
+        touched = set()
+        measured = set()
+        for instruction in self.instructions:
+            qubits = instruction.operation.targets + instruction.operation.controls
+            if instruction.condition is not None:
+                return False
+            if instruction.kind == 'measure':
+                measured.update(qubits)
+            elif measured.intersection(qubits):
+                return False
+            elif instruction.kind == 'reset' and touched.intersection(qubits):
+                return False
+            elif instruction.kind == 'gate':
+                touched.update(qubits)
+        return True
+
+    def gate_operations(self):
+        """Engine operations of a program that has_terminal_measurements()"""
+        return [instruction.operation for instruction in self.instructions
+                if instruction.kind == 'gate']
+
+    def measurements(self):
+        """(qubit, clbit) pairs, the last measurement into a clbit wins"""
+        clbit_sources = OrderedDict()
+        for instruction in self.instructions:
+            if instruction.kind == 'measure':
+                clbit_sources[instruction.clbit] = instruction.operation.targets[0]
+        return [(qubit, clbit) for clbit, qubit in clbit_sources.items()]
+
+    def count_key(self, basis_index):
+        """Count key in qiskit's format for a measured basis state index
+
+        Registers are separated by spaces with the last declared one first.
+        Without classical registers the whole basis state is returned.
+        """
+        if not self.cregs:
+            return format(basis_index, '0{}b'.format(self.num_qubits))
+        return self.clbit_key(self.clbit_value(basis_index))
+
+    def clbit_value(self, basis_index):
+        """Classical bits after measuring a basis state, as an integer with clbit 0 lowest
+
+        basis_index may also be an integer ndarray of basis state indices.
+        """
+        value = basis_index & 0
+        for qubit, clbit in self.measurements():
+            value |= ((basis_index >> qubit) & 1) << clbit
+        return value
+
+    def clbit_key(self, value):
+        """Count key in qiskit's format for the classical bits given by clbit_value()"""
+        register_strings = []
+        for offset, size in reversed(self.cregs.values()):
+            register_strings.append(format((value >> offset) & ((1 << size) - 1),
+                                           '0{}b'.format(size)))
+        return ' '.join(register_strings)
+
+
+def normalize(qasm_string):
+    """QASM text without comments and with each statement's whitespace collapsed
+
+    Texts that only differ in comments, line breaks or indentation normalize
+    to the same string.
+    """
+    text = re.sub(r'//[^\n]*', '', qasm_string)
+    statements = (' '.join(statement.split()) for statement in text.split(';'))
+    return ''.join(statement + ';' for statement in statements if statement)
+
+
+def parse(qasm_string):
+    """Parse QASM text into a QasmProgram, raising ValueError for anything unsupported"""
+    program = QasmProgram()
+    for statement in normalize(qasm_string).split(';'):
+        if not statement or statement.startswith('OPENQASM') or statement.startswith('include'):
+            continue
+        _parse_statement(program, statement)
+    if not program.qregs:
+        raise ValueError('no qreg declared')
+    return program
+
+
+def _parse_statement(program, statement, condition=None):
+    register_match = _REGISTER.match(statement)
+    if register_match:
+        kind, name, size = register_match.groups()
+        registers = program.qregs if kind == 'q' else program.cregs
+        offset = program.num_qubits if kind == 'q' else program.num_clbits
+        registers[name] = (offset, int(size))
+        return
+
+    condition_match = _CONDITION.match(statement)
+    if condition_match:
+        creg, value, rest = condition_match.groups()
+        if creg not in program.cregs:
+            raise ValueError('unknown creg: {}'.format(creg))
+        _parse_statement(program, rest, (creg, int(value)))
+        return
+
+    if statement.startswith('measure'):
+        source, _, destination = statement[len('measure'):].partition('->')
+        qubits = _bits(program.qregs, source)
+        clbits = _bits(program.cregs, destination)
+        if len(qubits) != len(clbits):
+            raise ValueError('measure size mismatch: {}'.format(statement))
+        for qubit, clbit in zip(qubits, clbits):
+            program.instructions.append(
+                Instruction('measure', Operation('measure', 0.0, (qubit,), ()), clbit, condition))
+        return
+
+    statement_match = _STATEMENT.match(statement)
+    if not statement_match:
+        raise ValueError('cannot parse: {}'.format(statement))
+    name, params, arguments = statement_match.groups()
+
+    if name == 'barrier':
+        return
+    if name == 'reset':
+        for qubit in _bits(program.qregs, arguments):
+            program.instructions.append(
+                Instruction('reset', Operation('reset', 0.0, (qubit,), ()), None, condition))
+        return
+    if name not in QASM_GATES:
+        raise ValueError('unsupported gate: {}'.format(name))
+
+    gate, num_controls, num_targets = QASM_GATES[name]
+    radians = evaluate_parameter(params) if params else 0.0
+    argument_bits = [_bits(program.qregs, argument) for argument in arguments.split(',')]
+    if len(argument_bits) != num_controls + num_targets:
+        raise ValueError('{} takes {} qubit arguments: {}'.format(
+            name, num_controls + num_targets, statement))
+    # A whole register as argument applies the gate once per qubit of the register
+    width = max(len(bits) for bits in argument_bits)
+    if any(len(bits) not in (1, width) for bits in argument_bits):
+        raise ValueError('register size mismatch: {}'.format(statement))
+    for idx in range(width):
+        qubits = [bits[idx] if len(bits) > 1 else bits[0] for bits in argument_bits]
+        if len(set(qubits)) != len(qubits):
+            raise ValueError('repeated qubit argument: {}'.format(statement))
+        operation = Operation(gate, radians, tuple(qubits[num_controls:]),
+                              tuple(qubits[:num_controls]))
+        program.instructions.append(Instruction('gate', operation, None, condition))
+
+
+def _bits(registers, argument):
+    match = _ARGUMENT.match(argument.strip())
+    if not match or match.group(1) not in registers:
+        raise ValueError('unknown register argument: {}'.format(argument.strip()))
+    offset, size = registers[match.group(1)]
+    if match.group(2) is None:
+        return list(range(offset, offset + size))
+    index = int(match.group(2))
+    if index >= size:
+        raise ValueError('index out of range: {}'.format(argument.strip()))
+    return [offset + index]
+
+
+def evaluate_parameter(expression):
+    """Evaluate a gate parameter such as '-pi/2' or '0.785398' without eval()
+
+    Raises ValueError for anything but a finite real number built from
+    literals, pi, + - * / and ** with an exponent of at most MAX_EXPONENT.
+    """
+    def evaluate(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return float(node.value)
+        if isinstance(node, ast.Name) and node.id == 'pi':
+            return np.pi
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            value = evaluate(node.operand)
+            return -value if isinstance(node.op, ast.USub) else value
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+            left, right = evaluate(node.left), evaluate(node.right)
+            # math.pow raises a bare ValueError for 0**-1 and (-8)**(1/3)
+            if isinstance(node.op, ast.Pow) and (abs(right) > MAX_EXPONENT or
+                                                 (left == 0 and right < 0) or
+                                                 (left < 0 and not right.is_integer())):
+                raise ValueError('unsupported power in parameter: {}'.format(expression))
+            return _BINARY_OPERATORS[type(node.op)](left, right)
+        raise ValueError('unsupported parameter: {}'.format(expression))
+
+    if len(expression) > MAX_PARAMETER_LENGTH:
+        raise ValueError('parameter too long: {}...'.format(expression[:32]))
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError:
+        raise ValueError('unsupported parameter: {}'.format(expression))
+    if sum(1 for _ in ast.walk(tree)) > MAX_PARAMETER_NODES:
+        raise ValueError('parameter too complex: {}'.format(expression))
+    try:
+        value = evaluate(tree.body)
+    except (ZeroDivisionError, OverflowError):
+        raise ValueError('parameter is not a finite number: {}'.format(expression))
+    if not math.isfinite(value):
+        raise ValueError('parameter is not a finite number: {}'.format(expression))
+    return value
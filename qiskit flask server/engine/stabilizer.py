@@ -0,0 +1,286 @@
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Stabilizer tableau simulator for circuits made of Clifford gates only
+
+Follows Aaronson and Gottesman, "Improved simulation of stabilizer circuits"
+(2004): the state of n qubits is kept as n destabilizer and n stabilizer
+Pauli rows, so memory is O(n**2) and each gate is O(n), instead of the 2**n
+amplitudes of the statevector engine.
+
+Besides H, S, SDG, X, Y, Z, CX, CY, CZ and SWAP, rotations by multiples of
+pi/2 are accepted, as they equal a Clifford gate up to a global phase. That
+covers the basis changes Minetest adds before measuring in X or Y.
+"""
+import numpy as np
+
+# Engine gate: largest number of controls it may have and still be Clifford
+CLIFFORD_GATES = {
+    'id': 0,
+    'x': 1,
+    'y': 1,
+    'z': 1,
+    'h': 0,
+    's': 0,
+    'sdg': 0,
+    'swap': 0,
+    'rx': 0,
+    'ry': 0,
+    'rz': 0,
+}
+ROTATION_ATOL = 1e-9
+
+
+def is_clifford(operations):
+    """True when every operation can be run on a Tableau"""
+    for operation in operations:
+        if len(operation.controls) > CLIFFORD_GATES.get(operation.gate, -1):
+            return False
+        if operation.gate in ('rx', 'ry', 'rz') and quarter_turns(operation.radians) is None:
+            return False
+    return True
+
+
+def quarter_turns(radians):
+    """radians as a number of quarter turns in range(4), None if not a multiple of pi/2"""
+    turns = round(radians / (np.pi / 2))
+    if abs(radians - turns * np.pi / 2) > ROTATION_ATOL:
+        return None
+    return turns % 4
+
+
+class Tableau:
+    """Destabilizer rows 0..n-1 and stabilizer rows n..2n-1 of a stabilizer state
+
+    Row i stands for the Pauli operator (-1)**r[i] * prod_q P(x[i, q], z[i, q])
+    with P(1, 0) = X, P(0, 1) = Z and P(1, 1) = Y. It starts in |0...0>.
+    """
+    def __init__(self, num_qubits):
+        self.num_qubits = num_qubits
+        self.x = np.zeros((2 * num_qubits, num_qubits), dtype=bool)
+        self.z = np.zeros((2 * num_qubits, num_qubits), dtype=bool)
+        self.r = np.zeros(2 * num_qubits, dtype=bool)
+        self.x[np.arange(num_qubits), np.arange(num_qubits)] = True
+        self.z[np.arange(num_qubits, 2 * num_qubits), np.arange(num_qubits)] = True
+
+    def copy(self):
+        tableau = Tableau.__new__(Tableau)
+        tableau.num_qubits = self.num_qubits
+        tableau.x = self.x.copy()
+        tableau.z = self.z.copy()
+        tableau.r = self.r.copy()
+        return tableau
+
+    def h(self, qubit):
+        x, z = self.x[:, qubit], self.z[:, qubit]
+        self.r ^= x & z
+        self.x[:, qubit], self.z[:, qubit] = z.copy(), x.copy()
+
+    def s(self, qubit):
+        x, z = self.x[:, qubit], self.z[:, qubit]
+        self.r ^= x & z
+        z ^= x
+
+    def sdg(self, qubit):
+        x, z = self.x[:, qubit], self.z[:, qubit]
+        self.r ^= x & ~z
+        z ^= x
+
+    def pauli_x(self, qubit):
+        self.r ^= self.z[:, qubit]
+
+    def pauli_y(self, qubit):
+        self.r ^= self.x[:, qubit] ^ self.z[:, qubit]
+
+    def pauli_z(self, qubit):
+        self.r ^= self.x[:, qubit]
+
+    def cx(self, control, target):
+        x_c, z_c = self.x[:, control], self.z[:, control]
+        x_t, z_t = self.x[:, target], self.z[:, target]
+        self.r ^= x_c & z_t & ~(x_t ^ z_c)
+        x_t ^= x_c
+        z_c ^= z_t
+
+    def cy(self, control, target):
+        self.sdg(target)
+        self.cx(control, target)
+        self.s(target)
+
+    def cz(self, control, target):
+        self.h(target)
+        self.cx(control, target)
+        self.h(target)
+
+    def swap(self, first, second):
+        for bits in (self.x, self.z):
+            bits[:, [first, second]] = bits[:, [second, first]]
+
+    def rz(self, qubit, turns):
+        for _ in range(turns):
+            self.s(qubit)
+
+    def apply(self, operation):
+        """Apply an engine Operation for which is_clifford() holds"""
+        gate = operation.gate
+        qubit = operation.targets[0]
+        if gate == 'id':
+            return
+        if operation.controls:
+            control = operation.controls[0]
+            {'x': self.cx, 'y': self.cy, 'z': self.cz}[gate](control, qubit)
+        elif gate == 'swap':
+            self.swap(qubit, operation.targets[1])
+        elif gate in ('rx', 'ry', 'rz'):
+            turns = quarter_turns(operation.radians)
+            # rx = H rz H and ry = S rx SDG, all up to a global phase
+            if gate == 'ry':
+                self.sdg(qubit)
+            if gate in ('rx', 'ry'):
+                self.h(qubit)
+            self.rz(qubit, turns)
+            if gate in ('rx', 'ry'):
+                self.h(qubit)
+            if gate == 'ry':
+                self.s(qubit)
+        else:
+            {'x': self.pauli_x, 'y': self.pauli_y, 'z': self.pauli_z, 'h': self.h,
+             's': self.s, 'sdg': self.sdg}[gate](qubit)
+
+    def _multiply_rows(self, rows, source_x, source_z, source_r):
+        """Left-multiply the given rows by the Pauli row (source_x, source_z, source_r)"""
+        x, z = self.x[rows], self.z[rows]
+        phase = _phase_exponents(source_x, source_z, x, z).sum(axis=1)
+        phase += 2 * self.r[rows] + 2 * source_r
+        self.r[rows] = (phase % 4) == 2
+        self.x[rows] = x ^ source_x
+        self.z[rows] = z ^ source_z
+
+    def _deterministic_outcome(self, qubit):
+        """Outcome of measuring Z on qubit when no stabilizer anticommutes with it"""
+        # Z on qubit is the product of the stabilizers paired with the destabilizers
+        # that anticommute with it. Multiplying them in turn into a scratch row
+        # picks up phases that only depend on the product so far, so all of
+        # them are computed at once from running XORs.
+        rows = np.flatnonzero(self.x[:self.num_qubits, qubit]) + self.num_qubits
+        x, z = self.x[rows], self.z[rows]
+        scratch_x = np.logical_xor.accumulate(x, axis=0) ^ x
+        scratch_z = np.logical_xor.accumulate(z, axis=0) ^ z
+        phase = _phase_exponents(x, z, scratch_x, scratch_z).sum() + 2 * self.r[rows].sum()
+        return int(phase % 4 == 2)
+
+    def _random_pivot(self, qubit):
+        stabilizers = np.flatnonzero(self.x[self.num_qubits:, qubit])
+        return stabilizers[0] + self.num_qubits if len(stabilizers) else None
+
+    def measure(self, qubit, rng=None, outcome=None):
+        """Measure Z on qubit and collapse the state
+
+        A random outcome is drawn from rng, or forced to outcome if given.
+        """
+        pivot = self._random_pivot(qubit)
+        if pivot is None:
+            return self._deterministic_outcome(qubit)
+        if outcome is None:
+            outcome = int(rng.integers(2))
+        rows = np.flatnonzero(self.x[:, qubit])
+        rows = rows[rows != pivot]
+        self._multiply_rows(rows, self.x[pivot].copy(), self.z[pivot].copy(), self.r[pivot])
+        destabilizer = pivot - self.num_qubits
+        self.x[destabilizer], self.z[destabilizer] = self.x[pivot], self.z[pivot]
+        self.r[destabilizer] = self.r[pivot]
+        self.x[pivot] = False
+        self.z[pivot] = False
+        self.z[pivot, qubit] = True
+        self.r[pivot] = bool(outcome)
+        return outcome
+
+    def expectation_z(self, qubit):
+        """<Z> of qubit: 0 if its measurement is random, else +1 or -1"""
+        if self._random_pivot(qubit) is not None:
+            return 0
+        return 1 - 2 * self._deterministic_outcome(qubit)
+
+    def bloch_vectors(self):
+        """(<X>, <Y>, <Z>) of every qubit as an array of shape (num_qubits, 3)"""
+        vectors = np.zeros((self.num_qubits, 3))
+        for qubit in range(self.num_qubits):
+            vectors[qubit, 2] = self.expectation_z(qubit)
+            if vectors[qubit, 2]:
+                continue  # a pure Z eigenstate has no X or Y component
+            rotated = self.copy()
+            rotated.h(qubit)
+            vectors[qubit, 0] = rotated.expectation_z(qubit)
+            if vectors[qubit, 0]:
+                continue
+            rotated = self.copy()
+            rotated.sdg(qubit)
+            rotated.h(qubit)
+            vectors[qubit, 1] = rotated.expectation_z(qubit)
+        return vectors
+
+    def sample_bits(self, rng, shots=1):
+        """Measurement outcomes of all qubits as a (shots, num_qubits) array of bits
+
+        The outcomes of a stabilizer state are uniformly distributed over
+        reference + span(X parts of the stabilizers), so one collapse yields
+        the reference and the shots are random combinations of the span.
+        """
+        reference = self.copy()
+        reference_bits = np.array([reference.measure(qubit, outcome=0)
+                                   for qubit in range(self.num_qubits)], dtype=np.uint8)
+        basis = _row_basis(self.x[self.num_qubits:])
+        choices = rng.integers(0, 2, size=(shots, len(basis)), dtype=np.uint8)
+        flips = (choices.astype(np.int64) @ basis.astype(np.int64)) % 2
+        return (reference_bits ^ flips.astype(np.uint8)).astype(np.uint8)
+
+    def sample(self, rng, shots=1):
+        """Measured basis state indices, qubit 0 as the least significant bit"""
+        bits = self.sample_bits(rng, shots)
+        # Python ints once the indices no longer fit in an int64
+        dtype = np.int64 if self.num_qubits < 63 else object
+        weights = np.array([1 << qubit for qubit in range(self.num_qubits)], dtype=dtype)
+        return (bits.astype(dtype) @ weights).tolist()
+
+
+def simulate(num_qubits, operations):
+    """Tableau of |0...0> after operations, which must satisfy is_clifford()"""
+    tableau = Tableau(num_qubits)
+    for operation in operations:
+        tableau.apply(operation)
+    return tableau
+
+
+def _phase_exponents(x1, z1, x2, z2):
+    """Per-qubit power of i picked up when multiplying Pauli (x1, z1) into (x2, z2)"""
+    x1, z1 = np.broadcast_to(x1, np.shape(x2)), np.broadcast_to(z1, np.shape(z2))
+    x2, z2 = x2.astype(np.int8), z2.astype(np.int8)
+    return np.where(x1 & z1, z2 - x2,
+                    np.where(x1, z2 * (2 * x2 - 1),
+                             np.where(z1, x2 * (1 - 2 * z2), 0))).astype(np.int64)
+
+
+def _row_basis(rows):
+    """Linearly independent rows spanning the same GF(2) row space"""
+    rows = rows.copy()
+    basis = []
+    for column in range(rows.shape[1]):
+        pivots = np.flatnonzero(rows[:, column])
+        if not len(pivots):
+            continue
+        pivot = rows[pivots[0]].copy()
+        basis.append(pivot)
+        rows[pivots] ^= pivot
+    return np.array(basis, dtype=bool).reshape(len(basis), rows.shape[1])
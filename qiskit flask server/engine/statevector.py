@@ -0,0 +1,311 @@
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""NumPy statevector engine that simulates a CircuitGridModel without qiskit
+
+Amplitudes use the same little-endian ordering as the qiskit simulators:
+qubit 0 is the least significant bit of the basis state index.
+"""
+from collections import namedtuple
+import hashlib
+
+import numpy as np
+
+from engine import fusion
+from engine import gates
+from model import circuit_node_types as node_types
+
+Operation = namedtuple('Operation', ['gate', 'radians', 'targets', 'controls'])
+
+
+def zero_state(num_qubits):
+    state = np.zeros(2 ** num_qubits, dtype=complex)
+    state[0] = 1
+    return state
+
+
+def apply_gate(state, num_qubits, matrix, targets, controls=()):
+    """Apply matrix to the target qubits of state, conditioned on all controls being 1
+
+    The state is updated in place and also returned for convenience.
+    """
+    psi = state.reshape((2,) * num_qubits)
+
+    # Fix every control axis to |1> so that only that slice is touched
+    index = [slice(None)] * num_qubits
+    for control in controls:
+        index[num_qubits - 1 - control] = 1
+    index = tuple(index)
+    sub_state = psi[index]
+
+    control_axes = [num_qubits - 1 - control for control in controls]
+    target_axes = []
+    for target in targets:
+        axis = num_qubits - 1 - target
+        target_axes.append(axis - sum(1 for c_axis in control_axes if c_axis < axis))
+
+    num_targets = len(targets)
+    tensor = matrix.reshape((2,) * (2 * num_targets))
+    result = np.tensordot(tensor, sub_state,
+                          axes=(list(range(num_targets, 2 * num_targets)), target_axes))
+    psi[index] = np.moveaxis(result, list(range(num_targets)), target_axes)
+    return state
+
+
+def apply_batched_gate(states, num_qubits, matrices, targets, controls=()):
+    """Apply a different matrix to each state of a batch, on the same targets and controls
+
+    states has shape (batch, 2**num_qubits) and matrices (batch, 2**k, 2**k)
+    for k targets. The states are updated in place and also returned.
+    """
+    batch = states.shape[0]
+    psi = states.reshape((batch,) + (2,) * num_qubits)
+
+    index = [slice(None)] * (num_qubits + 1)
+    for control in controls:
+        index[num_qubits - control] = 1
+    index = tuple(index)
+    sub_states = psi[index]
+
+    control_axes = [num_qubits - control for control in controls]
+    target_axes = []
+    for target in targets:
+        axis = num_qubits - target
+        target_axes.append(axis - sum(1 for c_axis in control_axes if c_axis < axis))
+
+    num_targets = len(targets)
+    last_axes = list(range(-num_targets, 0))
+    moved = np.moveaxis(sub_states, target_axes, last_axes)
+    result = np.einsum('bij,bmj->bmi', matrices,
+                       moved.reshape(batch, -1, 2 ** num_targets))
+    psi[index] = np.moveaxis(result.reshape(moved.shape), last_axes, target_axes)
+    return states
+
+
+def apply_operation(state, num_qubits, operation):
+    if operation.gate == 'id':
+        return state
+    matrix = gates.gate_matrix(operation.gate, operation.radians)
+    return apply_gate(state, num_qubits, matrix, operation.targets, operation.controls)
+
+
+def column_operations(circuit_grid_model, column_num):
+    """Translate one column of the grid into engine operations
+
+    Mirrors the gate selection made by CircuitGridModel.compute_circuit().
+    """
+    operations = []
+    for wire_num in range(circuit_grid_model.max_wires):
+        node = circuit_grid_model.nodes[wire_num][column_num]
+        if not node:
+            continue
+        controls = ()
+        if node.ctrl_a != -1:
+            controls = (node.ctrl_a,) if node.ctrl_b == -1 else (node.ctrl_a, node.ctrl_b)
+        if node.node_type == node_types.IDEN:
+            operations.append(Operation('id', 0.0, (wire_num,), ()))
+        elif node.node_type == node_types.X:
+            if node.radians == 0:
+                operations.append(Operation('x', 0.0, (wire_num,), controls))
+            else:
+                operations.append(Operation('rx', node.radians, (wire_num,), ()))
+        elif node.node_type == node_types.Y:
+            if node.radians == 0:
+                operations.append(Operation('y', 0.0, (wire_num,), controls[:1]))
+            else:
+                operations.append(Operation('ry', node.radians, (wire_num,), ()))
+        elif node.node_type == node_types.Z:
+            if node.radians == 0:
+                operations.append(Operation('z', 0.0, (wire_num,), controls[:1]))
+            else:
+                operations.append(Operation('rz', node.radians, (wire_num,), controls[:1]))
+        elif node.node_type == node_types.S:
+            operations.append(Operation('s', 0.0, (wire_num,), ()))
+        elif node.node_type == node_types.SDG:
+            operations.append(Operation('sdg', 0.0, (wire_num,), ()))
+        elif node.node_type == node_types.T:
+            operations.append(Operation('t', 0.0, (wire_num,), ()))
+        elif node.node_type == node_types.TDG:
+            operations.append(Operation('tdg', 0.0, (wire_num,), ()))
+        elif node.node_type == node_types.H:
+            operations.append(Operation('h', 0.0, (wire_num,), controls[:1]))
+        elif node.node_type == node_types.SWAP and node.swap != -1:
+            operations.append(Operation('swap', 0.0, (wire_num, node.swap), controls[:1]))
+    return operations
+
+
+def probabilities(state):
+    """Born-rule probabilities of every basis state"""
+    return state.real ** 2 + state.imag ** 2
+
+
+def sample(state, rng, shots=1):
+    """Draw basis state indices from the |amplitude|**2 distribution of state"""
+    cumulative = np.cumsum(probabilities(state))
+    return np.searchsorted(cumulative, rng.random(shots) * cumulative[-1], side='right')
+
+
+def bloch_vectors(state, num_qubits):
+    """Exact (<X>, <Y>, <Z>) of every qubit, from its reduced density matrix
+
+    Returns an array of shape (num_qubits, 3) indexed by qubit number.
+    """
+    psi = state.reshape((2,) * num_qubits)
+    vectors = np.empty((num_qubits, 3))
+    for qubit in range(num_qubits):
+        amplitudes = np.moveaxis(psi, num_qubits - 1 - qubit, 0).reshape(2, -1)
+        rho_00 = np.vdot(amplitudes[0], amplitudes[0]).real
+        rho_11 = np.vdot(amplitudes[1], amplitudes[1]).real
+        rho_01 = np.vdot(amplitudes[1], amplitudes[0])  # <0|rho|1>
+        vectors[qubit] = (2 * rho_01.real, -2 * rho_01.imag, rho_00 - rho_11)
+    return vectors
+
+
+def grid_operations(circuit_grid_model):
+    operations = []
+    for column_num in range(circuit_grid_model.max_columns):
+        operations.extend(column_operations(circuit_grid_model, column_num))
+    return operations
+
+
+def simulate_operations(num_qubits, operations, state=None):
+    """Apply operations to state (|0...0> if None), after fusing them, see fusion.py"""
+    if state is None:
+        state = zero_state(num_qubits)
+    for operation in fusion.optimize(operations):
+        apply_gate(state, num_qubits, operation.matrix, operation.targets, operation.controls)
+    return state
+
+
+def unitary(num_qubits, operations):
+    """2**n x 2**n matrix of operations
+
+    The identity is treated as a state of 2n qubits whose upper n qubits
+    index its rows, so each fused operation is applied to every column with
+    a single kernel call.
+    """
+    dim = 2 ** num_qubits
+    matrix = np.eye(dim, dtype=complex)
+    flat = matrix.reshape(-1)
+    for operation in fusion.optimize(operations):
+        apply_gate(flat, 2 * num_qubits, operation.matrix,
+                   tuple(target + num_qubits for target in operation.targets),
+                   tuple(control + num_qubits for control in operation.controls))
+    return matrix
+
+
+def unitary_block_magnitudes(num_qubits, operations, block_qubits, chunk_bytes=16 * 2 ** 20):
+    """Root mean square magnitude of the unitary over square blocks of 2**block_qubits
+
+    Columns of the unitary are simulated a chunk at a time, so memory stays
+    near chunk_bytes however wide the circuit is.
+    """
+    dim = 2 ** num_qubits
+    block = 2 ** block_qubits
+    fused = fusion.optimize(operations)
+    chunk = max(block, min(dim, 2 ** int(np.log2(max(1, chunk_bytes // (16 * dim))))))
+    batch_qubits = int(np.log2(chunk))
+    magnitudes = np.empty((dim // block, dim // block))
+    for first_column in range(0, dim, chunk):
+        # Row j of columns is the basis state first_column + j, then U applied to it
+        columns = np.zeros((chunk, dim), dtype=complex)
+        columns[np.arange(chunk), first_column + np.arange(chunk)] = 1
+        flat = columns.reshape(-1)
+        for operation in fused:
+            apply_gate(flat, num_qubits + batch_qubits, operation.matrix,
+                       operation.targets, operation.controls)
+        power = probabilities(columns).reshape(chunk // block, block, dim // block, block)
+        magnitudes[:, first_column // block:(first_column + chunk) // block] = \
+            power.sum(axis=(1, 3)).T
+    return np.sqrt(magnitudes / block ** 2)
+
+
+def simulate(circuit_grid_model, prefix_cache=None):
+    """Return the final statevector of a CircuitGridModel
+
+    If prefix_cache (any object with get/put, e.g. an LRUCache) is given, the
+    state after every column is stored in it, keyed by the columns so far.
+    Simulation then resumes from the longest prefix already in the cache, so
+    editing column k only replays columns k and later.
+    """
+    num_qubits = circuit_grid_model.max_wires
+    if prefix_cache is None:
+        return simulate_operations(num_qubits, grid_operations(circuit_grid_model))
+
+    columns = [column_operations(circuit_grid_model, column_num)
+               for column_num in range(circuit_grid_model.max_columns)]
+    keys = prefix_keys(num_qubits, columns)
+
+    state = None
+    start_column = 0
+    for column_num in range(len(columns), 0, -1):
+        cached_state = prefix_cache.get(keys[column_num - 1])
+        if cached_state is not None:
+            state = cached_state.copy()
+            start_column = column_num
+            break
+    if state is None:
+        state = zero_state(num_qubits)
+
+    for column_num in range(start_column, len(columns)):
+        simulate_operations(num_qubits, columns[column_num], state)
+        snapshot = state.copy()
+        snapshot.setflags(write=False)
+        prefix_cache.put(keys[column_num], snapshot)
+    return state
+
+
+def prefix_keys(num_qubits, columns):
+    """Chained hashes identifying the state after each column of operations"""
+    digest = hashlib.blake2b(str(num_qubits).encode(), digest_size=16).digest()
+    keys = []
+    for operations in columns:
+        column_repr = repr([operation for operation in operations if operation.gate != 'id'])
+        digest = hashlib.blake2b(digest + column_repr.encode(), digest_size=16).digest()
+        keys.append(digest)
+    return keys
+
+
+def simulate_batch(circuit_grid_models):
+    """Return the final statevectors of equally sized grids as a (batch, 2**n) array
+
+    Operations that start on the same wire of the same column share their
+    targets and controls across most circuits, so they are applied to the
+    whole batch at once, with an identity for circuits that differ.
+    """
+    num_qubits = circuit_grid_models[0].max_wires
+    batch = len(circuit_grid_models)
+    states = np.zeros((batch, 2 ** num_qubits), dtype=complex)
+    states[:, 0] = 1
+
+    for column_num in range(circuit_grid_models[0].max_columns):
+        column_ops = [{operation.targets[0]: operation
+                       for operation in column_operations(circuit_grid_model, column_num)
+                       if operation.gate != 'id'}
+                      for circuit_grid_model in circuit_grid_models]
+        for wire_num in range(num_qubits):
+            groups = {}
+            for batch_idx, operations in enumerate(column_ops):
+                operation = operations.get(wire_num)
+                if operation:
+                    groups.setdefault((operation.targets, operation.controls), []).append(
+                        (batch_idx, operation))
+            for (targets, controls), members in groups.items():
+                matrices = np.broadcast_to(np.eye(2 ** len(targets), dtype=complex),
+                                           (batch, 2 ** len(targets), 2 ** len(targets))).copy()
+                for batch_idx, operation in members:
+                    matrices[batch_idx] = gates.gate_matrix(operation.gate, operation.radians)
+                apply_batched_gate(states, num_qubits, matrices, targets, controls)
+    return states
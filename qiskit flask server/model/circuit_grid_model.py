@@ -15,8 +15,6 @@
 #
 import numpy as np
 
-from qiskit import QuantumCircuit, QuantumRegister
-
 from model import circuit_node_types as node_types
 CIRCUIT_DEPTH = 3
 
@@ -89,6 +87,9 @@ class CircuitGridModel:
         return gate_wire_num
 
     def compute_circuit(self):
+        # qiskit is slow to import and only needed here, the NumPy engine never calls this
+        from qiskit import QuantumCircuit, QuantumRegister
+
         qr = QuantumRegister(self.max_wires, 'q')
         qc = QuantumCircuit(qr)
 
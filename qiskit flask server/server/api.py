@@ -1,44 +1,390 @@
 #!/usr/bin/env python3
+"""Simulation calls behind the server endpoints
 
-from qiskit import BasicAer, execute, ClassicalRegister
+qiskit and json_tricks are imported on first use rather than with this
+module, so that a server can start listening straight away. warm_up()
+imports them ahead of the first request and sets `ready` when done.
+"""
 from copy import deepcopy
-import json_tricks
+import functools
+import hashlib
+import logging
+import numpy as np
+import threading
+import time
 
+from cache import LRUCache, SingleFlight
+import formats
+import metrics
+from engine import qasm as qasm_parser
+from engine import stabilizer
+from engine import statevector as sv_engine
 from model.circuit_grid_model import CircuitGridModel, CircuitGridNode
 from model import circuit_node_types as node_types
 
+# Name of the built-in NumPy engine, accepted wherever a BasicAer backend name is
+NUMPY_BACKEND = 'numpy_statevector'
 
-def qasm(qasm, backend_to_run='qasm_simulator'):
-    circuit = QuantumCircuit.from_qasm_str(qasm)
-    backend = BasicAer.get_backend(backend_to_run)
-    job_sim = execute(circuit, backend, shots=1)
-    result_sim = job_sim.result()
+# Gates that can be sent in a gate_array string, anything else is an identity
+GRID_GATES = {
+    'X': node_types.X,
+    'Y': node_types.Y,
+    'Z': node_types.Z,
+    'H': node_types.H,
+}
+
+STATEVECTOR_CACHE_ENTRIES = 4096
+STATEVECTOR_CACHE_BYTES = 64 * 1024 * 1024
+STATEVECTOR_CACHE_TTL = None  # seconds, None keeps entries until evicted
+
+statevector_cache = LRUCache(STATEVECTOR_CACHE_ENTRIES, STATEVECTOR_CACHE_BYTES,
+                             STATEVECTOR_CACHE_TTL)
+# Serialized replies keyed by (circuit key, format), so repeated circuits skip encoding
+reply_cache = LRUCache(STATEVECTOR_CACHE_ENTRIES, STATEVECTOR_CACHE_BYTES,
+                       STATEVECTOR_CACHE_TTL)
+# States after each column of recently simulated grids, see sv_engine.simulate()
+prefix_cache = LRUCache(16 * STATEVECTOR_CACHE_ENTRIES, STATEVECTOR_CACHE_BYTES)
+
+# Clifford-only circuits this wide run on a stabilizer tableau instead of 2**n amplitudes
+STABILIZER_MIN_QUBITS = 12
+# Widest circuit the statevector engine is asked to simulate
+STATEVECTOR_MAX_QUBITS = 24
+
+MAX_SHOTS = 100000  # per /api/run/qasm request
+NO_CREG_ERROR = 'the circuit has no classical register to count measurements in'
+
+BATCH_MAX_CIRCUITS = 1024  # per /api/run/batch request
+BATCH_MAX_BYTES = 256 * 1024 * 1024  # statevectors of one batch, counted as complex128
+
+# Largest unitary built in full, counted as complex128 (64 MB is 11 qubits)
+UNITARY_MAX_BYTES = 64 * 1024 * 1024
+# Widest circuit whose unitary may be downsampled into block magnitudes
+UNITARY_DOWNSAMPLE_MAX_QUBITS = 14
+UNITARY_DOWNSAMPLE_QUBITS = 7  # downsampled replies are 2**7 x 2**7
+# Largest JSON unitary reply, json_tricks takes seconds for a complex 8 qubit one
+UNITARY_JSON_MAX_BYTES = 8 * 1024 * 1024
+# Approximate json_tricks size of one element with the rounding of encode_unitary()
+UNITARY_JSON_BYTES_PER_ELEMENT = {'complex': 34, 'magnitude': 8}
+UNITARY_MODES = ('complex', 'magnitude')
+UNITARY_DTYPES = ('float64', 'float32')
+
+# Encoded /api/run/unitary replies keyed by circuit and output options
+unitary_cache = LRUCache(256, 128 * 1024 * 1024)
+
+MEASUREMENT_SEED = None  # set to an int to make measurement streams reproducible
+MEASUREMENT_SESSIONS = 1024  # most recently used sessions that keep their own stream
+
+QASM_CACHE_ENTRIES = 1024
+QASM_CACHE_BYTES = 32 * 1024 * 1024
+# Rough memory of a parsed program or compiled qiskit circuit, per instruction
+QASM_BYTES_PER_INSTRUCTION = 512
+
+# Parsed QasmPrograms and compiled qiskit circuits, keyed by a hash of the normalized QASM
+qasm_cache = LRUCache(QASM_CACHE_ENTRIES, QASM_CACHE_BYTES)
+
+_measurement_seed = np.random.SeedSequence(MEASUREMENT_SEED)
+measurement_rngs = LRUCache(MEASUREMENT_SESSIONS)
+_measurement_streams = 0  # streams started by session_rng()
+_measurement_lock = threading.Lock()
+
+metrics.registry.watch_cache('statevector', statevector_cache)
+metrics.registry.watch_cache('reply', reply_cache)
+metrics.registry.watch_cache('prefix', prefix_cache)
+metrics.registry.watch_cache('qasm', qasm_cache)
+metrics.registry.watch_cache('unitary', unitary_cache)
+
+# Identical simulations requested at the same time run once, see coalesced()
+flights = SingleFlight()
+
+# Set by warm_up() once qiskit is imported and both engines have run a circuit
+ready = threading.Event()
+
+WARM_UP_QASM = 'OPENQASM 2.0;include "qelib1.inc";qreg q[1];creg c[1];h q[0];measure q[0] -> c[0];'
+
+
+def warm_up():
+    """Import the heavy dependencies and run one small circuit through every path"""
+    try:
+        statevector('1,1', 'H')
+        tomography(WARM_UP_QASM)
+        qasm(WARM_UP_QASM)
+        # qiskit still runs the circuits that the engines cannot sample in one go
+        compiled_qasm_circuit(WARM_UP_QASM, 'qasm_simulator')
+    except Exception:
+        logging.getLogger(__name__).exception('warm-up failed')
+        return
+    ready.set()
+
+
+def start_warm_up():
+    """Run warm_up() on a daemon thread and return the thread"""
+    thread = threading.Thread(target=warm_up, name='api-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def qasm(qasm, backend_to_run=NUMPY_BACKEND, num_shots=1, seed=None):
+    """Counts of num_shots runs of a QASM circuit, in qiskit's format
+
+    On the NumPy backend, a circuit whose measurements are all terminal is
+    simulated once, and its counts come from one multinomial draw over the
+    outcome probabilities, so the number of shots barely matters. Anything
+    else, and every circuit sent to a BasicAer backend, is run shot by shot
+    on BasicAer. seed makes the counts reproducible.
+    """
+    num_shots = int(num_shots)
+    if not 1 <= num_shots <= MAX_SHOTS:
+        raise ValueError('num_shots must be between 1 and {}'.format(MAX_SHOTS))
+    digest = qasm_key(qasm)
+    program = terminal_program(qasm, digest) if backend_to_run == NUMPY_BACKEND else None
+    if program is not None:
+        if not program.cregs:
+            raise ValueError(NO_CREG_ERROR)
+        operations = program.gate_operations()
+        tableau = stabilizer_tableau(program.num_qubits, operations)
+        if tableau is not None:
+            return tableau_counts(program, tableau, num_shots, seed)
+        # clbit values are int64 and must fit
+        if program.num_qubits <= STATEVECTOR_MAX_QUBITS and program.num_clbits < 63:
+            outcomes, outcome_probabilities = qasm_outcome_probabilities(program, digest)
+            with _measurement_lock:
+                rng = session_rng() if seed is None else np.random.default_rng(seed)
+                outcome_counts = rng.multinomial(num_shots, outcome_probabilities)
+            return {outcome_key(program, outcome): int(count)
+                    for outcome, count in zip(outcomes, outcome_counts) if count}
+
+    from qiskit import BasicAer
+    from qiskit.providers.exceptions import QiskitBackendNotFoundError
+
+    if backend_to_run == NUMPY_BACKEND:
+        backend_to_run = 'qasm_simulator'
+    try:
+        backend = BasicAer.get_backend(backend_to_run)
+    except QiskitBackendNotFoundError:
+        raise ValueError('unknown backend: {}'.format(backend_to_run))
+    circuit = compiled_qasm_circuit(qasm, backend_to_run, digest)
+    if not circuit.cregs:
+        raise ValueError(NO_CREG_ERROR)
+    with metrics.stage_seconds.time(stage='execute'):
+        job_sim = backend.run(circuit, shots=num_shots, seed_simulator=seed)
+        result_sim = job_sim.result()
     return result_sim.get_counts(circuit)
 
 
-def statevector(circuit_dimension, gate_string):
+def tomography(qasm_string, measure=False, session_id=None):
+    """Exact per-qubit Bloch vectors of a QASM circuit, all in one reply
+
+    Measurements must be terminal, they are left out of the statevector and
+    only used to shape the optional sampled outcome, which is a qiskit-style
+    count key such as '0 1 1'.
+
+    Wide Clifford circuits are run on a stabilizer tableau, their reply has
+    no 'statevector'.
+    """
+    digest = qasm_key(qasm_string)
+    program = parse_qasm(qasm_string, digest)
+    if not program.has_terminal_measurements():
+        raise ValueError('tomography needs a circuit whose measurements are all terminal')
+    result, sampler = coalesced('tomography', digest, tomography_state, program)
+    result = dict(result)  # shared with concurrent requests, which add their own measurement
+    if measure:
+        with _measurement_lock:
+            basis_index = sampler(session_rng(session_id))[0]
+        result['measurement'] = program.count_key(basis_index)
+    import json_tricks
+    with metrics.stage_seconds.time(stage='dumps'):
+        return json_tricks.dumps({'result': result})
+
+
+def tomography_state(program):
+    """(tomography result without measurement, sampler of basis state indices)"""
+    operations = program.gate_operations()
+    tableau = stabilizer_tableau(program.num_qubits, operations)
+    if tableau is not None:
+        result = {
+            'num_qubits': program.num_qubits,
+            'bloch_vectors': tableau.bloch_vectors().tolist(),
+        }
+        return result, tableau.sample
+    check_statevector_width(program.num_qubits)
+    with metrics.stage_seconds.time(stage='execute'):
+        quantum_state = sv_engine.simulate_operations(program.num_qubits, operations)
+    result = {
+        'num_qubits': program.num_qubits,
+        'bloch_vectors': np.round(sv_engine.bloch_vectors(quantum_state, program.num_qubits),
+                                  decimals=6).tolist(),
+        'statevector': np.round(quantum_state, decimals=3),
+    }
+    return result, functools.partial(sv_engine.sample, quantum_state)
+
+
+def statevector(circuit_dimension, gate_string, backend_to_run=NUMPY_BACKEND,
+                response_format=formats.JSON):
+    check_statevector_width(grid_width(circuit_dimension))
+    if backend_to_run == NUMPY_BACKEND:
+        key = circuit_key(circuit_dimension, gate_string)
+        reply = reply_cache.get((key, response_format))
+        if reply is None:
+            quantum_state = cached_statevector(circuit_dimension, gate_string, key)
+            with metrics.stage_seconds.time(stage='dumps'):
+                reply = formats.encode_statevector(quantum_state, response_format)
+            reply_cache.put((key, response_format), reply)
+        return reply
+
+    from qiskit import BasicAer, execute
+
     circuit = circuit_from_string(circuit_dimension, gate_string)
     shot_num = 1000
 
-    backend_sv_sim = BasicAer.get_backend('statevector_simulator')
-    job_sim = execute(circuit, backend_sv_sim, shots=shot_num)
-    result_sim = job_sim.result()
+    backend_sv_sim = BasicAer.get_backend(backend_to_run)
+    with metrics.stage_seconds.time(stage='execute'):
+        job_sim = execute(circuit, backend_sv_sim, shots=shot_num)
+        result_sim = job_sim.result()
     quantum_state = result_sim.get_statevector(circuit, decimals=3)
 
-    return json_tricks.dumps(quantum_state)
+    with metrics.stage_seconds.time(stage='dumps'):
+        return formats.encode_statevector(quantum_state, response_format)
+
+
+def unitary(circuit_dimension=None, gate_string=None, qasm_string=None, mode='complex',
+            dtype='float64', downsample=False, binary=False):
+    """Unitary matrix of a grid, or of QASM text (terminal measurements are ignored)
+
+    mode 'magnitude' returns |U| only. Unitaries larger than UNITARY_MAX_BYTES
+    are refused unless downsample is set, which returns the root mean square
+    magnitude over blocks, as a 2**UNITARY_DOWNSAMPLE_QUBITS square matrix.
+    The same goes for JSON replies that would take more than
+    UNITARY_JSON_MAX_BYTES, binary replies have no such limit.
+    """
+    if mode not in UNITARY_MODES or dtype not in UNITARY_DTYPES:
+        raise ValueError('mode must be one of {} and dtype one of {}'.format(
+            UNITARY_MODES, UNITARY_DTYPES))
+    if qasm_string is not None:
+        circuit_hash = qasm_key(qasm_string)
+    elif circuit_dimension is not None and gate_string is not None:
+        circuit_hash = circuit_key(circuit_dimension, gate_string)
+    else:
+        raise ValueError('send either qasm or circuit_dimension and gate_array')
+    key = (circuit_hash, mode, dtype, bool(downsample), bool(binary))
+    reply = unitary_cache.get(key)
+    if reply is None:
+        reply = coalesced('unitary', key, unitary_reply, key, circuit_dimension, gate_string,
+                          qasm_string, mode, dtype, downsample, binary)
+    return reply
+
+
+def unitary_reply(key, circuit_dimension, gate_string, qasm_string, mode, dtype, downsample,
+                  binary):
+    """Encode the unitary for unitary() and cache it under key"""
+    circuit_hash = key[0]
+    if qasm_string is not None:
+        program = parse_qasm(qasm_string, circuit_hash)
+        if not program.has_terminal_measurements():
+            raise ValueError('a unitary needs a circuit whose measurements are all terminal')
+        num_qubits, operations = program.num_qubits, program.gate_operations()
+    else:
+        circuit_grid_model = grid_model_from_string(circuit_dimension, gate_string)
+        num_qubits = circuit_grid_model.max_wires
+        operations = sv_engine.grid_operations(circuit_grid_model)
 
+    extra = {'num_qubits': num_qubits}
+    matrix_bytes = 16 * 4 ** num_qubits
+    json_bytes = UNITARY_JSON_BYTES_PER_ELEMENT[mode] * 4 ** num_qubits
+    if matrix_bytes <= UNITARY_MAX_BYTES and (binary or json_bytes <= UNITARY_JSON_MAX_BYTES):
+        with metrics.stage_seconds.time(stage='execute'):
+            matrix = sv_engine.unitary(num_qubits, operations)
+        if mode == 'magnitude':
+            matrix = np.abs(matrix)
+    elif downsample and num_qubits <= UNITARY_DOWNSAMPLE_MAX_QUBITS:
+        block_qubits = num_qubits - UNITARY_DOWNSAMPLE_QUBITS
+        with metrics.stage_seconds.time(stage='execute'):
+            matrix = sv_engine.unitary_block_magnitudes(num_qubits, operations, block_qubits)
+        mode = 'magnitude'
+        extra['block_qubits'] = block_qubits
+    else:
+        if matrix_bytes <= UNITARY_MAX_BYTES:
+            reason = 'its JSON reply would take about {} bytes, more than {}, ask for ' \
+                'format=binary'.format(json_bytes, UNITARY_JSON_MAX_BYTES)
+        else:
+            reason = 'it does not fit in {} bytes'.format(UNITARY_MAX_BYTES)
+        raise ValueError('the unitary of {} qubits is too large: {}{}'.format(
+            num_qubits, reason, ', or set downsample for a magnitude overview'
+            if num_qubits <= UNITARY_DOWNSAMPLE_MAX_QUBITS else ''))
+
+    with metrics.stage_seconds.time(stage='dumps'):
+        reply = formats.encode_unitary(matrix, mode, dtype, binary, extra)
+    unitary_cache.put(key, reply)
+    return reply
+
+
+def batch_statevector(circuit_dimension, gate_strings, response_format=formats.JSON):
+    """Statevectors of many grids with the same dimension, simulated in one pass
+
+    Grids already in the cache are not simulated again.
+    """
+    num_qubits = grid_width(circuit_dimension)
+    check_statevector_width(num_qubits)
+    if not 1 <= len(gate_strings) <= BATCH_MAX_CIRCUITS:
+        raise ValueError('a batch needs between 1 and {} circuits'.format(BATCH_MAX_CIRCUITS))
+    if 16 * 2 ** num_qubits * len(gate_strings) > BATCH_MAX_BYTES:
+        raise ValueError('the statevectors of {} circuits of {} qubits do not fit in {} '
+                         'bytes'.format(len(gate_strings), num_qubits, BATCH_MAX_BYTES))
+    keys = [circuit_key(circuit_dimension, gate_string) for gate_string in gate_strings]
+    found_states = {}
+    missing = {}
+    for key, gate_string in zip(keys, gate_strings):
+        if key in found_states or key in missing:
+            continue
+        quantum_state = statevector_cache.get(key)
+        if quantum_state is None:
+            missing[key] = gate_string
+        else:
+            found_states[key] = quantum_state
+
+    if missing:
+        circuit_grid_models = [grid_model_from_string(circuit_dimension, gate_string)
+                               for gate_string in missing.values()]
+        with metrics.stage_seconds.time(stage='execute'):
+            simulated_states = sv_engine.simulate_batch(circuit_grid_models)
+        for key, quantum_state in zip(missing, simulated_states):
+            # Copy rows so each cache entry owns (and accounts for) its own buffer
+            quantum_state = quantum_state.copy()
+            quantum_state.setflags(write=False)
+            statevector_cache.put(key, quantum_state)
+            found_states[key] = quantum_state
+
+    quantum_states = np.array([found_states[key] for key in keys])
+    with metrics.stage_seconds.time(stage='dumps'):
+        return formats.encode_statevector(quantum_states, response_format)
+
+
+def measurement(circuit_dimension, gate_string, session_id=None, backend_to_run=NUMPY_BACKEND):
+    if backend_to_run == NUMPY_BACKEND:
+        key = circuit_key(circuit_dimension, gate_string)
+        tableau = grid_tableau(circuit_dimension, gate_string, key)
+        if tableau is not None:
+            sampler = tableau.sample
+        else:
+            sampler = functools.partial(sv_engine.sample,
+                                        cached_statevector(circuit_dimension, gate_string, key))
+        with _measurement_lock:
+            state_in_decimal = sampler(session_rng(session_id))[0]
+        return str(state_in_decimal)
+
+    check_statevector_width(grid_width(circuit_dimension))
+    from qiskit import BasicAer, execute, ClassicalRegister
 
-def measurement(circuit_dimension, gate_string):
     circuit = circuit_from_string(circuit_dimension, gate_string)
     shot_num = 1
 
-    backend_sv_sim = BasicAer.get_backend('qasm_simulator')
+    backend_sv_sim = BasicAer.get_backend(backend_to_run)
     cr = ClassicalRegister(circuit.width())  # create classical register for each quantum register
     measure_circuit = deepcopy(circuit)  # make a copy of circuit
     measure_circuit.add_register(cr)  # add classical registers for measurement readout
     measure_circuit.measure(measure_circuit.qregs[0], measure_circuit.cregs[0])
-    job_sim = execute(measure_circuit, backend_sv_sim, shots=shot_num)
-    result_sim = job_sim.result()
+    with metrics.stage_seconds.time(stage='execute'):
+        job_sim = execute(measure_circuit, backend_sv_sim, shots=shot_num)
+        result_sim = job_sim.result()
     counts = result_sim.get_counts(circuit)
 
     state_in_decimal = int(list(counts.keys())[0], 2)
@@ -46,7 +392,200 @@ def measurement(circuit_dimension, gate_string):
     return str(state_in_decimal)
 
 
+def session_rng(session_id=None):
+    """Random stream for a client session, derived from MEASUREMENT_SEED and the session id
+
+    Each stream also gets the number of streams started before it, so a
+    session evicted from measurement_rngs and started again continues with
+    new outcomes instead of replaying its old ones.
+
+    Callers must hold _measurement_lock, numpy generators are not thread-safe.
+    """
+    global _measurement_streams
+    rng = measurement_rngs.get(session_id)
+    if rng is None:
+        session_key = hashlib.blake2b(str(session_id).encode(), digest_size=8).digest()
+        seed = np.random.SeedSequence(_measurement_seed.entropy,
+                                      spawn_key=(int.from_bytes(session_key, 'little'),
+                                                 _measurement_streams))
+        _measurement_streams += 1
+        rng = np.random.default_rng(seed)
+        measurement_rngs.put(session_id, rng)
+    return rng
+
+
+def stabilizer_tableau(num_qubits, operations):
+    """Simulated Tableau for wide Clifford circuits, None for the statevector engine"""
+    if num_qubits < STABILIZER_MIN_QUBITS or not stabilizer.is_clifford(operations):
+        return None
+    with metrics.stage_seconds.time(stage='execute'):
+        return stabilizer.simulate(num_qubits, operations)
+
+
+def grid_tableau(circuit_dimension, gate_string, key=None):
+    """Tableau of a wide Clifford-only grid, None for the statevector engine
+
+    Tableaus are cached by circuit_key() like statevectors, and shared, so
+    they are read-only: sampling and Bloch vectors work on copies.
+    """
+    if grid_width(circuit_dimension) < STABILIZER_MIN_QUBITS:
+        return None
+    if key is None:
+        key = circuit_key(circuit_dimension, gate_string)
+    tableau = statevector_cache.get(('tableau', key))
+    if tableau is None:
+        tableau = coalesced('tableau', key, simulate_grid_tableau, key, circuit_dimension,
+                            gate_string)
+    # False marks grids known not to be Clifford-only
+    return tableau or None
+
+
+def simulate_grid_tableau(key, circuit_dimension, gate_string):
+    circuit_grid_model = grid_model_from_string(circuit_dimension, gate_string)
+    tableau = stabilizer_tableau(circuit_grid_model.max_wires,
+                                 sv_engine.grid_operations(circuit_grid_model))
+    if tableau is None:
+        statevector_cache.put(('tableau', key), False)
+        return False
+    for array in (tableau.x, tableau.z, tableau.r):
+        array.setflags(write=False)
+    statevector_cache.put(('tableau', key), tableau,
+                          tableau.x.nbytes + tableau.z.nbytes + tableau.r.nbytes)
+    return tableau
+
+
+def terminal_program(qasm_string, digest=None):
+    """QasmProgram of QASM text if the engines can sample it all at once, else None"""
+    try:
+        program = parse_qasm(qasm_string, digest)
+    except ValueError:
+        return None  # left to qiskit, which knows more of the language
+    if not program.has_terminal_measurements():
+        return None
+    return program
+
+
+def qasm_outcome_probabilities(program, digest):
+    """Distinct measurement outcomes of a terminal program and their probabilities
+
+    Outcomes are clbit values, or basis state indices for programs without
+    classical registers. The result is cached per program.
+    """
+    key = ('outcomes', digest)
+    cached = statevector_cache.get(key)
+    if cached is None:
+        cached = coalesced('qasm', key, simulate_outcome_probabilities, key, program)
+    return cached
+
+
+def simulate_outcome_probabilities(key, program):
+    with metrics.stage_seconds.time(stage='execute'):
+        quantum_state = sv_engine.simulate_operations(program.num_qubits,
+                                                      program.gate_operations())
+    basis_probabilities = sv_engine.probabilities(quantum_state)
+    basis_indices = np.arange(len(basis_probabilities))
+    if program.cregs:
+        basis_indices = program.clbit_value(basis_indices)
+    outcomes, inverse = np.unique(basis_indices, return_inverse=True)
+    outcome_probabilities = np.bincount(inverse, weights=basis_probabilities)
+    cached = (outcomes, outcome_probabilities / outcome_probabilities.sum())
+    for array in cached:
+        array.setflags(write=False)
+    statevector_cache.put(key, cached)
+    return cached
+
+
+def tableau_counts(program, tableau, num_shots, seed=None):
+    with _measurement_lock:
+        rng = session_rng() if seed is None else np.random.default_rng(seed)
+        bits = tableau.sample_bits(rng, num_shots)
+    if program.cregs:
+        clbits = np.zeros((num_shots, program.num_clbits), dtype=np.uint8)
+        for qubit, clbit in program.measurements():
+            clbits[:, clbit] = bits[:, qubit]
+        bits = clbits
+    # One opaque bytes value per shot sorts much faster than rows of bits
+    packed = np.packbits(bits, axis=1, bitorder='little')
+    packed = np.ascontiguousarray(packed).view(np.dtype((np.void, packed.shape[1]))).ravel()
+    rows, row_counts = np.unique(packed, return_counts=True)
+    return {outcome_key(program, int.from_bytes(row.tobytes(), 'little')): int(count)
+            for row, count in zip(rows, row_counts)}
+
+
+def outcome_key(program, outcome):
+    outcome = int(outcome)
+    if program.cregs:
+        return program.clbit_key(outcome)
+    return program.count_key(outcome)
+
+
+def check_statevector_width(num_qubits):
+    if num_qubits > STATEVECTOR_MAX_QUBITS:
+        raise ValueError('{} qubits is too wide for the statevector engine, the limit is {} '
+                         '(wider Clifford-only circuits run on a stabilizer tableau where '
+                         'possible)'.format(num_qubits, STATEVECTOR_MAX_QUBITS))
+
+
+def cached_statevector(circuit_dimension, gate_string, key=None):
+    """Simulate a grid with the NumPy engine, reusing results for identical grids"""
+    check_statevector_width(grid_width(circuit_dimension))
+    if key is None:
+        key = circuit_key(circuit_dimension, gate_string)
+    quantum_state = statevector_cache.get(key)
+    if quantum_state is None:
+        quantum_state = coalesced('statevector', key, simulate_grid, key, circuit_dimension,
+                                  gate_string)
+    return quantum_state
+
+
+def simulate_grid(key, circuit_dimension, gate_string):
+    circuit_grid_model = grid_model_from_string(circuit_dimension, gate_string)
+    with metrics.stage_seconds.time(stage='execute'):
+        quantum_state = sv_engine.simulate(circuit_grid_model, prefix_cache)
+    quantum_state.setflags(write=False)
+    statevector_cache.put(key, quantum_state)
+    return quantum_state
+
+
+def coalesced(call, key, function, *args):
+    """function(*args), run once for all the concurrent requests with the same call and key
+
+    Requests that arrive while it runs wait and share its result, they are
+    counted in the coalesced metric as simulations saved. The result must
+    not be modified by the callers.
+    """
+    result, shared = flights.do((call, key), function, *args)
+    if shared:
+        metrics.coalesced_total.inc(call=call)
+    else:
+        metrics.single_flight_calls_total.inc(call=call)
+    return result
+
+
+def grid_width(circuit_dimension):
+    """Number of wires of a grid, known before the grid is built"""
+    return int(circuit_dimension.split(',')[0])
+
+
+def circuit_key(circuit_dimension, gate_string):
+    """Canonical hash of a grid, equal for all strings that parse to the same circuit"""
+    row_max = int(circuit_dimension.split(',')[0])
+    column_max = int(circuit_dimension.split(',')[1])
+    gate_array = gate_string.split(',')[:row_max * column_max]
+    canonical = '{},{}:'.format(row_max, column_max) + \
+        ','.join(gate if gate in GRID_GATES else 'I' for gate in gate_array)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
 def circuit_from_string(circuit_dimension, gate_string):
+    circuit_grid_model = grid_model_from_string(circuit_dimension, gate_string)
+    with metrics.stage_seconds.time(stage='compute_circuit'):
+        circuit = circuit_grid_model.compute_circuit()
+    return circuit
+
+
+def grid_model_from_string(circuit_dimension, gate_string):
+    start = time.perf_counter()
     gate_array = gate_string.split(',')
     row_max = int(circuit_dimension.split(',')[0])
     column_max = int(circuit_dimension.split(',')[1])
@@ -54,15 +593,58 @@ def circuit_from_string(circuit_dimension, gate_string):
     for i in range(row_max):
         for j in range(column_max):
             index = i * column_max + j
-            node = CircuitGridNode(node_types.IDEN)
-            if gate_array[index] == 'X':
-                node = CircuitGridNode(node_types.X)
-            elif gate_array[index] == 'Y':
-                node = CircuitGridNode(node_types.Y)
-            elif gate_array[index] == 'Z':
-                node = CircuitGridNode(node_types.Z)
-            elif gate_array[index] == 'H':
-                node = CircuitGridNode(node_types.H)
+            node = CircuitGridNode(GRID_GATES.get(gate_array[index], node_types.IDEN))
             circuit_grid_model.set_node(i, j, node)
-    circuit = circuit_grid_model.compute_circuit()
+    metrics.stage_seconds.observe(time.perf_counter() - start, stage='circuit_from_string')
+    metrics.circuit_qubits.observe(row_max, source='grid')
+    metrics.circuit_depth.observe(column_max, source='grid')
+    return circuit_grid_model
+
+
+def qasm_key(qasm_string):
+    """Hash of the normalized QASM text, equal for texts that only differ in layout"""
+    return hashlib.blake2b(qasm_parser.normalize(qasm_string).encode(), digest_size=16).hexdigest()
+
+
+def compiled_qasm_circuit(qasm_string, backend_to_run, digest=None):
+    """qiskit circuit of QASM text transpiled for a BasicAer backend, cached per program"""
+    key = ('circuit', digest or qasm_key(qasm_string), backend_to_run)
+    circuit = qasm_cache.get(key)
+    if circuit is None:
+        circuit = coalesced('compile', key, compile_qasm, key, qasm_string, backend_to_run)
+    return circuit
+
+
+def compile_qasm(key, qasm_string, backend_to_run):
+    from qiskit import BasicAer, QuantumCircuit, transpile
+    from qiskit.exceptions import QiskitError
+
+    with metrics.stage_seconds.time(stage='circuit_from_string'):
+        try:
+            circuit = QuantumCircuit.from_qasm_str(qasm_string)
+        except QiskitError as error:
+            # Programs the NumPy engine also refused end up here, answered with a 400
+            raise ValueError('invalid qasm: {}'.format(error))
+    metrics.circuit_qubits.observe(circuit.num_qubits, source='qasm')
+    metrics.circuit_depth.observe(circuit.depth(), source='qasm')
+    with metrics.stage_seconds.time(stage='compile'):
+        circuit = transpile(circuit, BasicAer.get_backend(backend_to_run))
+    qasm_cache.put(key, circuit, QASM_BYTES_PER_INSTRUCTION * (len(circuit.data) + 1))
     return circuit
+
+
+def parse_qasm(qasm_string, digest=None):
+    """QasmProgram of QASM text for the NumPy engine, cached per program
+
+    digest is qasm_key(qasm_string), for callers that already have it.
+    """
+    key = ('program', digest or qasm_key(qasm_string))
+    program = qasm_cache.get(key)
+    if program is None:
+        with metrics.stage_seconds.time(stage='circuit_from_string'):
+            program = qasm_parser.parse(qasm_string)
+        metrics.circuit_qubits.observe(program.num_qubits, source='qasm')
+        metrics.circuit_depth.observe(len(program.instructions), source='qasm')
+        qasm_cache.put(key, program,
+                       QASM_BYTES_PER_INSTRUCTION * (len(program.instructions) + 1))
+    return program
@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+"""Asynchronous entry point serving the same endpoints as server.py
+
+Requests are handled on an asyncio event loop, and the CPU-bound simulation
+calls run on a pool of worker processes that import api (and with it qiskit
+and the NumPy engine) once, when the server starts.
+
+/api/session/ws is a WebSocket that keeps one CircuitSession per connection.
+The first message opens it, e.g.
+    {"action": "open", "circuit_dimension": "3,18", "format": "probabilities"}
+with an optional "gate_array", and every later message is an edit (see
+sessions.py) or a list of edits. After each message the session's state is
+sent back in the requested format, as a binary frame for binary formats.
+
+/api/sessions offers the same sessions over REST, also kept in this process:
+POST creates one, PATCH /api/sessions/{id} applies edits, GET returns its
+state (or /probabilities) and DELETE drops it.
+
+Identical statevector, batch and unitary calls made at the same time run
+once, on one worker, and share its reply.
+
+GET /metrics renders the metrics of this process and of every worker,
+labelled worker=<name>. Each worker sends its metrics with every reply, so
+they are as recent as its last call.
+
+The server accepts connections while the workers are still starting, /ready
+answers 503 until every worker has imported qiskit and run a circuit.
+
+With --affinity every worker is a process of its own and each call goes to
+the worker owning its circuit on a consistent-hash ring (see router.py), so
+repeated circuits find that worker's caches warm. GET /workers reports the
+load of each worker, POST /workers starts one more and DELETE
+/workers/{name} retires one; the ring is rebalanced either way.
+
+    python asgi_server.py --workers 4 --max-pending 16
+    python asgi_server.py --workers 4 --affinity
+"""
+from pathlib import Path
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import contextlib
+import functools
+import multiprocessing
+import os
+import sys
+import time
+
+# add project path to PYTHONPATH in order to run asgi_server.py as a script
+project_path = str(Path().resolve().parent)
+sys.path.append(project_path)
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocketDisconnect
+import uvicorn
+
+import numpy as np
+
+import api
+import formats
+import metrics
+import router
+import sessions
+from sessions import CircuitSession
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 8  # simulations queued or running at once, per worker
+# With --affinity, how long a call waits for a worker to be on the ring before a 503,
+# long enough for the first workers to import qiskit
+WORKER_WAIT_SECONDS = 30
+
+# api calls whose reply only depends on their arguments: identical calls
+# made at the same time go to one worker and share its reply
+COALESCED_CALLS = {'statevector', 'batch_statevector', 'unitary'}
+
+
+class NoWorkerError(Exception):
+    """No worker joined the ring within WORKER_WAIT_SECONDS, answered with a 503"""
+
+
+def init_worker(worker_project_path):
+    """Import and exercise api once so the first real request is not slow"""
+    sys.path.append(worker_project_path)
+    import api
+    api.warm_up()
+
+
+def call_api(function_name, *args, **kwargs):
+    import api
+    return getattr(api, function_name)(*args, **kwargs)
+
+
+def timed_call_api(function_name, *args, **kwargs):
+    """(seconds spent in the worker, call_api(...), worker pid, its metrics snapshot)"""
+    import metrics
+    start = time.perf_counter()
+    result = call_api(function_name, *args, **kwargs)
+    seconds = time.perf_counter() - start
+    return seconds, result, os.getpid(), metrics.registry.snapshot()
+
+
+def start_worker_process():
+    return ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=init_worker, initargs=(project_path,))
+
+
+class SimulationPool:
+    """Process pool for api calls with a bound on the number of calls in flight"""
+    def __init__(self, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending * workers
+        self.executor = None
+        self.semaphore = None
+        self.ready = False
+        self.coalesced = 0  # calls that shared the reply of an identical call in flight
+        # worker name: metrics.registry.snapshot() sent with the worker's last reply
+        self.worker_metrics = {}
+        self._warm_up_task = None
+        self._in_flight = {}  # (function name, arguments): future of its reply
+
+    def start(self):
+        """Create the pool and start its workers without waiting for them"""
+        self.executor = ProcessPoolExecutor(self.workers,
+                                            mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=init_worker,
+                                            initargs=(project_path,))
+        self.semaphore = asyncio.Semaphore(self.max_pending)
+        self._warm_up_task = asyncio.create_task(self.warm_up())
+
+    async def warm_up(self):
+        # Submitting one call per worker makes the pool start all of them now
+        # (bypassing run(), which would coalesce these identical calls into one)
+        await asyncio.gather(*(self._submit('statevector', '1,1', 'I')
+                               for _ in range(self.workers)))
+        self.ready = True
+
+    async def run(self, function_name, *args, **kwargs):
+        if function_name not in COALESCED_CALLS:
+            return await self._submit(function_name, *args, **kwargs)
+        key = (function_name, repr(args), repr(sorted(kwargs.items())))
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._submit(function_name, *args, **kwargs))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # A request that goes away must not cancel the call for the others
+        return await asyncio.shield(future)
+
+    async def _submit(self, function_name, *args, **kwargs):
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            _, result, pid, snapshot = await loop.run_in_executor(
+                self.executor, functools.partial(timed_call_api, function_name, *args, **kwargs))
+        # The pool picks the process, so its workers are only known by pid
+        self.worker_metrics['pid-{}'.format(pid)] = snapshot
+        return result
+
+    def stats(self):
+        return {'workers': self.workers, 'coalesced': self.coalesced}
+
+    def render_metrics(self):
+        """Prometheus text of this process (worker="server") and of every worker"""
+        snapshots = dict(self.worker_metrics, server=metrics.registry.snapshot())
+        return metrics.registry.render(snapshots)
+
+    def shutdown(self):
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+            self._warm_up_task = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+
+class ShardedPool(SimulationPool):
+    """One process per worker, each call sent to the worker that owns its circuit
+
+    Calls are routed on a router.HashRing by their circuit key, so repeated
+    circuits hit the same worker's caches. A call whose owner already has
+    max_pending calls in flight goes to the next worker on the ring instead.
+    Workers can join and leave while serving, and one whose process dies is
+    replaced; either way only the circuits of its share of the ring move.
+    """
+    def __init__(self, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING):
+        super().__init__(workers, max_pending)
+        self.max_pending_per_worker = max_pending
+        self.ring = router.HashRing()
+        self.executors = {}  # worker name: its single-process executor
+        self.worker_stats = {}  # worker name: router.WorkerStats
+        self._joined = None  # set while the ring has a worker
+        self._next_worker = 0
+        self._tasks = set()
+
+    def start(self):
+        self.semaphore = asyncio.Semaphore(self.max_pending)
+        self._joined = asyncio.Event()
+        self._warm_up_task = asyncio.create_task(self.warm_up())
+
+    async def warm_up(self):
+        await asyncio.gather(*(self.add_worker() for _ in range(self.workers)))
+        self.ready = True
+
+    async def add_worker(self):
+        """Start a worker process and put it on the ring once it has warmed up"""
+        name = 'worker-{}'.format(self._next_worker)
+        self._next_worker += 1
+        executor = start_worker_process()
+        self.executors[name] = executor
+        loop = asyncio.get_running_loop()
+        _, _, _, snapshot = await loop.run_in_executor(
+            executor, functools.partial(timed_call_api, 'statevector', '1,1', 'I'))
+        if self.executors.get(name) is not executor:
+            return name  # removed while starting
+        self.worker_metrics[name] = snapshot
+        self.worker_stats[name] = router.WorkerStats()
+        self.ring.add(name)
+        self._joined.set()
+        return name
+
+    def remove_worker(self, name):
+        """Take a worker off the ring, the calls it is running still finish"""
+        executor = self.executors.pop(name)
+        self.ring.remove(name)
+        self.worker_stats.pop(name, None)
+        self.worker_metrics.pop(name, None)
+        if not len(self.ring):
+            self._joined.clear()
+        executor.shutdown(wait=False)
+
+    def replace_worker(self, name):
+        """Remove a worker whose process died and start another one"""
+        if name in self.executors:
+            self.remove_worker(name)
+            task = asyncio.create_task(self.add_worker())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def worker_for(self, key):
+        """Owner of key, or the next worker on the ring that is not saturated"""
+        owner = None
+        for name in self.ring.nodes_for(key):
+            if owner is None:
+                owner = name
+            if self.worker_stats[name].in_flight < self.max_pending_per_worker:
+                if name != owner:
+                    self.worker_stats[name].fallbacks += 1
+                return name
+        return owner
+
+    async def wait_for_worker(self):
+        """Wait until the ring has a worker, raising NoWorkerError after WORKER_WAIT_SECONDS"""
+        try:
+            await asyncio.wait_for(self._joined.wait(), WORKER_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            raise NoWorkerError('no simulation worker is available') from None
+
+    async def _submit(self, function_name, *args, **kwargs):
+        key = router.routing_key(function_name, args, kwargs)
+        # Waiting outside the semaphore keeps calls queued for a worker from
+        # holding the slots of calls that could run
+        await self.wait_for_worker()
+        async with self.semaphore:
+            for attempt in range(2):
+                await self.wait_for_worker()
+                name = self.worker_for(key)
+                stats = self.worker_stats[name]
+                stats.in_flight += 1
+                stats.calls += 1
+                try:
+                    loop = asyncio.get_running_loop()
+                    seconds, result, _, snapshot = await loop.run_in_executor(
+                        self.executors[name],
+                        functools.partial(timed_call_api, function_name, *args, **kwargs))
+                except BrokenProcessPool:
+                    stats.errors += 1
+                    self.replace_worker(name)
+                    if attempt:
+                        raise
+                    continue  # once more, on the worker that took over the circuit
+                except Exception:
+                    stats.errors += 1
+                    raise
+                finally:
+                    stats.in_flight -= 1
+                stats.busy_seconds += seconds
+                if name in self.executors:
+                    self.worker_metrics[name] = snapshot
+                return result
+
+    def stats(self):
+        shares = self.ring.shares()
+        workers = {name: dict(stats.as_dict(), ring_share=round(shares.get(name, 0.0), 4))
+                   for name, stats in self.worker_stats.items()}
+        return {'workers': workers, 'starting': len(self.executors) - len(workers),
+                'coalesced': self.coalesced}
+
+    def shutdown(self):
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+            self._warm_up_task = None
+        for task in self._tasks:
+            task.cancel()
+        for executor in self.executors.values():
+            executor.shutdown(wait=True, cancel_futures=True)
+        self.executors.clear()
+
+
+def requested_format(request, form):
+    format_param = form.get('format') or request.query_params.get('format')
+    return formats.negotiate(format_param, request.headers.get('accept'))
+
+
+def create_app(workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING, affinity=False):
+    pool = (ShardedPool if affinity else SimulationPool)(workers, max_pending)
+
+    async def welcome(request):
+        return Response("Hi Qiskiter!", media_type='text/html')
+
+    async def health(request):
+        return JSONResponse({"status": "ok"})
+
+    async def ready(request):
+        if not pool.ready:
+            return JSONResponse({"status": "warming up"}, status_code=503)
+        return JSONResponse({"status": "ready"})
+
+    async def worker_stats(request):
+        return JSONResponse(pool.stats())
+
+    async def get_metrics(request):
+        return Response(pool.render_metrics(), media_type='text/plain; version=0.0.4')
+
+    async def add_worker(request):
+        name = await pool.add_worker()
+        return JSONResponse({"worker": name}, status_code=201)
+
+    async def remove_worker(request):
+        try:
+            pool.remove_worker(request.path_params['name'])
+        except KeyError:
+            return JSONResponse({"error": "unknown worker"}, status_code=404)
+        return Response(status_code=204)
+
+    def missing_qasm():
+        return JSONResponse({"error": "missing qasm parameter"}, status_code=400)
+
+    async def run_qasm(request):
+        qasm_string = request.query_params.get('qasm')
+        if qasm_string is None:
+            return missing_qasm()
+        backend = request.query_params.get('backend', api.NUMPY_BACKEND)
+        seed = request.query_params.get('seed')
+        try:
+            output = await pool.run('qasm', qasm_string, backend,
+                                    int(request.query_params.get('num_shots', 1)),
+                                    None if seed is None else int(seed))
+        except ValueError as error:
+            return JSONResponse({"error": str(error)}, status_code=400)
+        return JSONResponse({"result": output})
+
+    async def run_tomography(request):
+        qasm_string = request.query_params.get('qasm')
+        if qasm_string is None:
+            return missing_qasm()
+        measure = request.query_params.get('measure', '0') not in ('0', 'false', '')
+        try:
+            reply = await pool.run('tomography', qasm_string, measure,
+                                   request.query_params.get('session'))
+        except ValueError as error:
+            return JSONResponse({"error": str(error)}, status_code=400)
+        return Response(reply, media_type='application/json')
+
+    async def get_statevector(request):
+        form = await request.form()
+        response_format = requested_format(request, form)
+        try:
+            reply = await pool.run('statevector', form.get('circuit_dimension'),
+                                   form.get('gate_array'), response_format=response_format)
+        except (ValueError, IndexError) as error:
+            return JSONResponse({"error": str(error)}, status_code=400)
+        return Response(reply, media_type=formats.MEDIA_TYPES[response_format])
+
+    async def run_batch(request):
+        form = await request.form()
+        response_format = requested_format(request, form)
+        try:
+            reply = await pool.run('batch_statevector', form.get('circuit_dimension'),
+                                   form.getlist('gate_array'), response_format)
+        except (ValueError, IndexError) as error:
+            return JSONResponse({"error": str(error)}, status_code=400)
+        return Response(reply, media_type=formats.MEDIA_TYPES[response_format])
+
+    async def run_unitary(request):
+        params = dict(request.query_params)
+        if request.method == 'POST':
+            params.update(await request.form())
+        binary = params.get('format') == 'binary' or \
+            formats.UNITARY_MEDIA_TYPE in request.headers.get('accept', '')
+        try:
+            reply = await pool.run('unitary', params.get('circuit_dimension'),
+                                   params.get('gate_array'), params.get('qasm'),
+                                   params.get('mode', 'complex'), params.get('dtype', 'float64'),
+                                   params.get('downsample', '0') not in ('0', 'false', ''),
+                                   binary)
+        except (ValueError, IndexError) as error:
+            return JSONResponse({"error": str(error)}, status_code=400)
+        media_type = formats.UNITARY_MEDIA_TYPE if binary else 'application/json'
+        return Response(reply, media_type=media_type)
+
+    async def do_measurement(request):
+        form = await request.form()
+        try:
+            reply = await pool.run('measurement', form.get('circuit_dimension'),
+                                   form.get('gate_array'), form.get('session'))
+        except (ValueError, IndexError) as error:
+            return JSONResponse({"error": str(error)}, status_code=400)
+        return Response(reply, media_type='text/html')
+
+    async def session_socket(websocket):
+        await websocket.accept()
+        session = None
+        try:
+            while True:
+                message = await websocket.receive_json()
+                try:
+                    if session is None or (isinstance(message, dict) and
+                                           message.get('action') == 'open'):
+                        if not isinstance(message, dict) or message.get('action') != 'open':
+                            raise ValueError('open a session first')
+                        session = CircuitSession(message['circuit_dimension'],
+                                                 message.get('gate_array'),
+                                                 formats.negotiate(message.get('format')))
+                    else:
+                        for edit in sessions.edit_list(message):
+                            session.apply_edit(edit)
+                    # Sessions simulate in this process, off the event loop thread
+                    reply = await asyncio.to_thread(session.encoded_statevector)
+                except (KeyError, TypeError, ValueError) as error:
+                    await websocket.send_json({'error': str(error)})
+                    continue
+                if isinstance(reply, bytes):
+                    await websocket.send_bytes(reply)
+                else:
+                    await websocket.send_text(reply)
+        except WebSocketDisconnect:
+            pass
+
+    def unknown_session():
+        return JSONResponse({"error": "unknown session"}, status_code=404)
+
+    async def request_params(request):
+        if request.headers.get('content-type', '').startswith('application/json'):
+            return await request.json()
+        return await request.form()
+
+    async def create_session(request):
+        params = await request_params(request)
+        format_param = params.get('format') or request.query_params.get('format')
+        response_format = formats.negotiate(format_param, request.headers.get('accept'))
+        try:
+            session_id, session = sessions.store.create(params['circuit_dimension'],
+                                                        params.get('gate_array'), response_format)
+        except (KeyError, ValueError, IndexError) as error:
+            return JSONResponse({"error": "invalid circuit: {}".format(error)}, status_code=400)
+        model = session.circuit_grid_model
+        return JSONResponse({"session": session_id,
+                             "circuit_dimension": "{},{}".format(model.max_wires,
+                                                                 model.max_columns),
+                             "format": response_format},
+                            status_code=201, headers={'Location': '/api/sessions/' + session_id})
+
+    async def edit_session(request):
+        try:
+            session = sessions.store.get(request.path_params['session_id'])
+        except KeyError:
+            return unknown_session()
+        try:
+            for edit in sessions.edit_list(await request.json()):
+                session.apply_edit(edit)
+        except (TypeError, ValueError) as error:
+            return JSONResponse({"error": str(error)}, status_code=400)
+        reply = await asyncio.to_thread(session.encoded_statevector)
+        return Response(reply, media_type=formats.MEDIA_TYPES[session.response_format])
+
+    async def get_session(request):
+        try:
+            session = sessions.store.get(request.path_params['session_id'])
+        except KeyError:
+            return unknown_session()
+        response_format = formats.negotiate(request.query_params.get('format') or
+                                            session.response_format)
+        quantum_state = await asyncio.to_thread(session.statevector)
+        return Response(formats.encode_statevector(quantum_state, response_format),
+                        media_type=formats.MEDIA_TYPES[response_format])
+
+    async def get_session_probabilities(request):
+        try:
+            session = sessions.store.get(request.path_params['session_id'])
+        except KeyError:
+            return unknown_session()
+        probabilities = await asyncio.to_thread(session.probabilities)
+        return JSONResponse({"probabilities": np.round(probabilities, decimals=6).tolist()})
+
+    async def delete_session(request):
+        if not sessions.store.delete(request.path_params['session_id']):
+            return unknown_session()
+        return Response(status_code=204)
+
+    async def no_worker(request, error):
+        return JSONResponse({"error": str(error)}, status_code=503)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        pool.start()
+        try:
+            yield
+        finally:
+            pool.shutdown()
+
+    routes = [
+        Route('/', welcome),
+        Route('/health', health),
+        Route('/ready', ready),
+        Route('/workers', worker_stats, methods=['GET']),
+        Route('/metrics', get_metrics, methods=['GET']),
+        Route('/api/run/qasm', run_qasm, methods=['GET']),
+        Route('/api/run/tomography', run_tomography, methods=['GET']),
+        Route('/api/run/get_statevector', get_statevector, methods=['POST']),
+        Route('/api/run/batch', run_batch, methods=['POST']),
+        Route('/api/run/unitary', run_unitary, methods=['GET', 'POST']),
+        Route('/api/run/do_measurement', do_measurement, methods=['POST']),
+        Route('/api/sessions', create_session, methods=['POST']),
+        Route('/api/sessions/{session_id}', edit_session, methods=['PATCH']),
+        Route('/api/sessions/{session_id}', get_session, methods=['GET']),
+        Route('/api/sessions/{session_id}', delete_session, methods=['DELETE']),
+        Route('/api/sessions/{session_id}/probabilities', get_session_probabilities,
+              methods=['GET']),
+        WebSocketRoute('/api/session/ws', session_socket),
+    ]
+    if affinity:
+        routes += [
+            Route('/workers', add_worker, methods=['POST']),
+            Route('/workers/{name}', remove_worker, methods=['DELETE']),
+        ]
+    middleware = [Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'],
+                             allow_headers=['*'])]
+    app = Starlette(routes=routes, middleware=middleware, lifespan=lifespan,
+                    exception_handlers={NoWorkerError: no_worker})
+    app.state.pool = pool
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8008)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='number of simulation worker processes')
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                        help='simulations allowed in flight per worker, later requests wait')
+    parser.add_argument('--affinity', action='store_true',
+                        help='send each circuit to the same worker, by a consistent hash of it')
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.workers, args.max_pending, args.affinity),
+                host=args.host, port=args.port)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+from collections import OrderedDict
+import sys
+import threading
+import time
+
+import numpy as np
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache bounded by entry count and memory
+
+    Entries older than ttl seconds (if given) are treated as misses.
+    """
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.num_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, size, created = entry
+                if self.ttl is None or time.monotonic() - created < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, value, size=None):
+        """Store value, size is its memory in bytes if value_size() cannot tell"""
+        if size is None:
+            size = value_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic())
+            self.num_bytes += size
+            while len(self._entries) > self.max_entries or self.num_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key):
+        """Remove key, returning whether it was present"""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def expire(self):
+        """Drop every entry older than ttl now, rather than when it is next looked up"""
+        if self.ttl is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, _, created) in self._entries.items()
+                       if now - created >= self.ttl]
+            for key in expired:
+                self._remove(key)
+            self.evictions += len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.num_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.num_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.num_bytes -= size
+
+
+class SingleFlight:
+    """Runs a call once for all the threads that ask for the same key at the same time
+
+    A thread that asks for a key while the call for it is still running
+    waits for that call and gets its result, or its exception, instead of
+    making the call again.
+    """
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._flights = {}  # key: _Flight of the call running for it
+        self._lock = threading.Lock()
+
+    def do(self, key, function, *args):
+        """(function(*args), True if the result came from a call already running)"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = function(*args)
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def stats(self):
+        with self._lock:
+            return {'running': len(self._flights), 'calls': self.calls, 'shared': self.shared}
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def value_size(value):
+    """Approximate memory held by a cached value, counting ndarray buffers"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(value_size(item) for item in value)
+    return sys.getsizeof(value)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Encodings for statevector replies
+
+json           json_tricks ndarray, amplitudes rounded to 3 decimals (default)
+complex64      header + little-endian complex64 amplitudes
+probabilities  header + little-endian float32 |amplitude|**2
+msgpack        MessagePack map holding the complex64 buffer, if msgpack is installed
+
+The binary header is 12 bytes: a 4 byte magic (b'QSV1' for complex64,
+b'QPR1' for probabilities), then uint32 number of qubits and uint32 number
+of states (1, or the batch size for /api/run/batch).
+
+Unitaries from /api/run/unitary are json_tricks matrices, or in binary a
+16 byte header: magic b'QUN2', uint32 number of qubits of the matrix side,
+uint32 element code from UNITARY_ELEMENTS and uint32 block qubits, followed
+by the matrix in row-major order. Block qubits is 0 for the unitary itself
+and k for a downsampled reply, whose elements are the root mean square
+magnitudes of 2**k x 2**k blocks of the unitary.
+"""
+import struct
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'json'
+COMPLEX64 = 'complex64'
+PROBABILITIES = 'probabilities'
+MSGPACK = 'msgpack'
+
+MEDIA_TYPES = {
+    JSON: 'text/html',  # what the Flask server has always replied with
+    COMPLEX64: 'application/x-statevector-complex64',
+    PROBABILITIES: 'application/x-statevector-probabilities',
+    MSGPACK: 'application/msgpack',
+}
+
+UNITARY_MEDIA_TYPE = 'application/x-unitary'
+UNITARY_MAGIC = b'QUN2'
+UNITARY_HEADER = struct.Struct('<4sIII')
+# (mode, dtype): binary element code and little-endian element type
+UNITARY_ELEMENTS = {
+    ('complex', 'float64'): (0, '<c16'),
+    ('complex', 'float32'): (1, '<c8'),
+    ('magnitude', 'float64'): (2, '<f8'),
+    ('magnitude', 'float32'): (3, '<f4'),
+}
+
+HEADER = struct.Struct('<4sII')
+MAGIC = {
+    COMPLEX64: b'QSV1',
+    PROBABILITIES: b'QPR1',
+}
+
+
+def available_formats():
+    return [response_format for response_format in MEDIA_TYPES
+            if response_format != MSGPACK or msgpack is not None]
+
+
+def negotiate(format_param=None, accept_header=None):
+    """Pick a reply format from an explicit format parameter or the Accept header
+
+    Falls back to JSON when nothing requested is available.
+    """
+    formats = available_formats()
+    if format_param in formats:
+        return format_param
+    if accept_header:
+        by_media_type = {MEDIA_TYPES[response_format]: response_format
+                         for response_format in formats if response_format != JSON}
+        for media_range in accept_header.split(','):
+            media_type = media_range.split(';')[0].strip()
+            if media_type in by_media_type:
+                return by_media_type[media_type]
+    return JSON
+
+
+def encode_statevector(quantum_states, response_format=JSON):
+    """Encode one statevector, or a (batch, 2**n) array of them"""
+    quantum_states = np.asarray(quantum_states)
+    if response_format == JSON:
+        import json_tricks
+        return json_tricks.dumps(np.round(quantum_states, decimals=3))
+
+    num_states = 1 if quantum_states.ndim == 1 else quantum_states.shape[0]
+    num_qubits = quantum_states.shape[-1].bit_length() - 1
+    amplitudes = quantum_states.astype('<c8')
+    if response_format == MSGPACK:
+        return msgpack.packb({
+            'num_qubits': num_qubits,
+            'shape': list(quantum_states.shape),
+            'dtype': '<c8',
+            'data': amplitudes.tobytes(),
+        })
+    if response_format == PROBABILITIES:
+        payload = (amplitudes.real ** 2 + amplitudes.imag ** 2).astype('<f4')
+    else:
+        payload = amplitudes
+    return HEADER.pack(MAGIC[response_format], num_qubits, num_states) + payload.tobytes()
+
+
+def encode_unitary(matrix, mode='complex', dtype='float64', binary=False, extra=None):
+    """Encode a unitary (or its magnitudes, for mode 'magnitude') as JSON or binary
+
+    extra holds additional fields for the JSON result, its block_qubits (if
+    any) also goes in the binary header.
+    """
+    code, element_type = UNITARY_ELEMENTS[(mode, dtype)]
+    matrix = np.asarray(matrix).astype(element_type)
+    if binary:
+        matrix_qubits = len(matrix).bit_length() - 1
+        block_qubits = (extra or {}).get('block_qubits', 0)
+        return UNITARY_HEADER.pack(UNITARY_MAGIC, matrix_qubits, code, block_qubits) + \
+            matrix.tobytes()
+
+    import json_tricks
+    result = dict(extra or {}, mode=mode, dtype=dtype,
+                  unitary=np.round(matrix, decimals=3 if mode == 'complex' else 4))
+    return json_tricks.dumps({'result': result})
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Counters and histograms exposed in the Prometheus text format on /metrics
+
+Each process has its own registry, the ASGI server renders the snapshot()s
+of its worker processes together, labelled with worker=<name>.
+"""
+from bisect import bisect_left
+import contextlib
+import threading
+import time
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUBIT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 12, 16, 20, 24, 32, 48, 64)
+DEPTH_BUCKETS = (1, 2, 4, 8, 12, 18, 24, 32, 48, 64, 128, 256)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        label_values = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self, snapshots=None):
+        lines = ['# HELP {} {}'.format(self.name, self.documentation),
+                 '# TYPE {} counter'.format(self.name)]
+        labelnames, samples = labelled_samples(self, snapshots)
+        for label_values, value in samples:
+            lines.append('{}{} {}'.format(self.name, format_labels(labelnames, label_values),
+                                          value))
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # label values: [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        label_values = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            values = self._values.get(label_values)
+            if values is None:
+                values = self._values[label_values] = [0] * (len(self.buckets) + 2)
+            bucket = bisect_left(self.buckets, value)
+            if bucket < len(self.buckets):
+                values[bucket] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {label_values: list(values) for label_values, values in self._values.items()}
+
+    def render(self, snapshots=None):
+        lines = ['# HELP {} {}'.format(self.name, self.documentation),
+                 '# TYPE {} histogram'.format(self.name)]
+        labelnames, samples = labelled_samples(self, snapshots)
+        bucket_labelnames = labelnames + ('le',)
+        for label_values, values in samples:
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(
+                    self.name, format_labels(bucket_labelnames, label_values + (repr(bound),)),
+                    cumulative))
+            lines.append('{}_bucket{} {}'.format(
+                self.name, format_labels(bucket_labelnames, label_values + ('+Inf',)),
+                values[-1]))
+            labels = format_labels(labelnames, label_values)
+            lines.append('{}_sum{} {}'.format(self.name, labels, values[-2]))
+            lines.append('{}_count{} {}'.format(self.name, labels, values[-1]))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.caches = {}
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def watch_cache(self, name, cache):
+        """Report the stats() of an LRUCache as gauges labelled with cache=name"""
+        self.caches[name] = cache
+
+    def snapshot(self):
+        """Picklable values of every metric and cache, for render() in another process"""
+        return {'metrics': {metric.name: metric.snapshot() for metric in self.metrics},
+                'caches': {name: cache.stats() for name, cache in self.caches.items()}}
+
+    def render(self, snapshots=None):
+        """Prometheus text of this registry
+
+        snapshots maps process names to their registry's snapshot(), they are
+        rendered instead of this registry's values, each with a worker label.
+        """
+        lines = []
+        for metric in self.metrics:
+            metric_snapshots = None if snapshots is None else {
+                worker: snapshot['metrics'].get(metric.name, {})
+                for worker, snapshot in snapshots.items()}
+            lines.extend(metric.render(metric_snapshots))
+
+        if snapshots is None:
+            labelnames = ('cache',)
+            cache_stats = [((name,), cache.stats()) for name, cache in self.caches.items()]
+        else:
+            labelnames = ('worker', 'cache')
+            cache_stats = [((worker, name), stats) for worker, snapshot in snapshots.items()
+                           for name, stats in snapshot['caches'].items()]
+        cache_stats.sort(key=lambda item: item[0])
+        for stat in ('hits', 'misses', 'evictions', 'entries', 'bytes', 'hit_ratio'):
+            name = 'qiskit_server_cache_' + stat
+            lines.append('# HELP {} Cache {} per cache'.format(name, stat.replace('_', ' ')))
+            lines.append('# TYPE {} gauge'.format(name))
+            for label_values, stats in cache_stats:
+                lines.append('{}{} {}'.format(name, format_labels(labelnames, label_values),
+                                              stats[stat]))
+        return '\n'.join(lines) + '\n'
+
+
+def labelled_samples(metric, snapshots=None):
+    """(label names, sorted (label values, value) pairs) of a Counter or Histogram
+
+    snapshots maps process names to snapshots of the metric taken in each of
+    them, their samples get the process name as a leading worker label.
+    """
+    if snapshots is None:
+        return metric.labelnames, sorted(metric.snapshot().items())
+    samples = [((worker,) + label_values, values)
+               for worker, snapshot in snapshots.items()
+               for label_values, values in snapshot.items()]
+    return ('worker',) + metric.labelnames, sorted(samples)
+
+
+def format_labels(labelnames, label_values):
+    if not labelnames:
+        return ''
+    pairs = ('{}="{}"'.format(name, value.replace('\\', '\\\\').replace('"', '\\"'))
+             for name, value in zip(labelnames, label_values))
+    return '{' + ','.join(pairs) + '}'
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    'qiskit_server_stage_seconds',
+    'Time spent in each stage of handling a circuit', ['stage'])
+request_seconds = registry.histogram(
+    'qiskit_server_request_seconds', 'Request latency per endpoint', ['endpoint'])
+requests_total = registry.counter(
+    'qiskit_server_requests_total', 'Requests per endpoint and status code',
+    ['endpoint', 'status'])
+request_errors_total = registry.counter(
+    'qiskit_server_request_errors_total', 'Requests that failed with a 4xx or 5xx status',
+    ['endpoint'])
+single_flight_calls_total = registry.counter(
+    'qiskit_server_single_flight_calls_total',
+    'Simulations run after a cache miss, each shared by the requests coalesced into it',
+    ['call'])
+coalesced_total = registry.counter(
+    'qiskit_server_coalesced_total',
+    'Requests that shared an identical simulation already running instead of running their own',
+    ['call'])
+circuit_qubits = registry.histogram(
+    'qiskit_server_circuit_qubits', 'Number of qubits of parsed circuits', ['source'],
+    QUBIT_BUCKETS)
+circuit_depth = registry.histogram(
+    'qiskit_server_circuit_depth', 'Number of grid columns or QASM instructions of parsed circuits',
+    ['source'], DEPTH_BUCKETS)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Consistent-hash routing of api calls to simulation workers
+
+Each worker owns REPLICAS points on a hash ring, and a call goes to the
+owner of the first point after the hash of its circuit key, so the same
+circuit always reaches the same worker and finds its caches warm. When a
+worker joins or leaves, only the circuits on its share of the ring move.
+
+    ring = HashRing(['worker-0', 'worker-1'])
+    ring.node_for(routing_key('statevector', ('3,18', 'H,I,...'), {}))
+"""
+from bisect import bisect
+import hashlib
+import time
+
+import api
+
+REPLICAS = 64  # points per worker, more points spread the circuits more evenly
+
+
+def ring_hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    def __init__(self, nodes=(), replicas=REPLICAS):
+        self.replicas = replicas
+        self._points = []  # sorted hashes
+        self._owners = []  # node owning the point at the same index
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(set(self._owners))
+
+    def __contains__(self, node):
+        return node in self._owners
+
+    def add(self, node):
+        for replica in range(self.replicas):
+            point = ring_hash('{}#{}'.format(node, replica))
+            index = bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node):
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners)
+                if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def node_for(self, key):
+        """Node owning key, None when the ring is empty"""
+        return next(self.nodes_for(key), None)
+
+    def nodes_for(self, key):
+        """Distinct nodes in ring order from the owner of key, for falling back on"""
+        if not self._points:
+            return
+        start = bisect(self._points, ring_hash(key))
+        seen = set()
+        for offset in range(len(self._points)):
+            owner = self._owners[(start + offset) % len(self._points)]
+            if owner not in seen:
+                seen.add(owner)
+                yield owner
+
+    def shares(self):
+        """Fraction of the hash space owned by each node"""
+        shares = {}
+        for index, owner in enumerate(self._owners):
+            span = (self._points[index] - self._points[index - 1]) % 2 ** 64
+            shares[owner] = shares.get(owner, 0.0) + span / 2 ** 64
+        return shares
+
+
+def routing_key(function_name, args, kwargs):
+    """Canonical circuit key of an api call, the same for calls on identical circuits"""
+    try:
+        if function_name in ('qasm', 'tomography'):
+            return api.qasm_key(args[0])
+        if function_name == 'unitary' and args[2] is not None:
+            return api.qasm_key(args[2])
+        if function_name == 'batch_statevector':
+            return api.circuit_key(args[0], args[1][0])
+        return api.circuit_key(args[0], args[1])
+    except (AttributeError, IndexError, TypeError, ValueError):
+        # Malformed calls fail in the worker, any worker will do
+        return repr((function_name, args, sorted(kwargs.items())))
+
+
+class WorkerStats:
+    """Load of one worker, as reported on /workers"""
+    def __init__(self):
+        self.started = time.monotonic()
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.fallbacks = 0  # calls it took because their owner was saturated
+        self.busy_seconds = 0.0
+
+    def as_dict(self):
+        uptime = time.monotonic() - self.started
+        return {
+            'in_flight': self.in_flight,
+            'calls': self.calls,
+            'errors': self.errors,
+            'fallbacks': self.fallbacks,
+            'busy_seconds': round(self.busy_seconds, 6),
+            'utilization': round(self.busy_seconds / uptime, 6) if uptime else 0.0,
+            'uptime_seconds': round(uptime, 3),
+        }
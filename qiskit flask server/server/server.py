@@ -2,16 +2,25 @@
 from pathlib import Path
 import sys
 import logging
+import time
 
 # add project path to PYTHONPATH in order to run server.py as a script
 project_path = str(Path().resolve().parent)
 sys.path.append(project_path)
 
+from flask import g
 from flask import request
 from flask import Flask
+from flask import Response
+from flask import jsonify
 from flask_cors import CORS
+import numpy as np
 
-from api import qasm, statevector, measurement
+from api import qasm, statevector, measurement, batch_statevector, tomography, unitary
+import api
+import formats
+import metrics
+import sessions
 
 
 app = Flask(__name__)
@@ -19,25 +28,83 @@ CORS(app)
 
 logging.getLogger('flask_cors').level = logging.DEBUG # for debugging
 
+# Import qiskit and run first simulations in the background, see /ready
+api.start_warm_up()
+
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.request_seconds.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    metrics.requests_total.inc(endpoint=endpoint, status=response.status_code)
+    if response.status_code >= 400:
+        metrics.request_errors_total.inc(endpoint=endpoint)
+    return response
+
 
 @app.route('/')
 def welcome():
     return "Hi Qiskiter!"
 
 
+@app.route('/health')
+def health():
+    """Liveness, the server is up and handling requests"""
+    return jsonify({"status": "ok"})
+
+
+@app.route('/ready')
+def ready():
+    """Readiness, 503 until the warm-up has imported qiskit and run both engines"""
+    if not api.ready.is_set():
+        return jsonify({"status": "warming up"}), 503
+    return jsonify({"status": "ready"})
+
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/run/qasm', methods=['GET'])
 def run_qasm():
     qasm_string = request.args['qasm']
-    backend = request.args['backend']
+    backend = request.args.get('backend', api.NUMPY_BACKEND)
+    num_shots = request.args.get('num_shots', 1)
+    seed = request.args.get('seed')
     print("--------------")
     print('qasm: ', qasm_string)
     print('backend: ', backend)
+    print('num_shots: ', num_shots)
     print("^^^^^^^^^^^^^^")
-    output = qasm(qasm_string, backend)
+    try:
+        output = qasm(qasm_string, backend, int(num_shots), None if seed is None else int(seed))
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
     ret = {"result": output}
     return jsonify(ret)
 
 
+@app.route('/api/run/tomography', methods=['GET'])
+def run_tomography():
+    qasm_string = request.args['qasm']
+    measure = request.args.get('measure', '0') not in ('0', 'false', '')
+    session_id = request.args.get('session')
+    print("--------------")
+    print('qasm: ', qasm_string)
+
+    try:
+        reply = tomography(qasm_string, measure, session_id)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    return Response(reply, mimetype='application/json')
+
+
 @app.route('/api/run/get_statevector', methods=['POST'])
 def get_statevector():
     circuit_dimension = request.form.get('circuit_dimension')
@@ -45,20 +112,138 @@ def get_statevector():
     print("--------------")
     print(gate_string)
 
-    reply = statevector(circuit_dimension, gate_string)
-    return reply
+    response_format = requested_format()
+    try:
+        reply = statevector(circuit_dimension, gate_string, response_format=response_format)
+    except (ValueError, IndexError) as error:
+        return jsonify({"error": str(error)}), 400
+    return format_reply(reply, response_format)
+
+
+@app.route('/api/run/batch', methods=['POST'])
+def run_batch():
+    circuit_dimension = request.form.get('circuit_dimension')
+    gate_strings = request.form.getlist('gate_array')
+    print("--------------")
+    print(len(gate_strings), 'circuits')
+
+    response_format = requested_format()
+    try:
+        reply = batch_statevector(circuit_dimension, gate_strings, response_format)
+    except (ValueError, IndexError) as error:
+        return jsonify({"error": str(error)}), 400
+    return format_reply(reply, response_format)
+
+
+@app.route('/api/run/unitary', methods=['GET', 'POST'])
+def run_unitary():
+    """Unitary of a grid (circuit_dimension, gate_array) or of a qasm circuit
+
+    Optional: mode=complex|magnitude, dtype=float64|float32, downsample=1 and
+    format=binary (or Accept: application/x-unitary).
+    """
+    params = request.values
+    binary = params.get('format') == 'binary' or \
+        formats.UNITARY_MEDIA_TYPE in request.headers.get('Accept', '')
+    print("--------------")
+    print(params.get('qasm') or params.get('gate_array'))
+
+    try:
+        reply = unitary(params.get('circuit_dimension'), params.get('gate_array'),
+                        params.get('qasm'), params.get('mode', 'complex'),
+                        params.get('dtype', 'float64'),
+                        params.get('downsample', '0') not in ('0', 'false', ''), binary)
+    except (ValueError, IndexError) as error:
+        return jsonify({"error": str(error)}), 400
+    mimetype = formats.UNITARY_MEDIA_TYPE if binary else 'application/json'
+    return Response(reply, mimetype=mimetype)
 
 
 @app.route('/api/run/do_measurement', methods=['POST'])
 def do_measurement():
     circuit_dimension = request.form.get('circuit_dimension')
     gate_string = request.form.get('gate_array')
+    session_id = request.form.get('session')
     print("--------------")
     print(gate_string)
 
-    reply = measurement(circuit_dimension, gate_string)
+    try:
+        reply = measurement(circuit_dimension, gate_string, session_id)
+    except (ValueError, IndexError) as error:
+        return jsonify({"error": str(error)}), 400
     return reply
 
 
+@app.route('/api/sessions', methods=['POST'])
+def create_session():
+    params = request.get_json(silent=True) or request.form
+    format_param = params.get('format') or request.args.get('format')
+    response_format = formats.negotiate(format_param, request.headers.get('Accept'))
+    try:
+        session_id, session = sessions.store.create(params['circuit_dimension'],
+                                                    params.get('gate_array'), response_format)
+    except (KeyError, ValueError, IndexError) as error:
+        return jsonify({"error": "invalid circuit: {}".format(error)}), 400
+    model = session.circuit_grid_model
+    reply = jsonify({"session": session_id,
+                     "circuit_dimension": "{},{}".format(model.max_wires, model.max_columns),
+                     "format": response_format})
+    return reply, 201, {'Location': '/api/sessions/' + session_id}
+
+
+@app.route('/api/sessions/<session_id>', methods=['PATCH'])
+def edit_session(session_id):
+    """Apply edits (see sessions.py) and reply with the new state"""
+    try:
+        session = sessions.store.get(session_id)
+    except KeyError:
+        return jsonify({"error": "unknown session"}), 404
+    try:
+        for edit in sessions.edit_list(request.get_json(force=True, silent=True)):
+            session.apply_edit(edit)
+    except (TypeError, ValueError) as error:
+        return jsonify({"error": str(error)}), 400
+    return format_reply(session.encoded_statevector(), session.response_format)
+
+
+@app.route('/api/sessions/<session_id>', methods=['GET'])
+def get_session(session_id):
+    try:
+        session = sessions.store.get(session_id)
+    except KeyError:
+        return jsonify({"error": "unknown session"}), 404
+    response_format = formats.negotiate(request.args.get('format') or session.response_format)
+    return format_reply(formats.encode_statevector(session.statevector(), response_format),
+                        response_format)
+
+
+@app.route('/api/sessions/<session_id>/probabilities', methods=['GET'])
+def get_session_probabilities(session_id):
+    try:
+        session = sessions.store.get(session_id)
+    except KeyError:
+        return jsonify({"error": "unknown session"}), 404
+    return jsonify({"probabilities": np.round(session.probabilities(), decimals=6).tolist()})
+
+
+@app.route('/api/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    if not sessions.store.delete(session_id):
+        return jsonify({"error": "unknown session"}), 404
+    return '', 204
+
+
+def requested_format():
+    """Statevector format from the 'format' form field or query argument, else the Accept header"""
+    format_param = request.form.get('format') or request.args.get('format')
+    return formats.negotiate(format_param, request.headers.get('Accept'))
+
+
+def format_reply(reply, response_format):
+    if response_format == formats.JSON:
+        return reply
+    return Response(reply, mimetype=formats.MEDIA_TYPES[response_format])
+
+
 if __name__ == '__main__':
     app.run(host='127.0.0.1', port=8008)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""Circuit sessions that keep a CircuitGridModel in memory and apply single-cell edits
+
+An edit is a dict with an 'action' and the 'wire' and 'column' of the cell:
+
+    {"action": "set", "wire": 0, "column": 3, "gate": "H"}
+    {"action": "delete", "wire": 0, "column": 3}
+    {"action": "ctrl", "wire": 0, "column": 3, "ctrl": 1}       (ctrl -1 removes it)
+    {"action": "rotate", "wire": 0, "column": 3, "radians": 0.3927}
+    {"action": "column", "column": 3, "gates": ["H", "I", "X"]}   (one gate per wire)
+
+SessionStore keeps sessions by id for the REST endpoints under /api/sessions.
+"""
+import secrets
+import threading
+
+import numpy as np
+
+import api
+from cache import LRUCache
+from engine import statevector as sv_engine
+import formats
+import metrics
+from model.circuit_grid_model import CircuitGridNode
+from model import circuit_node_types as node_types
+
+# Gates a session edit can place, in addition to the ones a gate_array may hold
+EDIT_GATES = dict(api.GRID_GATES, I=node_types.IDEN, S=node_types.S, SDG=node_types.SDG,
+                  T=node_types.T, TDG=node_types.TDG)
+
+ROTATABLE_NODES = (node_types.X, node_types.Y, node_types.Z)
+CONTROLLABLE_NODES = (node_types.X, node_types.Y, node_types.Z, node_types.H)
+
+MAX_SESSIONS = 1024  # the least recently used session is dropped beyond this
+SESSION_IDLE_SECONDS = 30 * 60
+SESSIONS_MAX_BYTES = 256 * 1024 * 1024
+# A session keeps the state after every column while they take at most this
+# much memory, larger ones resume from the shared api.prefix_cache instead
+SESSION_SNAPSHOT_BYTES = 8 * 1024 * 1024
+NODE_BYTES = 200  # rough memory of one grid cell
+
+
+class CircuitSession:
+    """A client's circuit, edited in place and simulated on request"""
+    def __init__(self, circuit_dimension, gate_string=None, response_format=formats.JSON):
+        # Sessions always run on the statevector engine, whatever their gates
+        api.check_statevector_width(api.grid_width(circuit_dimension))
+        if gate_string is None:
+            row_max, column_max = (int(size) for size in circuit_dimension.split(',')[:2])
+            gate_string = ','.join(['I'] * (row_max * column_max))
+        self.circuit_grid_model = api.grid_model_from_string(circuit_dimension, gate_string)
+        self.response_format = response_format
+        self.lock = threading.RLock()
+        # States after columns 0, 1, ..., kept until an edit changes an earlier column
+        self._column_states = []
+        num_qubits = self.circuit_grid_model.max_wires
+        self._keep_snapshots = (16 * 2 ** num_qubits * self.circuit_grid_model.max_columns
+                                <= SESSION_SNAPSHOT_BYTES)
+
+    @property
+    def nbytes(self):
+        return NODE_BYTES * self.circuit_grid_model.nodes.size + \
+            sum(state.nbytes for state in self._column_states)
+
+    def apply_edit(self, edit):
+        with self.lock:
+            apply_edit(self.circuit_grid_model, edit)
+            del self._column_states[int(edit['column']):]
+
+    def statevector(self):
+        """Final state, only simulating the columns from the first edited one on"""
+        with self.lock:
+            if not self._keep_snapshots:
+                return sv_engine.simulate(self.circuit_grid_model, api.prefix_cache)
+            circuit_grid_model = self.circuit_grid_model
+            num_qubits = circuit_grid_model.max_wires
+            if self._column_states:
+                state = self._column_states[-1].copy()
+            else:
+                state = sv_engine.zero_state(num_qubits)
+            for column_num in range(len(self._column_states), circuit_grid_model.max_columns):
+                sv_engine.simulate_operations(
+                    num_qubits, sv_engine.column_operations(circuit_grid_model, column_num), state)
+                snapshot = state.copy()
+                snapshot.setflags(write=False)
+                self._column_states.append(snapshot)
+            return state
+
+    def probabilities(self):
+        return sv_engine.probabilities(self.statevector())
+
+    def encoded_statevector(self):
+        return formats.encode_statevector(self.statevector(), self.response_format)
+
+
+class SessionStore:
+    """CircuitSessions by id, dropped after SESSION_IDLE_SECONDS without use
+
+    Beyond MAX_SESSIONS sessions, or SESSIONS_MAX_BYTES of them, the least
+    recently used ones are dropped.
+    """
+    def __init__(self, max_sessions=MAX_SESSIONS, idle_seconds=SESSION_IDLE_SECONDS,
+                 max_bytes=SESSIONS_MAX_BYTES):
+        self.sessions = LRUCache(max_sessions, max_bytes, idle_seconds)
+
+    def create(self, circuit_dimension, gate_string=None, response_format=formats.JSON):
+        self.sessions.expire()
+        session = CircuitSession(circuit_dimension, gate_string, response_format)
+        session_id = secrets.token_urlsafe(12)
+        self.sessions.put(session_id, session, session.nbytes)
+        return session_id, session
+
+    def get(self, session_id):
+        """The session, raising KeyError if it does not exist or has expired"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        # Storing it again restarts its idle timer and updates its memory use
+        self.sessions.put(session_id, session, session.nbytes)
+        return session
+
+    def delete(self, session_id):
+        return self.sessions.delete(session_id)
+
+
+store = SessionStore()
+metrics.registry.watch_cache('sessions', store.sessions)
+
+
+def edit_list(message):
+    """Edits in a PATCH body or WebSocket message: one edit, a list, or {"edits": [...]}"""
+    if isinstance(message, dict) and 'edits' in message:
+        message = message['edits']
+    edits = message if isinstance(message, list) else [message]
+    if not all(isinstance(edit, dict) for edit in edits):
+        raise ValueError('edits must be JSON objects')
+    return edits
+
+
+def apply_edit(circuit_grid_model, edit):
+    """Apply one edit to circuit_grid_model, raising ValueError if it is not valid"""
+    action = edit.get('action')
+    if action == 'column':
+        gates = edit.get('gates')
+        if not isinstance(gates, list) or len(gates) != circuit_grid_model.max_wires:
+            raise ValueError('a column edit needs one gate per wire')
+        for gate in gates:
+            if gate not in EDIT_GATES:
+                raise ValueError('unknown gate: {}'.format(gate))
+        for wire_num, gate in enumerate(gates):
+            apply_edit(circuit_grid_model, {'action': 'set', 'wire': wire_num,
+                                            'column': edit.get('column'), 'gate': gate})
+        return
+    wire_num = _wire(circuit_grid_model, edit.get('wire'))
+    column_num = int(edit.get('column', -1))
+    if not 0 <= column_num < circuit_grid_model.max_columns:
+        raise ValueError('column out of range: {}'.format(column_num))
+    node = circuit_grid_model.get_node(wire_num, column_num)
+
+    if action == 'set':
+        gate = edit.get('gate')
+        if gate not in EDIT_GATES:
+            raise ValueError('unknown gate: {}'.format(gate))
+        _release_control(circuit_grid_model, wire_num, column_num)
+        _clear_controls(circuit_grid_model, node, column_num)
+        circuit_grid_model.set_node(wire_num, column_num, CircuitGridNode(EDIT_GATES[gate]))
+    elif action == 'delete':
+        _release_control(circuit_grid_model, wire_num, column_num)
+        _clear_controls(circuit_grid_model, node, column_num)
+        circuit_grid_model.set_node(wire_num, column_num, CircuitGridNode(node_types.IDEN))
+    elif action == 'ctrl':
+        if node is None or node.node_type not in CONTROLLABLE_NODES:
+            raise ValueError('gate on wire {} cannot be controlled'.format(wire_num))
+        ctrl_num = int(edit.get('ctrl', -1))
+        # Checked before anything changes, so a refused edit leaves the grid as it was
+        if ctrl_num != -1:
+            ctrl_num = _wire(circuit_grid_model, ctrl_num)
+            ctrl_node = circuit_grid_model.get_node(ctrl_num, column_num)
+            own_control = ctrl_num in (node.ctrl_a, node.ctrl_b)
+            if ctrl_num == wire_num or (not own_control and ctrl_node and
+                                        ctrl_node.node_type != node_types.IDEN):
+                raise ValueError('wire {} is not free for a control'.format(ctrl_num))
+        _clear_controls(circuit_grid_model, node, column_num)
+        node.ctrl_a = -1
+        node.ctrl_b = -1
+        if ctrl_num != -1:
+            # Control cells hold no gate of their own, the gate node refers to them
+            circuit_grid_model.set_node(ctrl_num, column_num, CircuitGridNode(node_types.EMPTY))
+            node.ctrl_a = ctrl_num
+    elif action == 'rotate':
+        if node is None or node.node_type not in ROTATABLE_NODES:
+            raise ValueError('gate on wire {} cannot be rotated'.format(wire_num))
+        node.radians = (node.radians + float(edit.get('radians', 0))) % (2 * np.pi)
+    else:
+        raise ValueError('unknown action: {}'.format(action))
+
+
+def _wire(circuit_grid_model, wire_num):
+    wire_num = int(-1 if wire_num is None else wire_num)
+    if not 0 <= wire_num < circuit_grid_model.max_wires:
+        raise ValueError('wire out of range: {}'.format(wire_num))
+    return wire_num
+
+
+def _clear_controls(circuit_grid_model, node, column_num):
+    """Turn the control cells of node back into empty wire"""
+    if node is None:
+        return
+    for ctrl_num in (node.ctrl_a, node.ctrl_b):
+        if ctrl_num != -1:
+            circuit_grid_model.set_node(ctrl_num, column_num, CircuitGridNode(node_types.IDEN))
+
+
+def _release_control(circuit_grid_model, wire_num, column_num):
+    """Detach wire_num from any gate in the column that uses it as a control"""
+    for other_wire in range(circuit_grid_model.max_wires):
+        other_node = circuit_grid_model.get_node(other_wire, column_num)
+        if other_wire == wire_num or other_node is None:
+            continue
+        if other_node.ctrl_a == wire_num:
+            other_node.ctrl_a, other_node.ctrl_b = other_node.ctrl_b, -1
+        elif other_node.ctrl_b == wire_num:
+            other_node.ctrl_b = -1
@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+"""Put the project and server folders on sys.path, as server.py does when run from server/"""
+from pathlib import Path
+import sys
+
+project_path = Path(__file__).resolve().parent.parent
+for path in (project_path, project_path / 'server'):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
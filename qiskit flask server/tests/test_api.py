@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+import numpy as np
+import pytest
+
+import api
+
+pytestmark = pytest.mark.filterwarnings('ignore::DeprecationWarning')
+
+
+def test_evicted_session_does_not_replay_its_outcomes():
+    with api._measurement_lock:
+        first = api.session_rng('evicted').random(8)
+        api.measurement_rngs.delete('evicted')
+        second = api.session_rng('evicted').random(8)
+    assert not np.allclose(first, second)
+
+
+def test_session_keeps_its_stream_while_cached():
+    with api._measurement_lock:
+        rng = api.session_rng('kept')
+        assert api.session_rng('kept') is rng
+
+
+@pytest.mark.parametrize('call', [
+    lambda: api.statevector('30,1', 'H'),
+    lambda: api.cached_statevector('30,1', 'H'),
+    lambda: api.measurement('30,1', 'H', backend_to_run='qasm_simulator'),
+    lambda: api.batch_statevector('30,1', ['H']),
+])
+def test_too_wide_grids_are_refused(call):
+    with pytest.raises(ValueError, match='too wide'):
+        call()
+
+
+def test_too_wide_sessions_are_refused():
+    import sessions
+
+    with pytest.raises(ValueError, match='too wide'):
+        sessions.CircuitSession('30,1')
+
+
+def test_wide_clifford_grid_is_measured_on_a_tableau():
+    assert api.measurement('30,1', ','.join(['X'] * 30)) == str(2 ** 30 - 1)
+
+
+@pytest.mark.parametrize('gate_strings', [
+    [],
+    ['H'] * (api.BATCH_MAX_CIRCUITS + 1),
+])
+def test_batch_size_is_checked(gate_strings):
+    with pytest.raises(ValueError, match='between 1 and'):
+        api.batch_statevector('1,1', gate_strings)
+
+
+def test_batch_memory_is_checked():
+    with pytest.raises(ValueError, match='do not fit'):
+        api.batch_statevector('24,1', ['H'] * 2)
+
+
+def test_batch_matches_single_statevectors():
+    import formats
+
+    gate_strings = ['H,X', 'X,H', 'H,H']
+    reply = api.batch_statevector('2,1', gate_strings, formats.COMPLEX64)
+    magic, num_qubits, num_states = formats.HEADER.unpack_from(reply)
+    assert (magic, num_qubits, num_states) == (formats.MAGIC[formats.COMPLEX64], 2, 3)
+    quantum_states = np.frombuffer(reply[formats.HEADER.size:], '<c8').reshape(3, 4)
+    for gate_string, quantum_state in zip(gate_strings, quantum_states):
+        np.testing.assert_allclose(quantum_state, api.cached_statevector('2,1', gate_string),
+                                   atol=1e-6)
+
+
+def test_large_json_unitaries_are_refused_before_simulating(monkeypatch):
+    def unitary(*args):
+        raise AssertionError('simulated a unitary that cannot be sent')
+
+    monkeypatch.setattr(api.sv_engine, 'unitary', unitary)
+    with pytest.raises(ValueError, match='format=binary'):
+        api.unitary('10,1', ','.join(['H'] * 10))
+
+
+def test_large_json_unitaries_can_be_downsampled():
+    import json
+
+    reply = json.loads(api.unitary('10,1', ','.join(['H'] * 10), downsample=True))['result']
+    assert reply['block_qubits'] == 10 - api.UNITARY_DOWNSAMPLE_QUBITS
+    assert reply['mode'] == 'magnitude'
+
+
+def test_downsampled_binary_unitary_header_has_block_qubits():
+    import formats
+
+    num_qubits = 12
+    reply = api.unitary('{},1'.format(num_qubits), ','.join(['H'] * num_qubits),
+                        downsample=True, binary=True)
+    magic, matrix_qubits, code, block_qubits = formats.UNITARY_HEADER.unpack_from(reply)
+    assert magic == formats.UNITARY_MAGIC
+    assert matrix_qubits == api.UNITARY_DOWNSAMPLE_QUBITS
+    assert block_qubits == num_qubits - api.UNITARY_DOWNSAMPLE_QUBITS
+    assert code == formats.UNITARY_ELEMENTS[('magnitude', 'float64')][0]
+    magnitudes = np.frombuffer(reply[formats.UNITARY_HEADER.size:], '<f8')
+    # H on every qubit has all elements of magnitude 2**(-n/2)
+    np.testing.assert_allclose(magnitudes, 2 ** (-num_qubits / 2))
+
+
+def test_exact_binary_unitary_header():
+    import formats
+
+    reply = api.unitary('2,1', 'H,X', binary=True)
+    assert formats.UNITARY_HEADER.unpack_from(reply)[1:] == (2, 0, 0)
+    assert len(reply) == formats.UNITARY_HEADER.size + 16 * 16
+
+
+BELL_QASM = '''OPENQASM 2.0;
+include "qelib1.inc";
+qreg q[2];
+creg c[2];
+h q[0];
+cx q[0],q[1];
+measure q[0] -> c[0];
+measure q[1] -> c[1];
+'''
+
+
+@pytest.mark.parametrize('backend', [api.NUMPY_BACKEND, 'qasm_simulator'])
+def test_qasm_counts_on_either_backend(backend):
+    counts = api.qasm(BELL_QASM, backend, num_shots=2000, seed=5)
+    assert set(counts) == {'00', '11'}
+    assert sum(counts.values()) == 2000
+
+
+def test_qasm_runs_the_requested_basicaer_backend(monkeypatch):
+    def terminal_program(*args):
+        raise AssertionError('a BasicAer backend was asked for')
+
+    monkeypatch.setattr(api, 'terminal_program', terminal_program)
+    assert sum(api.qasm(BELL_QASM, 'qasm_simulator', num_shots=10).values()) == 10
+
+
+@pytest.mark.parametrize('backend', [api.NUMPY_BACKEND, 'qasm_simulator'])
+def test_qasm_without_classical_register_is_refused(backend):
+    with pytest.raises(ValueError, match='no classical register'):
+        api.qasm('OPENQASM 2.0;include "qelib1.inc";qreg q[2];h q[0];', backend)
+
+
+def test_qasm_unknown_backend_is_refused():
+    with pytest.raises(ValueError, match='unknown backend'):
+        api.qasm(BELL_QASM, 'no_such_simulator')
+
+
+def test_wide_clifford_grid_tableau_is_cached(monkeypatch):
+    gate_string = ','.join(['H', 'X'] * 13)
+    first = api.measurement('13,2', gate_string, session_id='tableau')
+
+    def simulate(*args):
+        raise AssertionError('simulated a cached tableau again')
+
+    monkeypatch.setattr(api.stabilizer, 'simulate', simulate)
+    tableau = api.grid_tableau('13,2', gate_string)
+    assert tableau is not None
+    assert not tableau.x.flags.writeable
+    for _ in range(3):
+        # H then X leaves |-> on every wire, so every outcome is possible
+        assert 0 <= int(api.measurement('13,2', gate_string, session_id='tableau')) < 2 ** 13
+    assert 0 <= int(first) < 2 ** 13
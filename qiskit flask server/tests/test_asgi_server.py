@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+import asyncio
+
+import pytest
+
+starlette_testclient = pytest.importorskip('starlette.testclient')
+
+import asgi_server
+
+
+def test_calls_without_workers_answer_503(monkeypatch):
+    monkeypatch.setattr(asgi_server, 'WORKER_WAIT_SECONDS', 0.05)
+    app = asgi_server.create_app(workers=0, affinity=True)
+    with starlette_testclient.TestClient(app) as client:
+        response = client.post('/api/run/get_statevector',
+                               data={'circuit_dimension': '1,1', 'gate_array': 'H'})
+        assert response.status_code == 503
+        assert 'no simulation worker' in response.json()['error']
+
+
+def test_calls_waiting_for_a_worker_hold_no_slot(monkeypatch):
+    monkeypatch.setattr(asgi_server, 'WORKER_WAIT_SECONDS', 0.05)
+
+    async def run_calls():
+        pool = asgi_server.ShardedPool(workers=1, max_pending=1)
+        # The ring stays empty, as after DELETE /workers/{name} of the last worker
+        pool.semaphore = asyncio.Semaphore(pool.max_pending)
+        pool._joined = asyncio.Event()
+        results = await asyncio.gather(*(pool.run('measurement', '1,1', 'H')
+                                         for _ in range(4)), return_exceptions=True)
+        assert all(isinstance(result, asgi_server.NoWorkerError) for result in results)
+        assert not pool.semaphore.locked()
+
+    asyncio.run(asyncio.wait_for(run_calls(), 5))
+
+
+@pytest.mark.parametrize('endpoint', ['/api/run/qasm', '/api/run/tomography'])
+def test_missing_qasm_answers_400(endpoint):
+    app = asgi_server.create_app(workers=0, affinity=True)
+    with starlette_testclient.TestClient(app) as client:
+        response = client.get(endpoint)
+        assert response.status_code == 400
+        assert 'qasm' in response.json()['error']
+
+
+def test_metrics_of_every_worker_are_rendered():
+    import metrics
+
+    registry = metrics.Registry()
+    stage_seconds = registry.histogram('stage_seconds', 'Stages', ['stage'])
+    stage_seconds.observe(0.002, stage='execute')
+    worker_snapshot = registry.snapshot()
+    stage_seconds.observe(0.2, stage='execute')
+
+    text = registry.render({'worker-0': worker_snapshot, 'server': registry.snapshot()})
+    assert text.count('# TYPE stage_seconds histogram') == 1
+    assert 'stage_seconds_count{worker="worker-0",stage="execute"} 1' in text
+    assert 'stage_seconds_count{worker="server",stage="execute"} 2' in text
+    assert 'stage_seconds_count{stage="execute"} 2' in registry.render()
+
+
+def test_metrics_route():
+    app = asgi_server.create_app(workers=0, affinity=True)
+    with starlette_testclient.TestClient(app) as client:
+        app.state.pool.worker_metrics['worker-0'] = {
+            'metrics': {'qiskit_server_coalesced_total': {('statevector',): 3}}, 'caches': {}}
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/plain')
+        assert 'qiskit_server_coalesced_total{worker="worker-0",call="statevector"} 3' \
+            in response.text
+        assert 'qiskit_server_cache_entries{worker="server",cache="sessions"}' in response.text
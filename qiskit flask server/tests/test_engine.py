@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""Parity of the NumPy engines with qiskit's BasicAer simulators
+
+Grids are built with CircuitGridModel and run both through
+engine.statevector.simulate() and through compute_circuit() on BasicAer,
+so the engine is checked against the gate selection of the original
+qiskit path.
+"""
+import numpy as np
+import pytest
+
+from engine import fusion
+from engine import qasm as qasm_parser
+from engine import stabilizer
+from engine import statevector as sv_engine
+from engine.statevector import Operation
+from model import circuit_node_types as node_types
+from model.circuit_grid_model import CircuitGridModel, CircuitGridNode
+
+pytestmark = pytest.mark.filterwarnings('ignore::DeprecationWarning')
+
+ATOL = 1e-8
+
+FIXED_NODE_TYPES = [node_types.X, node_types.Y, node_types.Z, node_types.H,
+                    node_types.S, node_types.SDG, node_types.T, node_types.TDG]
+ROTATION_NODE_TYPES = [node_types.X, node_types.Y, node_types.Z]
+CONTROLLED_NODE_TYPES = [node_types.X, node_types.Y, node_types.Z, node_types.H]
+
+# Gate under test: {wire: node} of the column that holds it, on three wires
+GATE_COLUMNS = {
+    'x': {0: CircuitGridNode(node_types.X)},
+    'y': {1: CircuitGridNode(node_types.Y)},
+    'z': {2: CircuitGridNode(node_types.Z)},
+    'h': {0: CircuitGridNode(node_types.H)},
+    's': {1: CircuitGridNode(node_types.S)},
+    'sdg': {1: CircuitGridNode(node_types.SDG)},
+    't': {2: CircuitGridNode(node_types.T)},
+    'tdg': {2: CircuitGridNode(node_types.TDG)},
+    'rx': {0: CircuitGridNode(node_types.X, radians=0.3)},
+    'ry': {1: CircuitGridNode(node_types.Y, radians=-1.2)},
+    'rz': {2: CircuitGridNode(node_types.Z, radians=2.5)},
+    'cx': {1: CircuitGridNode(node_types.X, ctrl_a=0)},
+    'cy': {0: CircuitGridNode(node_types.Y, ctrl_a=2)},
+    'cz': {2: CircuitGridNode(node_types.Z, ctrl_a=1)},
+    'ch': {0: CircuitGridNode(node_types.H, ctrl_a=1)},
+    'crz': {1: CircuitGridNode(node_types.Z, radians=0.4, ctrl_a=2)},
+    'ccx': {2: CircuitGridNode(node_types.X, ctrl_a=0, ctrl_b=1)},
+    'swap': {0: CircuitGridNode(node_types.SWAP, swap=2)},
+    'cswap': {0: CircuitGridNode(node_types.SWAP, swap=2, ctrl_a=1)},
+}
+
+
+def basicaer_statevector(circuit):
+    from qiskit import BasicAer, execute
+
+    result = execute(circuit, BasicAer.get_backend('statevector_simulator')).result()
+    return np.asarray(result.get_statevector(circuit))
+
+
+def random_grid(rng, num_wires, num_columns):
+    """Grid of random gates, controlled ones included, with free wires left empty"""
+    circuit_grid_model = CircuitGridModel(num_wires, num_columns)
+    for column_num in range(num_columns):
+        free = [int(wire) for wire in rng.permutation(num_wires)]
+        while free:
+            wire_num = free.pop()
+            kind = rng.integers(6)
+            if kind == 1:
+                node = CircuitGridNode(FIXED_NODE_TYPES[rng.integers(len(FIXED_NODE_TYPES))])
+            elif kind == 2:
+                node = CircuitGridNode(ROTATION_NODE_TYPES[rng.integers(3)],
+                                       radians=rng.uniform(-np.pi, np.pi))
+            elif kind == 3 and free:
+                node = CircuitGridNode(CONTROLLED_NODE_TYPES[rng.integers(4)], ctrl_a=free.pop())
+                if node.node_type == node_types.Z and rng.random() < 0.5:
+                    node.radians = rng.uniform(-np.pi, np.pi)
+            elif kind == 4 and len(free) >= 2:
+                node = CircuitGridNode(node_types.X, ctrl_a=free.pop(), ctrl_b=free.pop())
+            elif kind == 5 and free:
+                node = CircuitGridNode(node_types.SWAP, swap=free.pop())
+                if free and rng.random() < 0.5:
+                    node.ctrl_a = free.pop()
+            else:
+                continue
+            circuit_grid_model.set_node(wire_num, column_num, node)
+    return circuit_grid_model
+
+
+def random_operations(rng, num_qubits, count, clifford=False):
+    gate_names = ['x', 'y', 'z', 'h', 's', 'sdg'] + ([] if clifford else ['t', 'tdg'])
+    operations = []
+    for _ in range(count):
+        qubits = [int(qubit) for qubit in rng.permutation(num_qubits)[:3]]
+        kind = rng.integers(4)
+        if kind == 0:
+            operations.append(Operation(gate_names[rng.integers(len(gate_names))], 0.0,
+                                        (qubits[0],), ()))
+        elif kind == 1:
+            turns = rng.integers(-4, 5) * np.pi / 2 if clifford else rng.uniform(-np.pi, np.pi)
+            operations.append(Operation(['rx', 'ry', 'rz'][rng.integers(3)], turns,
+                                        (qubits[0],), ()))
+        elif kind == 2:
+            operations.append(Operation(['x', 'y', 'z'][rng.integers(3)], 0.0,
+                                        (qubits[0],), (qubits[1],)))
+        else:
+            operations.append(Operation('swap', 0.0, (qubits[0], qubits[1]), ()))
+    return operations
+
+
+def unfused_statevector(num_qubits, operations):
+    state = sv_engine.zero_state(num_qubits)
+    for operation in operations:
+        sv_engine.apply_operation(state, num_qubits, operation)
+    return state
+
+
+@pytest.mark.parametrize('gate', sorted(GATE_COLUMNS))
+def test_gate_matches_basicaer(gate):
+    circuit_grid_model = CircuitGridModel(3, 3)
+    # A generic starting state, so every amplitude of the gate is exercised
+    for wire_num, radians in enumerate((0.7, 1.9, -2.3)):
+        circuit_grid_model.set_node(wire_num, 0, CircuitGridNode(node_types.Y, radians=radians))
+        circuit_grid_model.set_node(wire_num, 1,
+                                    CircuitGridNode(node_types.Z, radians=radians / 2))
+    for wire_num, node in GATE_COLUMNS[gate].items():
+        circuit_grid_model.set_node(wire_num, 2, node)
+
+    expected = basicaer_statevector(circuit_grid_model.compute_circuit())
+    np.testing.assert_allclose(sv_engine.simulate(circuit_grid_model), expected, atol=ATOL)
+
+
+@pytest.mark.parametrize('seed', range(12))
+def test_random_grid_matches_basicaer(seed):
+    rng = np.random.default_rng(seed)
+    circuit_grid_model = random_grid(rng, int(rng.integers(2, 6)), int(rng.integers(1, 8)))
+
+    expected = basicaer_statevector(circuit_grid_model.compute_circuit())
+    np.testing.assert_allclose(sv_engine.simulate(circuit_grid_model), expected, atol=ATOL)
+
+
+def test_prefix_cache_resumes_to_the_same_state():
+    rng = np.random.default_rng(7)
+    circuit_grid_model = random_grid(rng, 4, 6)
+    prefix_cache = {}
+
+    class DictCache:
+        get = staticmethod(prefix_cache.get)
+
+        @staticmethod
+        def put(key, value):
+            prefix_cache[key] = value
+
+    first = sv_engine.simulate(circuit_grid_model, DictCache)
+    circuit_grid_model.set_node(0, 4, CircuitGridNode(node_types.H))
+    resumed = sv_engine.simulate(circuit_grid_model, DictCache)
+    np.testing.assert_allclose(resumed, sv_engine.simulate(circuit_grid_model), atol=ATOL)
+    assert not np.allclose(first, resumed)
+
+
+def test_batch_matches_single_simulation():
+    rng = np.random.default_rng(3)
+    circuit_grid_models = [random_grid(rng, 4, 5) for _ in range(6)]
+    states = sv_engine.simulate_batch(circuit_grid_models)
+    for circuit_grid_model, state in zip(circuit_grid_models, states):
+        np.testing.assert_allclose(state, sv_engine.simulate(circuit_grid_model), atol=ATOL)
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_fused_operations_match_unfused(seed):
+    rng = np.random.default_rng(seed)
+    operations = random_operations(rng, 5, 40)
+    np.testing.assert_allclose(sv_engine.simulate_operations(5, operations),
+                               unfused_statevector(5, operations), atol=ATOL)
+
+
+def test_adjacent_inverse_pairs_cancel():
+    operations = [
+        Operation('h', 0.0, (0,), ()),
+        Operation('h', 0.0, (0,), ()),
+        Operation('s', 0.0, (1,), ()),
+        Operation('sdg', 0.0, (1,), ()),
+        Operation('x', 0.0, (1,), (0,)),
+        Operation('x', 0.0, (1,), (0,)),
+        Operation('swap', 0.0, (0, 2), ()),
+        Operation('swap', 0.0, (2, 0), ()),
+        Operation('id', 0.0, (2,), ()),
+    ]
+    assert fusion.cancel_inverses(operations) == []
+    assert fusion.optimize(operations) == []
+
+
+def test_pairs_separated_by_a_gate_on_their_qubits_are_kept():
+    operations = [
+        Operation('h', 0.0, (0,), ()),
+        Operation('x', 0.0, (1,), (0,)),
+        Operation('h', 0.0, (0,), ()),
+        Operation('t', 0.0, (2,), ()),
+        Operation('t', 0.0, (2,), ()),
+    ]
+    assert fusion.cancel_inverses(operations) == operations
+
+
+def test_unitary_matches_basicaer():
+    from qiskit import BasicAer, execute
+
+    circuit_grid_model = random_grid(np.random.default_rng(11), 3, 5)
+    circuit = circuit_grid_model.compute_circuit()
+    result = execute(circuit, BasicAer.get_backend('unitary_simulator')).result()
+    np.testing.assert_allclose(
+        sv_engine.unitary(3, sv_engine.grid_operations(circuit_grid_model)),
+        np.asarray(result.get_unitary(circuit)), atol=ATOL)
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_stabilizer_matches_statevector(seed):
+    rng = np.random.default_rng(seed)
+    operations = random_operations(rng, 5, 30, clifford=True)
+    assert stabilizer.is_clifford(operations)
+    tableau = stabilizer.simulate(5, operations)
+    state = sv_engine.simulate_operations(5, operations)
+
+    np.testing.assert_allclose(tableau.bloch_vectors(), sv_engine.bloch_vectors(state, 5),
+                               atol=ATOL)
+    # Stabilizer states are uniform over their support, which sampling must cover exactly
+    support = set(np.flatnonzero(sv_engine.probabilities(state) > ATOL).tolist())
+    assert set(tableau.sample(np.random.default_rng(seed), 2000)) == support
+
+
+def test_non_clifford_operations_are_refused():
+    assert not stabilizer.is_clifford([Operation('t', 0.0, (0,), ())])
+    assert not stabilizer.is_clifford([Operation('rz', 0.3, (0,), ())])
+    assert not stabilizer.is_clifford([Operation('x', 0.0, (2,), (0, 1))])
+    assert not stabilizer.is_clifford([Operation('h', 0.0, (1,), (0,))])
+
+
+def random_qasm(rng, num_qubits, count):
+    names = sorted(qasm_parser.QASM_GATES)
+    lines = ['OPENQASM 2.0;', 'include "qelib1.inc";', 'qreg q[{}];'.format(num_qubits)]
+    for _ in range(count):
+        name = names[rng.integers(len(names))]
+        _, num_controls, num_targets = qasm_parser.QASM_GATES[name]
+        qubits = rng.permutation(num_qubits)[:num_controls + num_targets]
+        arguments = ','.join('q[{}]'.format(qubit) for qubit in qubits)
+        if name in ('rx', 'ry', 'rz', 'crz'):
+            name += '({:.6f}*pi)'.format(rng.uniform(-1, 1))
+        lines.append('{} {};'.format(name, arguments))
+    return '\n'.join(lines)
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_parsed_qasm_matches_basicaer(seed):
+    from qiskit import QuantumCircuit
+
+    qasm_string = random_qasm(np.random.default_rng(seed), 4, 25)
+    program = qasm_parser.parse(qasm_string)
+    expected = basicaer_statevector(QuantumCircuit.from_qasm_str(qasm_string))
+    np.testing.assert_allclose(
+        sv_engine.simulate_operations(program.num_qubits, program.gate_operations()),
+        expected, atol=ATOL)
+
+
+def test_qasm_count_keys_match_basicaer():
+    from qiskit import BasicAer, QuantumCircuit, execute
+
+    qasm_string = '''OPENQASM 2.0;
+include "qelib1.inc";
+qreg q[3];
+creg a[2];
+creg b[1];
+x q[0];
+x q[2];
+measure q[0] -> a[1];
+measure q[1] -> a[0];
+measure q[2] -> b[0];
+'''
+    program = qasm_parser.parse(qasm_string)
+    assert program.has_terminal_measurements()
+    state = sv_engine.simulate_operations(program.num_qubits, program.gate_operations())
+    basis_index = int(np.argmax(sv_engine.probabilities(state)))
+
+    circuit = QuantumCircuit.from_qasm_str(qasm_string)
+    counts = execute(circuit, BasicAer.get_backend('qasm_simulator'), shots=1).result() \
+        .get_counts(circuit)
+    assert list(counts) == [program.count_key(basis_index)]
+
+
+def test_mid_circuit_measurements_are_not_terminal():
+    program = qasm_parser.parse('OPENQASM 2.0;include "qelib1.inc";qreg q[1];creg c[1];'
+                                'h q[0];measure q[0] -> c[0];h q[0];')
+    assert not program.has_terminal_measurements()
+
+
+def test_unsupported_qasm_raises_value_error():
+    with pytest.raises(ValueError):
+        qasm_parser.parse('OPENQASM 2.0;include "qelib1.inc";qreg q[1];u3(0,0,0) q[0];')
+
+
+@pytest.mark.parametrize('statement', [
+    'x q[0],q[1];', 'cx q[0];', 'ccx q[0],q[1];', 'cx q[0],q[0];', 'swap q[1],q[1];',
+    'ccx q[0],q[1],q[0];', 'cx q,r;', 'cx q,q;',
+])
+def test_wrong_qubit_arguments_raise_value_error(statement):
+    with pytest.raises(ValueError, match='arguments|repeated|mismatch'):
+        qasm_parser.parse('OPENQASM 2.0;include "qelib1.inc";qreg q[3];qreg r[2];' + statement)
+
+
+def test_register_arguments_apply_the_gate_per_qubit():
+    program = qasm_parser.parse('OPENQASM 2.0;include "qelib1.inc";qreg q[2];qreg r[2];'
+                                'cx q,r;h q;')
+    assert [(operation.controls, operation.targets)
+            for operation in program.gate_operations()] == \
+        [((0,), (2,)), ((1,), (3,)), ((), (0,)), ((), (1,))]
+
+
+@pytest.mark.parametrize('parameter', [
+    '9**9**8', '1/0', 'pi**9999', '1e999', '0**-1', '(-8)**(1/3)', '+'.join(['pi'] * 40),
+    '1' * 400,
+])
+def test_unsafe_parameters_raise_value_error(parameter):
+    with pytest.raises(ValueError):
+        qasm_parser.parse('OPENQASM 2.0;include "qelib1.inc";qreg q[1];'
+                          'rx({}) q[0];'.format(parameter))
+
+
+def test_parameter_expressions():
+    assert qasm_parser.evaluate_parameter('-pi/2') == pytest.approx(-np.pi / 2)
+    assert qasm_parser.evaluate_parameter('2**-1*pi') == pytest.approx(np.pi / 2)
+    assert qasm_parser.evaluate_parameter('(-2)**3') == -8
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+import pytest
+
+pytest.importorskip('flask')
+
+import server
+
+pytestmark = pytest.mark.filterwarnings('ignore::DeprecationWarning')
+
+QASM_HEADER = 'OPENQASM 2.0;include "qelib1.inc";qreg q[2];creg c[2];'
+
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+
+@pytest.mark.parametrize('statement', ['cx q[0],q[0];', 'cx q[0];', 'rx(1/0) q[0];'])
+def test_unitary_of_invalid_qasm_is_refused(client, statement):
+    response = client.get('/api/run/unitary', query_string={'qasm': QASM_HEADER + statement})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+@pytest.mark.parametrize('statement', [
+    'cx q[0];', 'x q[0],q[1];', 'cx q[0],q[0];', 'rx(1/0) q[0];', 'rx(9**9**8) q[0];',
+    'rx(pi**9999) q[0];',
+])
+@pytest.mark.parametrize('endpoint', ['/api/run/qasm', '/api/run/tomography'])
+def test_malformed_qasm_is_refused(client, endpoint, statement):
+    qasm = QASM_HEADER + statement + 'measure q -> c;'
+    response = client.get(endpoint, query_string={'qasm': qasm})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
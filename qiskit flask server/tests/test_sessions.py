@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import numpy as np
+import pytest
+
+from engine import statevector as sv_engine
+from model import circuit_node_types as node_types
+import sessions
+
+ATOL = 1e-8
+BELL = np.array([1, 0, 0, 1]) / np.sqrt(2)
+
+
+def bell_session():
+    session = sessions.CircuitSession('2,2')
+    session.apply_edit({'action': 'set', 'wire': 0, 'column': 0, 'gate': 'H'})
+    session.apply_edit({'action': 'set', 'wire': 1, 'column': 1, 'gate': 'X'})
+    session.apply_edit({'action': 'ctrl', 'wire': 1, 'column': 1, 'ctrl': 0})
+    return session
+
+
+def test_edits_match_a_fresh_simulation():
+    session = bell_session()
+    np.testing.assert_allclose(session.statevector(), BELL, atol=ATOL)
+
+    session.apply_edit({'action': 'rotate', 'wire': 1, 'column': 1, 'radians': 0.5})
+    session.apply_edit({'action': 'column', 'column': 0, 'gates': ['X', 'H']})
+    np.testing.assert_allclose(session.statevector(),
+                               sv_engine.simulate(session.circuit_grid_model), atol=ATOL)
+
+
+@pytest.mark.parametrize('edit', [
+    {'action': 'ctrl', 'wire': 1, 'column': 1, 'ctrl': 1},
+    {'action': 'ctrl', 'wire': 1, 'column': 1, 'ctrl': 5},
+    {'action': 'ctrl', 'wire': 0, 'column': 1, 'ctrl': 1},
+    {'action': 'set', 'wire': 0, 'column': 1, 'gate': 'U3'},
+    {'action': 'column', 'column': 0, 'gates': ['H']},
+])
+def test_rejected_edit_leaves_the_session_unchanged(edit):
+    session = bell_session()
+    session.statevector()
+    with pytest.raises(ValueError):
+        session.apply_edit(edit)
+
+    np.testing.assert_allclose(session.statevector(), BELL, atol=ATOL)
+    np.testing.assert_allclose(sv_engine.simulate(session.circuit_grid_model), BELL,
+                               atol=ATOL)
+
+
+def test_control_can_be_moved_and_set_again():
+    session = sessions.CircuitSession('3,1')
+    session.apply_edit({'action': 'set', 'wire': 2, 'column': 0, 'gate': 'X'})
+    session.apply_edit({'action': 'ctrl', 'wire': 2, 'column': 0, 'ctrl': 0})
+    session.apply_edit({'action': 'ctrl', 'wire': 2, 'column': 0, 'ctrl': 0})
+    session.apply_edit({'action': 'ctrl', 'wire': 2, 'column': 0, 'ctrl': 1})
+
+    node = session.circuit_grid_model.get_node(2, 0)
+    assert (node.ctrl_a, node.ctrl_b) == (1, -1)
+    assert session.circuit_grid_model.get_node(0, 0).node_type == node_types.IDEN
+    assert session.circuit_grid_model.get_node(1, 0).node_type == node_types.EMPTY